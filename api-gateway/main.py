@@ -1,5 +1,6 @@
-from fastapi import FastAPI, APIRouter, Request, HTTPException
+from fastapi import FastAPI, APIRouter, Request, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import requests
 import os
 
@@ -29,6 +30,30 @@ SERVICES = {
     "progreso": os.getenv("PROGRESO_SERVICE_URL", "http://progreso-service:8004"),
 }
 
+# Cabeceras de validación HTTP que se reenvían en ambos sentidos,
+# para que las peticiones condicionales (ETag / 304) lleguen a los servicios.
+CONDITIONAL_REQUEST_HEADERS = ("If-None-Match", "If-Modified-Since")
+CACHE_RESPONSE_HEADERS = ("ETag", "Last-Modified", "Cache-Control", "Vary")
+
+
+def _cache_headers(response):
+    return {h: response.headers[h] for h in CACHE_RESPONSE_HEADERS if h in response.headers}
+
+
+# Las respuestas NDJSON (exportaciones, calificación por lotes) se reenvían por trozos
+# de este tamaño según llegan, sin tenerlas enteras en memoria
+NDJSON = "application/x-ndjson"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _por_trozos(response, decode_content):
+    """Cuerpo de `response` (pedida con stream=True) según llega; la cierra al terminar."""
+    try:
+        yield from response.raw.stream(STREAM_CHUNK_SIZE, decode_content=decode_content)
+    finally:
+        response.close()
+
+
 # TODO: Implementa una ruta genérica para redirigir peticiones GET.
 @router.get("/{service_name}/{path:path}")
 async def forward_get(service_name: str, path: str, request: Request):
@@ -43,9 +68,27 @@ async def forward_get(service_name: str, path: str, request: Request):
         auth = request.headers.get("Authorization")
         if auth:
             headers["Authorization"] = auth
-        response = requests.get(service_url, params=request.query_params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        for name in CONDITIONAL_REQUEST_HEADERS:
+            value = request.headers.get(name)
+            if value:
+                headers[name] = value
+        # Se pide la codificación que acepta el cliente (requests pediría gzip por su cuenta)
+        headers["Accept-Encoding"] = request.headers.get("Accept-Encoding") or "identity"
+        response = requests.get(service_url, params=request.query_params, headers=headers, stream=True)
+        media_type = response.headers.get("Content-Type", "application/json")
+        # Se reenvían los bytes tal cual, sin descomprimir: el ETag del servicio
+        # (p. ej. con sufijo -gz) sigue describiendo exactamente lo que se envía
+        response_headers = _cache_headers(response)
+        if "Content-Encoding" in response.headers:
+            response_headers["Content-Encoding"] = response.headers["Content-Encoding"]
+        if response.status_code == 200 and media_type.startswith(NDJSON):
+            return StreamingResponse(_por_trozos(response, False), media_type=media_type, headers=response_headers)
+        with response:
+            response.raise_for_status()
+            if response.status_code == 304:
+                return Response(status_code=304, headers=_cache_headers(response))
+            content = response.raw.read(decode_content=False)
+            return Response(content=content, media_type=media_type, headers=response_headers)
     except requests.exceptions.RequestException as e:
         raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
 
@@ -58,19 +101,54 @@ async def forward_post(service_name: str, path: str, request: Request):
     service_url = f"{SERVICES[service_name]}/{path}"
     
     try:
-        # Forward JSON body, query params and authorization header
+        # Forward the raw body (JSON or NDJSON), query params and authorization header
         headers = {}
         auth = request.headers.get("Authorization")
         if auth:
             headers["Authorization"] = auth
-        body = None
-        try:
-            body = await request.json()
-        except Exception:
-            body = None
+        content_type = request.headers.get("Content-Type")
+        if content_type:
+            headers["Content-Type"] = content_type
+        # Los reintentos con la misma clave no repiten la escritura en el servicio
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        body = await request.body()
         response = requests.post(
             service_url,
-            json=body,
+            data=body or None,
+            params=request.query_params,
+            headers=headers,
+            stream=True,
+        )
+        media_type = response.headers.get("Content-Type", "")
+        if response.ok and media_type.startswith(NDJSON):
+            return StreamingResponse(_por_trozos(response, True), media_type=media_type)
+        with response:
+            response.raise_for_status()
+            return response.json()
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+
+@router.put("/{service_name}/{path:path}")
+async def forward_put(service_name: str, path: str, request: Request):
+    if service_name not in SERVICES:
+        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
+    
+    service_url = f"{SERVICES[service_name]}/{path}"
+    
+    try:
+        headers = {}
+        auth = request.headers.get("Authorization")
+        if auth:
+            headers["Authorization"] = auth
+        content_type = request.headers.get("Content-Type")
+        if content_type:
+            headers["Content-Type"] = content_type
+        body = await request.body()
+        response = requests.put(
+            service_url,
+            data=body or None,
             params=request.query_params,
             headers=headers,
         )
@@ -79,7 +157,25 @@ async def forward_post(service_name: str, path: str, request: Request):
     except requests.exceptions.RequestException as e:
         raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
 
-# TODO: Agrega más rutas para otros métodos HTTP (PUT, DELETE, etc.).
+
+@router.delete("/{service_name}/{path:path}")
+async def forward_delete(service_name: str, path: str, request: Request):
+    if service_name not in SERVICES:
+        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
+    
+    service_url = f"{SERVICES[service_name]}/{path}"
+    
+    try:
+        headers = {}
+        auth = request.headers.get("Authorization")
+        if auth:
+            headers["Authorization"] = auth
+        response = requests.delete(service_url, params=request.query_params, headers=headers)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+
 
 # Incluye el router en la aplicación principal.
 app.include_router(router)
@@ -0,0 +1,46 @@
+import hashlib
+from email.utils import parsedate_to_datetime
+
+# Sufijo del ETag de cada representación comprimida: cada una necesita su propio ETag fuerte
+ENCODING_SUFFIX = {"gzip": "-gz", "br": "-br"}
+
+
+def strong_etag(body):
+    """ETag fuerte de unos bytes ya serializados."""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def encoded_etag(etag, encoding):
+    """ETag de la representación de `etag` comprimida con `encoding`."""
+    return etag[:-1] + ENCODING_SUFFIX[encoding] + '"'
+
+
+def base_etag(etag):
+    """ETag sin prefijo débil ni sufijo de codificación."""
+    etag = etag.strip().removeprefix("W/")
+    for suffix in ENCODING_SUFFIX.values():
+        if etag.endswith(suffix + '"'):
+            return etag[: -len(suffix) - 1] + '"'
+    return etag
+
+
+def is_fresh(request_headers, etag, modified_at=None):
+    """
+    True si la petición condicional del cliente sigue siendo válida (304)
+    para el recurso con `etag` (sin sufijo de codificación) y, si se da,
+    fecha de modificación `modified_at` (timestamp).
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110)
+        if if_none_match.strip() == "*":
+            return True
+        return any(base_etag(t) == etag for t in if_none_match.split(","))
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and modified_at is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(modified_at) <= since
+    return False
@@ -7,6 +7,7 @@ from typing import Optional
 import json
 import uuid
 import threading
+from collections import OrderedDict
 from datetime import datetime
 
 app = Flask(__name__)
@@ -79,7 +80,35 @@ class MockStore:
         return self.data.get('lecciones', {}).get(modulo_id, [])
 
 
-mock_store = MockStore()
+# Fichero del almacén simulado; por defecto, junto a este módulo
+mock_store = MockStore(os.getenv("MOCK_DATA_PATH"))
+
+
+# --- Caché de revalidación (ETag) ---
+class ConditionalCache:
+    """Última respuesta con ETag de cada petición GET, para revalidarla con If-None-Match."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag, body):
+        with self.lock:
+            self.entries[key] = (etag, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+http_cache = ConditionalCache()
 
 
 def _call_service(method, service, path, **kwargs):
@@ -92,6 +121,10 @@ def _call_service(method, service, path, **kwargs):
     try:
         url = f"{API_GATEWAY_URL}/api/v1/{service}/{path}"
         print(f"[DEBUG] Calling {method} {url}")  # Debug
+        cache_key = (url, str(kwargs.get('params')), headers.get('Authorization'))
+        cached = http_cache.get(cache_key) if method == 'GET' else None
+        if cached:
+            headers['If-None-Match'] = cached[0]
         if method == 'GET':
             r = requests.get(url, **kwargs, timeout=3)
         elif method == 'POST':
@@ -100,8 +133,13 @@ def _call_service(method, service, path, **kwargs):
             return None
         
         print(f"[DEBUG] Response status: {r.status_code}")  # Debug
+        if r.status_code == 304 and cached:
+            # Se parsea de nuevo para que quien llama pueda modificar el resultado sin tocar la caché
+            return json.loads(cached[1])
         if r.status_code in [200, 201]:
             result = r.json()
+            if method == 'GET' and r.headers.get('ETag'):
+                http_cache.put(cache_key, r.headers['ETag'], r.content)
             print(f"[DEBUG] Response data: {str(result)[:200]}")  # Debug primeros 200 chars
             return result
         else:
@@ -229,24 +267,55 @@ def dashboard_instructor():
     
     stats = {
         'num_cursos': len(mis_cursos),
-        'total_estudiantes': len(mis_cursos) * 12,  # Mock: ~12 estudiantes por curso
-        'evaluaciones_pendientes': len(mis_cursos) * 3  # Mock: ~3 evaluaciones pendientes por curso
+        'total_estudiantes': 0,
+        'evaluaciones_pendientes': 0
     }
     
-    # Enriquecer cursos para el template
+    # Enriquecer cursos para el template con las estadísticas que mantiene progreso (una sola llamada)
+    resp_estadisticas = _call_service(
+        'GET', 'progreso', 'cursos/estadisticas',
+        params={'cursos': ','.join(str(c.get('id')) for c in mis_cursos)},
+    ) if mis_cursos else None
+    por_curso = {e['curso_id']: e for e in (resp_estadisticas or {}).get('cursos', [])}
     cursos_enriquecidos = []
     for c in mis_cursos:
+        estadisticas = por_curso.get(c.get('id'), {})
+        stats['total_estudiantes'] += estadisticas.get('inscritos', 0)
+        stats['evaluaciones_pendientes'] += estadisticas.get('evaluaciones_pendientes', 0)
         cursos_enriquecidos.append({
             'curso_id': c.get('id'),
             'curso_titulo': c.get('titulo'),
             'curso_descripcion': c.get('descripcion'),
             'duracion_horas': c.get('duracion_horas'),
-            'rating': c.get('rating')
+            'rating': c.get('rating'),
+            'inscritos': estadisticas.get('inscritos', 0),
+            'promedio_progreso': estadisticas.get('promedio_progreso', 0),
+            'calificaciones': estadisticas.get('calificaciones', {})
         })
     
     return render_template('dashboard_instructor.html', cursos=cursos_enriquecidos, stats=stats, user=user)
 
 
+def _progreso_estudiante(estudiante_id):
+    """
+    Cursos del estudiante. La primera vez en la sesión es una sola llamada a
+    la inscripción (idempotente: inscribe si no tiene cursos y devuelve los
+    suyos con el resumen); después, la lectura pura, que se revalida con ETag.
+    """
+    if session.get('inscrito') == estudiante_id:
+        resp = _call_service('GET', 'progreso', f'estudiantes/{estudiante_id}/cursos')
+        if resp and resp.get('cursos'):
+            return resp
+    clave = session.setdefault('inscripcion_key', uuid.uuid4().hex)
+    resp = _call_service(
+        'POST', 'progreso', f'estudiantes/{estudiante_id}/inscripcion',
+        json={}, headers={'Idempotency-Key': f'{estudiante_id}:{clave}'},
+    )
+    if resp and 'error' not in resp:
+        session['inscrito'] = estudiante_id
+    return resp
+
+
 def dashboard_estudiante():
     """Dashboard para estudiantes"""
     user = session.get('user', {})
@@ -264,31 +333,31 @@ def dashboard_estudiante():
     cursos_progreso = []
     
     if estudiante_id:
-        # Asignar cursos aleatorios si no tiene ninguno (POST automático)
-        resp_progreso = _call_service('GET', 'progreso', f'estudiantes/{estudiante_id}/cursos')
+        resp_progreso = _progreso_estudiante(estudiante_id)
         print(f"[DEBUG DASHBOARD] Progreso response: {resp_progreso}")  # Debug
         
-        # Si no hay cursos, hacer POST para asignar aleatorios
-        if not resp_progreso or not resp_progreso.get('cursos'):
-            print(f"[DEBUG DASHBOARD] No hay cursos, asignando...")  # Debug
-            _call_service('POST', 'progreso', f'estudiantes/{estudiante_id}/asignar-cursos', json={})
-            resp_progreso = _call_service('GET', 'progreso', f'estudiantes/{estudiante_id}/cursos')
-        
         progreso_data = resp_progreso if resp_progreso else {'cursos': []}
         cursos_progreso = progreso_data.get('cursos', [])
         num_cursos = len(cursos_progreso)
         
         print(f"[DEBUG DASHBOARD] Num cursos: {num_cursos}")  # Debug
         
-        # Calcular promedio
-        if num_cursos > 0:
-            total_progreso = sum(c.get('completado_pct', 0) for c in cursos_progreso)
-            promedio_progreso = round(total_progreso / num_cursos)
+        # Agregados mantenidos por progreso (la inscripción ya los trae); si no responde, se calculan aquí
+        resumen = progreso_data.get('resumen') or _call_service('GET', 'progreso', f'estudiantes/{estudiante_id}/resumen')
+        if resumen:
+            num_cursos = resumen.get('num_cursos', num_cursos)
+            promedio_progreso = resumen.get('promedio_progreso', 0)
+            evaluaciones_pendientes = resumen.get('evaluaciones_pendientes', 0)
         else:
-            promedio_progreso = 0
-        
-        # Evaluaciones pendientes
-        evaluaciones_pendientes = sum(1 for c in cursos_progreso if c.get('completado_pct', 0) > 50 and c.get('calificacion') is None)
+            # Calcular promedio
+            if num_cursos > 0:
+                total_progreso = sum(c.get('completado_pct', 0) for c in cursos_progreso)
+                promedio_progreso = round(total_progreso / num_cursos)
+            else:
+                promedio_progreso = 0
+            
+            # Evaluaciones pendientes
+            evaluaciones_pendientes = sum(1 for c in cursos_progreso if c.get('completado_pct', 0) > 50 and c.get('calificacion') is None)
         
         # Enriquecer con info de cursos
         cursos_info = {}
@@ -326,17 +395,19 @@ def curso_detail(curso_id):
     if 'user' not in session:
         return redirect(url_for('login'))
     
-    resp = _call_service('GET', 'cursos', curso_id)
-    curso = resp if resp else mock_store.get_curso(curso_id)
+    # Curso, módulos y lecciones en una sola llamada; modulo_detail revalida este mismo recurso
+    resp = _call_service('GET', 'cursos', f"{curso_id}/tree", params={'include': 'modulos,lecciones'})
+    if resp and 'error' not in resp:
+        curso = resp
+        modulos = resp.get('modulos', [])
+    else:
+        curso = mock_store.get_curso(curso_id)
+        modulos = mock_store.get_modulos(curso_id)
     
     if not curso:
         flash('Curso no encontrado', 'error')
         return redirect(url_for('cursos_list'))
     
-    # Obtener módulos
-    resp_modulos = _call_service('GET', 'cursos', f"{curso_id}/modulos")
-    modulos = resp_modulos.get('modulos', []) if resp_modulos else mock_store.get_modulos(curso_id)
-    
     return render_template('cursos.html', curso=curso, modulos=modulos)
 
 
@@ -346,9 +417,13 @@ def modulo_detail(curso_id, modulo_id):
     if 'user' not in session:
         return redirect(url_for('login'))
     
-    # Obtener lecciones
-    resp = _call_service('GET', 'cursos', f"modulos/{modulo_id}/lecciones")
-    lecciones = resp.get('lecciones', []) if resp else mock_store.get_lecciones(modulo_id)
+    # Obtener lecciones desde el árbol del curso (ya en caché si se visitó el curso)
+    resp = _call_service('GET', 'cursos', f"{curso_id}/tree", params={'include': 'modulos,lecciones'})
+    if resp and 'error' not in resp:
+        modulo = next((m for m in resp.get('modulos', []) if m.get('id') == modulo_id), {})
+        lecciones = modulo.get('lecciones', [])
+    else:
+        lecciones = mock_store.get_lecciones(modulo_id)
     
     return render_template('modulo_detalle.html', curso_id=curso_id, modulo_id=modulo_id, lecciones=lecciones)
 
@@ -360,7 +435,7 @@ def progreso():
         return redirect(url_for('login'))
     
     estudiante_id = session.get('user', {}).get('email')
-    resp = _call_service('GET', 'progreso', f"estudiantes/{estudiante_id}/cursos")
+    resp = _progreso_estudiante(estudiante_id)
     progreso_data = resp if resp else {"cursos": []}
     
     # Obtener info de cursos para mostrar títulos
@@ -8,6 +8,7 @@ Following copilot-instructions.md punto 1, 3:
 - Gateway forwarding: GET /api/v1/{service}/{path} forwards to service URL
 """
 
+import json
 import requests
 import random
 from datetime import datetime
@@ -141,23 +142,27 @@ def create_cursos():
     print("="*60 + "\n")
     
     created = 0
-    for curso in CURSOS:
-        try:
-            # Punto 3: "POST /api/v1/{service}/{path} forwards JSON bodies"
-            response = requests.post(f"{BASE_URL}/cursos/cursos", json=curso, timeout=5)
-            if response.status_code in [200, 201]:
-                print(f"✅ Curso creado: {curso['titulo']} (Rating: {curso['rating']}/5.0)")
-                created += 1
-            else:
-                # Show error detail for debugging
-                try:
-                    error = response.json()
-                    print(f"⚠️  Error al crear {curso['titulo']}: {response.status_code} - {error}")
-                except:
-                    print(f"⚠️  Error al crear {curso['titulo']}: {response.status_code}")
-        except Exception as e:
-            print(f"❌ Error conectando al API Gateway: {e}")
-            break
+    try:
+        # Una sola petición para todo el catálogo; el servicio informa el resultado de cada fila
+        response = requests.post(f"{BASE_URL}/cursos/cursos/bulk", json=CURSOS, timeout=30)
+        if response.status_code in [200, 201]:
+            por_id = {c["id"]: c for c in CURSOS}
+            for fila in response.json().get("resultados", []):
+                curso = por_id.get(fila.get("id"), {})
+                if fila.get("status") == "creado":
+                    print(f"✅ Curso creado: {curso.get('titulo')} (Rating: {curso.get('rating')}/5.0)")
+                    created += 1
+                else:
+                    print(f"⚠️  Error al crear {curso.get('titulo', fila.get('id'))}: {fila.get('status')} - {fila.get('error')}")
+        else:
+            # Show error detail for debugging
+            try:
+                error = response.json()
+                print(f"⚠️  Error en la carga de cursos: {response.status_code} - {error}")
+            except:
+                print(f"⚠️  Error en la carga de cursos: {response.status_code}")
+    except Exception as e:
+        print(f"❌ Error conectando al API Gateway: {e}")
     
     print(f"\n📊 RESUMEN: {created}/{len(CURSOS)} cursos creados")
     return created
@@ -169,31 +174,38 @@ def create_evaluaciones():
     print("📝 CREANDO EVALUACIONES")
     print("="*60 + "\n")
     
+    evaluaciones = [
+        {
+            "id": f"{curso['id']}-eval-{idx+1}",
+            "curso_id": curso['id'],
+            "titulo": f"Evaluación {idx+1}: {curso['titulo']}",
+            **eval_template
+        }
+        for curso in CURSOS
+        for idx, eval_template in enumerate(EVALUACIONES_TEMPLATE)
+    ]
+
     created = 0
-    for curso in CURSOS:
-        for idx, eval_template in enumerate(EVALUACIONES_TEMPLATE):
-            evaluacion = {
-                "id": f"{curso['id']}-eval-{idx+1}",
-                "curso_id": curso['id'],
-                "titulo": f"Evaluación {idx+1}: {curso['titulo']}",
-                **eval_template
-            }
-            
-            try:
-                # Punto 3: Gateway forwarding pattern
-                response = requests.post(f"{BASE_URL}/evaluaciones/evaluaciones", json=evaluacion, timeout=5)
-                if response.status_code in [200, 201]:
-                    print(f"✅ Evaluación creada: {evaluacion['titulo']}")
+    try:
+        # Una sola petición para todas las evaluaciones; el servicio las inserta en una transacción
+        response = requests.post(f"{BASE_URL}/evaluaciones/evaluaciones/bulk", json=evaluaciones, timeout=60)
+        if response.status_code in [200, 201]:
+            por_id = {e["id"]: e for e in evaluaciones}
+            for fila in response.json().get("resultados", []):
+                evaluacion = por_id.get(fila.get("id"), {})
+                if fila.get("status") == "creado":
+                    print(f"✅ Evaluación creada: {evaluacion.get('titulo')}")
                     created += 1
                 else:
-                    try:
-                        error = response.json()
-                        print(f"⚠️  Error: {response.status_code} - {error}")
-                    except:
-                        print(f"⚠️  Error: {response.status_code}")
-            except Exception as e:
-                print(f"❌ Error: {e}")
-                break
+                    print(f"⚠️  Error al crear {evaluacion.get('titulo', fila.get('id'))}: {fila.get('status')} - {fila.get('error')}")
+        else:
+            try:
+                error = response.json()
+                print(f"⚠️  Error en la carga de evaluaciones: {response.status_code} - {error}")
+            except:
+                print(f"⚠️  Error en la carga de evaluaciones: {response.status_code}")
+    except Exception as e:
+        print(f"❌ Error conectando al API Gateway: {e}")
     
     print(f"\n📊 RESUMEN: {created} evaluaciones creadas")
     return created
@@ -205,7 +217,7 @@ def create_progreso():
     print("📈 CREANDO PROGRESO DE ESTUDIANTES")
     print("="*60 + "\n")
     
-    created = 0
+    filas = []
     for estudiante in ESTUDIANTES:
         print(f"\n👤 Estudiante: {estudiante}")
         
@@ -230,15 +242,26 @@ def create_progreso():
                 print(f"  {estado} {curso['titulo']}: {progreso['completado_pct']}% | Nota: {calificacion}/100")
             else:
                 print(f"  ⏳ {curso['titulo']}: {progreso['completado_pct']}% | En progreso")
-            
-            try:
-                # Punto 3: Gateway forwarding pattern
-                response = requests.post(f"{BASE_URL}/progreso/progreso", json=progreso, timeout=5)
-                if response.status_code in [200, 201]:
-                    created += 1
-            except Exception as e:
-                print(f"❌ Error: {e}")
-                break
+            filas.append(progreso)
+    
+    created = 0
+    try:
+        # Una sola petición NDJSON para todos los registros; el servicio los escribe por lotes
+        response = requests.post(
+            f"{BASE_URL}/progreso/progreso/bulk",
+            data="".join(json.dumps(fila) + "\n" for fila in filas).encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"},
+            timeout=60,
+        )
+        if response.status_code in [200, 201]:
+            resultado = response.json()
+            created = resultado.get("creados", 0) + resultado.get("actualizados", 0)
+            for error in resultado.get("detalle_errores", []):
+                print(f"⚠️  Error en la fila {error.get('fila')}: {error.get('error')}")
+        else:
+            print(f"⚠️  Error en la carga de progreso: {response.status_code}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
     
     print(f"\n📊 RESUMEN: {created} registros de progreso creados")
     return created
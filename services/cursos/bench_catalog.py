@@ -0,0 +1,76 @@
+"""
+Benchmark del listado de cursos: serialización en cada petición (antes)
+frente a los bytes cacheados de CatalogCache (después).
+
+Uso:
+    cd services/cursos
+    PYTHONPATH=../.. python bench_catalog.py --cursos 2000 --peticiones 500
+"""
+import argparse
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _legacy_app():
+    """Réplica del handler original: devuelve la lista y FastAPI la codifica en cada petición."""
+    legacy = FastAPI()
+
+    @legacy.get("/")
+    def list_cursos():
+        return {"cursos": main.DATA.get("cursos", [])}
+
+    return legacy
+
+
+def _seed(n):
+    for i in range(n):
+        main.create_curso(main.Curso(
+            id=f"bench-{i}",
+            titulo=f"Curso de prueba {i}",
+            descripcion="Descripción de relleno para el benchmark del catálogo " * 3,
+            instructor_id=f"inst{i % 7}",
+            duracion_horas=10 + i % 90,
+            rating=round(3.5 + (i % 15) / 10, 1),
+            nivel="Intermedio",
+        ))
+
+
+def _rps(client, peticiones, headers=None):
+    client.get("/", headers=headers)  # calentamiento (y construcción de la caché)
+    start = time.perf_counter()
+    for _ in range(peticiones):
+        r = client.get("/", headers=headers)
+        assert r.status_code in (200, 304)
+    return peticiones / (time.perf_counter() - start)
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cursos", type=int, default=2000)
+    parser.add_argument("--peticiones", type=int, default=500)
+    args = parser.parse_args()
+
+    _seed(args.cursos)
+    total = len(main.DATA["cursos"])
+    legacy = TestClient(_legacy_app())
+    cached = TestClient(main.app)
+    etag = cached.get("/").headers["ETag"]
+
+    results = [
+        ("antes (jsonable_encoder)", _rps(legacy, args.peticiones)),
+        ("después (bytes cacheados)", _rps(cached, args.peticiones, {"Accept-Encoding": "identity"})),
+        ("después (gzip precomprimido)", _rps(cached, args.peticiones, {"Accept-Encoding": "gzip"})),
+        ("después (If-None-Match → 304)", _rps(cached, args.peticiones, {"If-None-Match": etag})),
+    ]
+    print(f"Catálogo de {total} cursos, {args.peticiones} peticiones por caso")
+    base = results[0][1]
+    for name, rps in results:
+        print(f"  {name:<32} {rps:10.1f} req/s  (x{rps / base:.1f})")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,108 @@
+import gzip
+import json
+import threading
+import time
+from email.utils import formatdate
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se ofrece gzip
+    brotli = None
+
+from common.helpers.http_cache import encoded_etag, is_fresh, strong_etag
+
+# Por debajo de este tamaño comprimir no compensa la cabecera extra
+MIN_COMPRESS_SIZE = 1024
+
+
+class CatalogEntry:
+    """Un recurso del catálogo ya serializado, con su ETag y variantes comprimidas."""
+
+    __slots__ = ("body", "etag", "modified_at", "_encoded")
+
+    def __init__(self, body, modified_at):
+        self.body = body
+        self.etag = strong_etag(body)
+        self.modified_at = modified_at
+        self._encoded = {}
+
+    def headers(self, encoding=None):
+        return {
+            "ETag": encoded_etag(self.etag, encoding) if encoding else self.etag,
+            "Last-Modified": formatdate(self.modified_at, usegmt=True),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+
+    def encoded(self, encoding):
+        """Cuerpo comprimido con `encoding`; se calcula una sola vez por versión."""
+        data = self._encoded.get(encoding)
+        if data is None:
+            if encoding == "br":
+                data = brotli.compress(self.body)
+            else:
+                data = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self._encoded[encoding] = data
+        return data
+
+    def negotiate(self, accept_encoding):
+        """Codificación a usar según Accept-Encoding, o None para enviar el cuerpo tal cual."""
+        if not accept_encoding or len(self.body) < MIN_COMPRESS_SIZE:
+            return None
+        accepted = set()
+        for token in accept_encoding.split(","):
+            name, _, params = token.strip().partition(";")
+            if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(name.strip().lower())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def is_fresh(self, request_headers):
+        """True si la petición condicional del cliente sigue siendo válida (304)."""
+        return is_fresh(request_headers, self.etag, self.modified_at)
+
+
+def serialize(payload):
+    """Serializa igual que JSONResponse de FastAPI, para que el ETag describa los bytes enviados."""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class CatalogCache:
+    """
+    Guarda cada recurso y colección del catálogo ya serializado.
+
+    Las claves son "cursos", "curso:{id}", "modulos:{curso_id}" y
+    "lecciones:{modulo_id}". `loader(key)` devuelve los bytes JSON del recurso
+    o None si no existe, y puede apoyarse en otras claves ya cacheadas (por
+    ejemplo, la colección se arma con los fragmentos de cada curso). Tras
+    `invalidate` solo esas claves se reconstruyen en el siguiente acceso.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._entries = {}
+        # Reentrante: el loader de una colección pide los fragmentos de sus elementos
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                body = self._loader(key)
+                if body is None:
+                    return None
+                entry = CatalogEntry(body, time.time())
+                self._entries[key] = entry
+            return entry
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
@@ -0,0 +1,103 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Eventos que se conservan; un consumidor más atrasado recibe `truncado` y debe resincronizar
+CHANGE_FEED_MAXLEN = int(os.getenv("CHANGE_FEED_MAXLEN", "10000"))
+STREAM_KEY = "cursos:changes"
+SEQ_KEY = "cursos:changes:seq"
+
+# INCR + XADD en un solo paso para que el id del stream siga exactamente la secuencia
+_PUBLISH_SCRIPT = """
+local seq = redis.call('INCR', KEYS[2])
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], seq .. '-1', 'evento', ARGV[2])
+return seq
+"""
+
+
+def _event(tipo, curso_id, curso):
+    return {"tipo": tipo, "curso_id": curso_id, "curso": curso, "ts": time.time()}
+
+
+class LocalChangeFeed:
+    """Feed de cambios en memoria del proceso (sustituto de Redis Streams)."""
+
+    def __init__(self, maxlen=CHANGE_FEED_MAXLEN):
+        self._events = deque(maxlen=maxlen)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, tipo, curso_id, curso=None):
+        return self.publish_many([(tipo, curso_id, curso)])
+
+    def publish_many(self, changes):
+        with self._lock:
+            for tipo, curso_id, curso in changes:
+                self._seq += 1
+                self._events.append(dict(_event(tipo, curso_id, curso), seq=self._seq))
+            return self._seq
+
+    def since(self, seq, limit):
+        with self._lock:
+            # Un `since` por delante del feed indica que este se reinició (el proceso)
+            if seq > self._seq:
+                return [], self._seq, True
+            if not self._events:
+                return [], self._seq, seq < self._seq
+            first = self._events[0]["seq"]
+            # Las secuencias son contiguas: la posición se calcula sin buscar
+            start = max(0, seq + 1 - first)
+            events = list(itertools.islice(self._events, start, start + limit))
+            return events, self._seq, seq + 1 < first
+
+
+class RedisChangeFeed:
+    """Feed de cambios en un Redis Stream compartido por todas las réplicas."""
+
+    def __init__(self, client, maxlen=CHANGE_FEED_MAXLEN):
+        self._client = client
+        self._maxlen = maxlen
+        self._publish = client.register_script(_PUBLISH_SCRIPT)
+
+    def publish(self, tipo, curso_id, curso=None):
+        payload = json.dumps(_event(tipo, curso_id, curso), ensure_ascii=False)
+        return int(self._publish(keys=[STREAM_KEY, SEQ_KEY], args=[self._maxlen, payload]))
+
+    def publish_many(self, changes):
+        # Un solo viaje de red para todo el lote (altas masivas)
+        pipe = self._client.pipeline(transaction=False)
+        for tipo, curso_id, curso in changes:
+            payload = json.dumps(_event(tipo, curso_id, curso), ensure_ascii=False)
+            self._publish(keys=[STREAM_KEY, SEQ_KEY], args=[self._maxlen, payload], client=pipe)
+        results = pipe.execute()
+        return int(results[-1]) if results else int(self._client.get(SEQ_KEY) or 0)
+
+    def since(self, seq, limit):
+        last = int(self._client.get(SEQ_KEY) or 0)
+        if seq > last:
+            return [], last, True
+        entries = self._client.xrange(STREAM_KEY, min=f"{seq + 1}-0", max="+", count=limit)
+        events = []
+        for entry_id, fields in entries:
+            event = json.loads(fields[b"evento"])
+            event["seq"] = int(entry_id.split(b"-")[0])
+            events.append(event)
+        oldest = self._client.xrange(STREAM_KEY, min="-", max="+", count=1)
+        first = int(oldest[0][0].split(b"-")[0]) if oldest else last + 1
+        return events, last, seq + 1 < first
+
+
+def create_change_feed():
+    """Usa Redis Streams si Redis responde; si no, un feed local al proceso."""
+    try:
+        from database_redis import get_redis_client
+
+        client = get_redis_client(socket_connect_timeout=1, socket_timeout=2)
+        client.ping()
+        return RedisChangeFeed(client)
+    except Exception as e:
+        print(f"Redis no disponible para el feed de cambios ({e}); usando feed local")
+        return LocalChangeFeed()
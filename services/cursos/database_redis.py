@@ -4,9 +4,9 @@ import os
 # Obtén la URL de la base de datos de las variables de entorno
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis-db:6379/0")
 
-# Crea el cliente de Redis
-def get_redis_client():
-    return redis.from_url(REDIS_URL)
+# Crea el cliente de Redis (kwargs opcionales, p. ej. timeouts de conexión)
+def get_redis_client(**kwargs):
+    return redis.from_url(REDIS_URL, **kwargs)
 
 # Ejemplo de uso:
 # redis_client = get_redis_client()
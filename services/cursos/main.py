@@ -1,6 +1,13 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
 from typing import Optional
+import json
+import threading
+
+from catalog_cache import CatalogCache, serialize
+from change_feed import create_change_feed
 
 app = FastAPI(title="Cursos Service")
 
@@ -48,9 +55,88 @@ DATA = {
 }
 
 
+# Índice por id sobre DATA["cursos"] (la lista conserva el orden del listado)
+CURSOS_POR_ID = {c["id"]: c for c in DATA["cursos"]}
+_write_lock = threading.Lock()
+# Se publica dentro de _write_lock para que el orden del feed sea el de las escrituras
+change_feed = create_change_feed()
+
+
+def _load_catalog(key):
+    """Bytes JSON de cada clave del catálogo (ver CatalogCache) o None si no existe."""
+    kind, _, ident = key.partition(":")
+    if kind == "cursos":
+        # Se arma con los fragmentos ya serializados de cada curso:
+        # un alta solo re-serializa el curso nuevo, no todo el catálogo.
+        # Sin _write_lock (el escritor invalida con él tomado): un curso que se
+        # borra mientras tanto ya no tiene fragmento y se omite; la invalidación
+        # del borrado descarta después esta versión.
+        entries = [catalog_cache.get(f"curso:{c['id']}") for c in DATA.get("cursos", [])]
+        return b'{"cursos":[' + b",".join(e.body for e in entries if e is not None) + b"]}"
+    if kind == "curso" and ident in CURSOS_POR_ID:
+        return serialize(CURSOS_POR_ID[ident])
+    if kind == "modulos" and ident in DATA.get("modulos", {}):
+        return serialize({"modulos": DATA["modulos"][ident]})
+    if kind == "lecciones" and ident in DATA.get("lecciones", {}):
+        return serialize({"lecciones": DATA["lecciones"][ident]})
+    if kind == "tree":
+        curso_id, _, depth = ident.rpartition(":")
+        tree = _build_tree(curso_id, depth)
+        return serialize(tree) if tree is not None else None
+    return None
+
+
+TREE_INCLUDES = ("modulos", "lecciones")
+
+
+def _curso_keys(curso_id):
+    """Claves de caché que dependen del documento de un curso."""
+    return [f"curso:{curso_id}"] + [f"tree:{curso_id}:{depth}" for depth in ("curso",) + TREE_INCLUDES]
+
+
+def _build_tree(curso_id, depth):
+    """Curso con sus módulos (y las lecciones de cada uno) a partir de los índices en memoria."""
+    curso = CURSOS_POR_ID.get(curso_id)
+    if curso is None:
+        return None
+    tree = dict(curso)
+    if depth in TREE_INCLUDES:
+        modulos = []
+        for m in DATA.get("modulos", {}).get(curso_id, []):
+            m = dict(m)
+            if depth == "lecciones":
+                m["lecciones"] = DATA.get("lecciones", {}).get(m["id"], [])
+            modulos.append(m)
+        tree["modulos"] = modulos
+    return tree
+
+
+catalog_cache = CatalogCache(_load_catalog)
+
+
+def _cached_response(key, request: Request):
+    """
+    Respuesta servida directamente desde los bytes cacheados: 304 si el
+    cliente ya tiene la versión, o el cuerpo (comprimido si lo acepta).
+    Devuelve None si la clave no existe en el catálogo.
+    """
+    entry = catalog_cache.get(key)
+    if entry is None:
+        return None
+    encoding = entry.negotiate(request.headers.get("accept-encoding"))
+    if entry.is_fresh(request.headers):
+        # El 304 lleva el ETag de la representación que se habría enviado
+        return Response(status_code=304, headers=entry.headers(encoding))
+    if encoding is None:
+        return Response(content=entry.body, media_type="application/json", headers=entry.headers())
+    headers = entry.headers(encoding)
+    headers["Content-Encoding"] = encoding
+    return Response(content=entry.encoded(encoding), media_type="application/json", headers=headers)
+
+
 @app.get("/")
-def list_cursos():
-    return {"cursos": DATA.get("cursos", [])}
+def list_cursos(request: Request):
+    return _cached_response("cursos", request)
 
 
 @app.get("/health")
@@ -58,32 +144,203 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/changes")
+def list_changes(since: int = 0, limit: int = 500):
+    """
+    Eventos create/update/delete con secuencia mayor que `since`, en orden.
+    Si `truncado` es true el consumidor se atrasó más de lo que guarda el feed
+    (o el feed se reinició) y debe recargar el catálogo completo antes de
+    seguir desde `ultimo`.
+    """
+    limit = max(1, min(limit, 5000))
+    cambios, ultimo, truncado = change_feed.since(since, limit)
+    return {"cambios": cambios, "ultimo": ultimo, "truncado": truncado}
+
+
 @app.get("/{curso_id}")
-def get_curso(curso_id: str):
-    for c in DATA.get("cursos", []):
-        if c.get("id") == curso_id:
-            return c
-    raise HTTPException(status_code=404, detail="Curso no encontrado")
+def get_curso(curso_id: str, request: Request):
+    cached = _cached_response(f"curso:{curso_id}", request)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    return cached
 
 
 @app.get("/{curso_id}/modulos")
-def get_modulos(curso_id: str):
-    return {"modulos": DATA.get("modulos", {}).get(curso_id, [])}
+def get_modulos(curso_id: str, request: Request):
+    cached = _cached_response(f"modulos:{curso_id}", request)
+    if cached is None:
+        return {"modulos": []}
+    return cached
+
+
+@app.get("/{curso_id}/tree")
+def get_curso_tree(curso_id: str, request: Request, include: str = "modulos,lecciones"):
+    """
+    Curso con sus módulos y lecciones en una sola respuesta.
+    `include` elige la profundidad: "" (solo el curso), "modulos" o "modulos,lecciones".
+    """
+    parts = {p.strip() for p in include.split(",") if p.strip()}
+    if not parts <= set(TREE_INCLUDES):
+        raise HTTPException(status_code=400, detail=f"include admite: {', '.join(TREE_INCLUDES)}")
+    # "lecciones" implica "modulos": la profundidad es el nivel más profundo pedido
+    depth = "lecciones" if "lecciones" in parts else "modulos" if parts else "curso"
+    cached = _cached_response(f"tree:{curso_id}:{depth}", request)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Curso no encontrado")
+    return cached
 
 
 @app.get("/modulos/{modulo_id}/lecciones")
-def get_lecciones(modulo_id: str):
-    return {"lecciones": DATA.get("lecciones", {}).get(modulo_id, [])}
+def get_lecciones(modulo_id: str, request: Request):
+    cached = _cached_response(f"lecciones:{modulo_id}", request)
+    if cached is None:
+        return {"lecciones": []}
+    return cached
 
 
 @app.post("/cursos")
 def create_curso(curso: Curso):
     """Crear un nuevo curso"""
-    # Verificar si ya existe
-    for c in DATA.get("cursos", []):
-        if c.get("id") == curso.id:
+    with _write_lock:
+        # Verificar si ya existe
+        if curso.id in CURSOS_POR_ID:
             raise HTTPException(status_code=400, detail="Curso ya existe")
-    
-    DATA["cursos"].append(curso.dict())
-    return {"message": "Curso creado", "curso": curso.dict()}
 
+        doc = curso.dict()
+        DATA["cursos"].append(doc)
+        CURSOS_POR_ID[curso.id] = doc
+        # Solo cambian la colección y el propio curso; módulos y lecciones conservan su caché
+        catalog_cache.invalidate("cursos", *_curso_keys(curso.id))
+        change_feed.publish("create", curso.id, doc)
+    return {"message": "Curso creado", "curso": doc}
+
+
+@app.put("/{curso_id}")
+def update_curso(curso_id: str, curso: Curso):
+    """Actualizar un curso existente"""
+    if curso.id != curso_id:
+        raise HTTPException(status_code=400, detail="El id del cuerpo no coincide con la ruta")
+    with _write_lock:
+        old = CURSOS_POR_ID.get(curso_id)
+        if old is None:
+            raise HTTPException(status_code=404, detail="Curso no encontrado")
+        doc = curso.dict()
+        # Se sustituye el objeto (no se muta) para no alterar lo que otro hilo esté serializando
+        cursos = DATA["cursos"]
+        cursos[next(i for i, c in enumerate(cursos) if c is old)] = doc
+        CURSOS_POR_ID[curso_id] = doc
+        catalog_cache.invalidate("cursos", *_curso_keys(curso_id))
+        change_feed.publish("update", curso_id, doc)
+    return {"message": "Curso actualizado", "curso": doc}
+
+
+@app.delete("/{curso_id}")
+def delete_curso(curso_id: str):
+    """Eliminar un curso"""
+    with _write_lock:
+        old = CURSOS_POR_ID.pop(curso_id, None)
+        if old is None:
+            raise HTTPException(status_code=404, detail="Curso no encontrado")
+        DATA["cursos"] = [c for c in DATA["cursos"] if c is not old]
+        catalog_cache.invalidate("cursos", *_curso_keys(curso_id))
+        change_feed.publish("delete", curso_id)
+    return {"message": "Curso eliminado", "curso_id": curso_id}
+
+
+# Filas que se validan juntas antes de pasar a la escritura
+BULK_BATCH_SIZE = 1000
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def _read_bulk_rows(request: Request):
+    """
+    Lee el cuerpo como array JSON o NDJSON (una fila por línea).
+    Devuelve una lista de (fila, dict) o (fila, str con el error de parseo).
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in NDJSON_CONTENT_TYPES:
+        try:
+            data = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="Se esperaba un array JSON de cursos")
+        return list(enumerate(data))
+
+    # NDJSON: se parsea línea a línea a medida que llega el cuerpo
+    rows = []
+    buffer = b""
+
+    def parse(line):
+        if line.strip():
+            try:
+                rows.append((len(rows), json.loads(line)))
+            except ValueError as e:
+                rows.append((len(rows), f"JSON inválido: {e}"))
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            parse(line)
+    parse(buffer)
+    return rows
+
+
+def _ingest_cursos(rows, atomic):
+    """Valida por lotes y escribe todas las filas válidas de una vez."""
+    results = []
+    valid = []
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        for fila, row in rows[start:start + BULK_BATCH_SIZE]:
+            if isinstance(row, str):
+                results.append({"fila": fila, "status": "invalido", "error": row})
+                continue
+            if not isinstance(row, dict):
+                results.append({"fila": fila, "status": "invalido", "error": "Se esperaba un objeto JSON"})
+                continue
+            try:
+                curso = Curso(**row)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                results.append({"fila": fila, "id": row.get("id"), "status": "invalido", "error": error})
+                continue
+            valid.append((fila, curso.dict()))
+
+    with _write_lock:
+        # Los duplicados se comprueban bajo el lock contra el índice por id: O(1) por fila
+        seen = set()
+        to_insert = []
+        for fila, doc in valid:
+            if doc["id"] in CURSOS_POR_ID or doc["id"] in seen:
+                error = "Curso ya existe" if doc["id"] in CURSOS_POR_ID else "Id repetido en el lote"
+                results.append({"fila": fila, "id": doc["id"], "status": "duplicado", "error": error})
+                continue
+            seen.add(doc["id"])
+            to_insert.append((fila, doc))
+
+        failed = len(results)
+        if not (atomic and failed):
+            # Una sola escritura para todo el lote: el catálogo nunca queda a medias
+            DATA["cursos"].extend(doc for _, doc in to_insert)
+            CURSOS_POR_ID.update((doc["id"], doc) for _, doc in to_insert)
+            catalog_cache.invalidate("cursos", *(k for _, doc in to_insert for k in _curso_keys(doc["id"])))
+            change_feed.publish_many([("create", doc["id"], doc) for _, doc in to_insert])
+            results.extend({"fila": fila, "id": doc["id"], "status": "creado"} for fila, doc in to_insert)
+
+    results.sort(key=lambda r: r["fila"])
+    created = len(results) - failed if not (atomic and failed) else 0
+    return {"total": len(rows), "creados": created, "errores": failed, "resultados": results}
+
+
+@app.post("/cursos/bulk")
+async def create_cursos_bulk(request: Request, atomic: bool = False):
+    """
+    Alta masiva de cursos desde un array JSON o NDJSON (Content-Type: application/x-ndjson).
+    Con `atomic=true` no se escribe nada si alguna fila es inválida o duplicada.
+    """
+    rows = await _read_bulk_rows(request)
+    summary = await run_in_threadpool(_ingest_cursos, rows, atomic)
+    if atomic and summary["errores"]:
+        return JSONResponse(status_code=400, content=summary)
+    return summary
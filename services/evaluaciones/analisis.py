@@ -0,0 +1,187 @@
+import bisect
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Intentos que se leen y codifican por lote al ponerse al día
+ANALISIS_LOTE = int(os.getenv("ANALISIS_LOTE", "50000"))
+# Segundos que se vuelven a leer hacia atrás: un intento con id menor puede
+# confirmarse después que otros con id mayor (escritores de otras réplicas)
+ANALISIS_MARGEN = float(os.getenv("ANALISIS_MARGEN", "10"))
+# Como mucho se recuerdan (y se releen) los ids de tantos intentos recientes
+ANALISIS_RELECTURA = int(os.getenv("ANALISIS_RELECTURA", "10000"))
+# Fracción de estudiantes en los grupos superior e inferior (Kelley)
+GRUPO = 0.27
+
+
+def _fraccion_grupo(por_puntaje, tamano):
+    """
+    Fracción de los estudiantes con cada puntaje que entra en el grupo formado
+    por los `tamano` primeros de `por_puntaje`; en el puntaje de corte se toma
+    la parte proporcional.
+    """
+    antes = np.cumsum(por_puntaje) - por_puntaje
+    tomados = np.clip(tamano - antes, 0, por_puntaje)
+    return np.divide(tomados, por_puntaje, out=np.zeros_like(tomados), where=por_puntaje > 0)
+
+
+class AnalisisItems:
+    """
+    Análisis de ítems de un cuestionario, acumulado de forma incremental.
+
+    Se guardan solo conteos por puntaje total x (número de aciertos):
+    cuántos estudiantes tienen x, cuántos de ellos aciertan cada pregunta y
+    cuántos eligen cada opción. Como x es discreto, con eso se obtienen de
+    forma exacta la dificultad, los grupos superior/inferior del 27 %, la
+    correlación punto-biserial ítem-resto y el análisis de distractores, y
+    agregar intentos nuevos es sumar sus conteos.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.ultimo_id = 0
+        self.n = 0
+        m = len(key.pregunta_ids)
+        # Columnas de elección: las opciones, "otra" (valor desconocido o varias) y "sin respuesta"
+        self._cols = (int(key.rangos.max()) if m else 0) + 2
+        self.por_puntaje = np.zeros(m + 1, dtype=np.int64)
+        self.aciertos = np.zeros((m + 1, m), dtype=np.int64)
+        self.elecciones = np.zeros((m + 1, m, self._cols), dtype=np.int64)
+        self._resultado = None
+        # (instante, ultimo_id) de las puestas al día dentro del margen, ids ya
+        # sumados (ordenados) y piso: por debajo no se relee
+        self._marcas = deque([(float("-inf"), 0)])
+        self._contados = []
+        self._piso = 0
+        self._lock = threading.Lock()
+
+    def agregar(self, indices, multiples=()):
+        """Suma un bloque de envíos ya codificados con `AnswerKey.encode_many`."""
+        m = len(self.key.pregunta_ids)
+        if not len(indices) or m == 0:
+            self.n += len(indices)
+            return
+        aciertos = self.key.aciertos(indices, multiples)
+        puntaje = aciertos.sum(axis=1)
+        celda = puntaje[:, None] * m + np.arange(m)
+        self.n += len(indices)
+        self.por_puntaje += np.bincount(puntaje, minlength=m + 1)
+        self.aciertos += np.bincount(celda[aciertos], minlength=(m + 1) * m).reshape(m + 1, m)
+        indices = indices.astype(np.int64)
+        # OTRA (63) y los índices de respuestas no enteras caen en la columna "otra"
+        columna = np.where(indices < 0, self._cols - 1, np.minimum(indices, self._cols - 2))
+        self.elecciones += np.bincount(
+            (celda * self._cols + columna).ravel(), minlength=(m + 1) * m * self._cols
+        ).reshape(m + 1, m, self._cols)
+        self._resultado = None
+
+    def _olvidar(self, hasta):
+        """Sube el piso a `hasta` y descarta los ids sumados que quedan por debajo."""
+        self._piso = max(self._piso, hasta)
+        del self._contados[:bisect.bisect_right(self._contados, self._piso)]
+
+    def ponerse_al_dia(self, leer):
+        """
+        Incorpora los intentos que todavía no se sumaron. `leer(ultimo_id, limite)`
+        devuelve filas (id, respuestas) con id creciente. Se relee desde el
+        último id que se tenía hace ANALISIS_MARGEN segundos (sin pasar de los
+        ANALISIS_RELECTURA intentos más recientes), así un intento confirmado
+        fuera de orden dentro de ese margen no se pierde; los ids ya sumados
+        se saltan.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            while len(self._marcas) > 1 and self._marcas[1][0] <= ahora - ANALISIS_MARGEN:
+                self._marcas.popleft()
+            self._olvidar(self._marcas[0][1])
+            desde = self._piso
+            while True:
+                filas = leer(desde, ANALISIS_LOTE)
+                if not filas:
+                    break
+                nuevas = []
+                for i, respuestas in filas:
+                    j = bisect.bisect_left(self._contados, i)
+                    if j < len(self._contados) and self._contados[j] == i:
+                        continue
+                    self._contados.insert(j, i)
+                    nuevas.append(respuestas or {})
+                if nuevas:
+                    self.agregar(*self.key.encode_many(nuevas))
+                desde = filas[-1][0]
+                self.ultimo_id = max(self.ultimo_id, desde)
+                sobran = len(self._contados) - ANALISIS_RELECTURA
+                if sobran > 0:
+                    self._olvidar(self._contados[sobran - 1])
+            if self.ultimo_id != self._marcas[-1][1]:
+                self._marcas.append((ahora, self.ultimo_id))
+            if self._resultado is None:
+                self._resultado = self._calcular()
+            return self._resultado
+
+    def _calcular(self):
+        key = self.key
+        m = len(key.pregunta_ids)
+        n = self.n
+        resultado = {"n": n, "ultimo_intento": self.ultimo_id, "media": None, "kr20": None, "preguntas": []}
+        if n == 0 or m == 0:
+            return resultado
+
+        x = np.arange(m + 1, dtype=np.float64)
+        n_x = self.por_puntaje.astype(np.float64)
+        k_xj = self.aciertos.astype(np.float64)
+        suma_x, suma_x2 = n_x @ x, n_x @ (x * x)
+        c = k_xj.sum(axis=0)            # aciertos por pregunta
+        t = x @ k_xj                    # suma del puntaje de quienes aciertan
+        p = c / n
+        varianza = suma_x2 / n - (suma_x / n) ** 2
+
+        # Punto-biserial ítem-resto: correlación entre acertar j y el puntaje sin j
+        suma_r = suma_x - c
+        suma_r2 = suma_x2 - 2 * t + c
+        suma_ir = t - c
+        num = n * suma_ir - c * suma_r
+        den = np.sqrt(np.maximum(n * c - c * c, 0) * np.maximum(n * suma_r2 - suma_r * suma_r, 0))
+        biserial = np.divide(num, den, out=np.full(m, np.nan), where=den > 0)
+
+        # Grupos superior e inferior del 27 %
+        tamano = GRUPO * n
+        superior = _fraccion_grupo(n_x[::-1], tamano)[::-1]
+        inferior = _fraccion_grupo(n_x, tamano)
+        p_superior = superior @ k_xj / tamano
+        p_inferior = inferior @ k_xj / tamano
+
+        elecciones = self.elecciones.astype(np.float64)
+        total_op = elecciones.sum(axis=0)
+        sup_op = np.einsum("x,xjo->jo", superior, elecciones) / tamano
+        inf_op = np.einsum("x,xjo->jo", inferior, elecciones) / tamano
+
+        resultado["media"] = float(suma_x / n)
+        # KR-20: confiabilidad de la prueba completa
+        if m > 1 and varianza > 0:
+            resultado["kr20"] = float(m / (m - 1) * (1 - (p * (1 - p)).sum() / varianza))
+        for j, pid in enumerate(key.pregunta_ids):
+            opciones = [
+                {
+                    "opcion": o,
+                    "correcta": bool(key._correctas[j, o]),
+                    "n": int(total_op[j, o]),
+                    "p": float(total_op[j, o] / n),
+                    "p_superior": float(sup_op[j, o]),
+                    "p_inferior": float(inf_op[j, o]),
+                }
+                for o in range(int(key.rangos[j]))
+            ]
+            resultado["preguntas"].append({
+                "pregunta_id": pid,
+                "dificultad": float(p[j]),
+                "discriminacion": float(p_superior[j] - p_inferior[j]),
+                "punto_biserial": None if np.isnan(biserial[j]) else float(biserial[j]),
+                "opciones": opciones,
+                "otra": int(total_op[j, int(key.rangos[j]):self._cols - 1].sum()),
+                "sin_respuesta": int(total_op[j, self._cols - 1]),
+            })
+        return resultado
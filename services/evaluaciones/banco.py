@@ -0,0 +1,215 @@
+import hashlib
+import secrets
+
+import numpy as np
+
+# Constantes de SplitMix64
+_GOLDEN = 0x9E3779B97F4A7C15
+_M1 = 0xBF58476D1CE4E5B9
+_M2 = 0x94D049BB133111EB
+_MASK = (1 << 64) - 1
+# Rangos de contadores: sorteo de cada sección, su barajado y el de las opciones
+_BARAJAR = 1 << 16
+_OPCIONES = 1 << 62
+# Cada clave de opciones da los sorteos de hasta 8 posiciones (dígitos de base m + 1,
+# como mucho 63: 8 dígitos usan 48 de sus 64 bits)
+_DIGITOS = 8
+
+
+def _clave(semilla, contador):
+    """SplitMix64 de (semilla, contador): el mismo valor que `_claves` con enteros de Python."""
+    x = (semilla + contador * _GOLDEN) & _MASK
+    x = ((x ^ (x >> 30)) * _M1) & _MASK
+    x = ((x ^ (x >> 27)) * _M2) & _MASK
+    return x ^ (x >> 31)
+
+
+def _claves(semillas, contador):
+    """SplitMix64 vectorizado: una clave por semilla (la aritmética uint64 ya es módulo 2**64)."""
+    with np.errstate(over="ignore"):
+        x = semillas + np.uint64(contador) * np.uint64(_GOLDEN)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(_M1)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(_M2)
+    return x ^ (x >> np.uint64(31))
+
+
+class BancoPreguntas:
+    """
+    Banco de preguntas indexado por (curso_id, tema, dificultad).
+
+    Las preguntas no se modifican una vez agregadas: las plantillas guardan
+    referencias a ellas y cada examen se reconstruye a partir de esas referencias.
+    """
+
+    def __init__(self):
+        self.preguntas = {}
+        self._indice = {}
+
+    def agregar(self, pregunta):
+        if pregunta["id"] in self.preguntas:
+            raise ValueError(f"La pregunta {pregunta['id']} ya existe en el banco")
+        self.preguntas[pregunta["id"]] = pregunta
+        key = (pregunta["curso_id"], pregunta["tema"], pregunta["dificultad"])
+        self._indice.setdefault(key, []).append(pregunta["id"])
+
+    def buscar(self, curso_id=None, tema=None, dificultad=None):
+        """Ids de las preguntas que cumplen los filtros dados, en orden de alta."""
+        ids = []
+        for (c, t, d), grupo in self._indice.items():
+            if curso_id not in (None, c) or tema not in (None, t) or dificultad not in (None, d):
+                continue
+            ids.extend(grupo)
+        return ids
+
+
+class Plantilla:
+    """
+    Plantilla de examen: secciones (tema, dificultad, cantidad) con sus
+    preguntas candidatas congeladas al crearla.
+
+    El examen de cada estudiante no se guarda: se deriva de una semilla
+    blake2b(estudiante_id, clave=sal) y se vuelve a derivar al calificar.
+    Con base de datos la plantilla se guarda con su sal (crud.guardar_plantilla).
+    """
+
+    def __init__(self, id, curso_id, titulo, secciones, candidatas, barajar_opciones=True, sal=None):
+        self.id = id
+        self.curso_id = curso_id
+        self.titulo = titulo
+        self.secciones = secciones
+        self.barajar_opciones = barajar_opciones
+        # La sal es secreta y propia de la plantilla: un estudiante no puede calcular el examen de otro
+        self.sal = sal or secrets.token_bytes(16)
+        # Candidatas de todas las secciones en una sola lista; cada sección es un tramo
+        self._preguntas = [p for grupo in candidatas for p in grupo]
+        self._tramos = []
+        inicio = 0
+        for seccion, grupo in zip(secciones, candidatas):
+            self._tramos.append((inicio, len(grupo), seccion["cantidad"]))
+            inicio += len(grupo)
+        self._vistas = [{k: v for k, v in p.items() if k not in ("respuesta", "curso_id")} for p in self._preguntas]
+        self._n_opciones = [len(p.get("opciones") or []) for p in self._preguntas]
+        self._max_opciones = max(self._n_opciones, default=0)
+
+    @classmethod
+    def crear(cls, banco, id, curso_id, titulo, secciones, barajar_opciones=True):
+        candidatas = []
+        for seccion in secciones:
+            ids = banco.buscar(curso_id, seccion["tema"], seccion["dificultad"])
+            if len(ids) < seccion["cantidad"]:
+                raise ValueError(
+                    f"El banco solo tiene {len(ids)} preguntas de {seccion['tema']} "
+                    f"({seccion['dificultad']}); se piden {seccion['cantidad']}"
+                )
+            candidatas.append([banco.preguntas[pid] for pid in ids])
+        return cls(id, curso_id, titulo, secciones, candidatas, barajar_opciones)
+
+    def candidatas(self):
+        """Las preguntas candidatas de cada sección, como se pasan al constructor."""
+        return [self._preguntas[inicio:inicio + tamano] for inicio, tamano, _ in self._tramos]
+
+    def semilla(self, estudiante_id):
+        digest = hashlib.blake2b(str(estudiante_id).encode(), digest_size=8, key=self.sal).digest()
+        return int.from_bytes(digest, "little")
+
+    # El sorteo es Floyd (muestra sin reemplazo) seguido de Fisher-Yates, con cada
+    # número aleatorio derivado de (semilla, contador). `ensamblar_uno` lo hace con
+    # enteros de Python para un estudiante y `ensamblar` con NumPy para muchos;
+    # ambos dan exactamente el mismo examen.
+
+    def ensamblar_uno(self, estudiante_id):
+        """Examen de un estudiante: `(elegidas, orden)` como listas (ver `ensamblar`)."""
+        semilla = self.semilla(estudiante_id)
+        elegidas = []
+        for k, (inicio, tamano, cantidad) in enumerate(self._tramos):
+            muestra = []
+            for m, j in enumerate(range(tamano - cantidad, tamano)):
+                t = _clave(semilla, (k << 32) | m) % (j + 1)
+                muestra.append(j if t in muestra else t)
+            for m in range(cantidad - 1, 0, -1):
+                r = _clave(semilla, (k << 32) | _BARAJAR | m) % (m + 1)
+                muestra[m], muestra[r] = muestra[r], muestra[m]
+            elegidas.extend(inicio + t for t in muestra)
+        orden = []
+        for q, posicion in enumerate(elegidas):
+            opciones = list(range(self._n_opciones[posicion]))
+            if self.barajar_opciones:
+                x = 0
+                for m in range(len(opciones) - 1, 0, -1):
+                    if m % _DIGITOS == _DIGITOS - 1 or m == len(opciones) - 1:
+                        x = _clave(semilla, _OPCIONES | (q << 8) | (m // _DIGITOS))
+                    x, r = divmod(x, m + 1)
+                    opciones[m], opciones[r] = opciones[r], opciones[m]
+            orden.append(opciones)
+        return elegidas, orden
+
+    def ensamblar(self, estudiantes):
+        """
+        Exámenes de varios estudiantes a la vez. Devuelve `(elegidas, orden)`:
+        `elegidas[i, q]` es la posición (en las candidatas) de la pregunta q del
+        estudiante i y `orden[i, q]` el orden en que se muestran sus opciones.
+        """
+        semillas = np.fromiter((self.semilla(e) for e in estudiantes), dtype=np.uint64, count=len(estudiantes))
+        n = len(semillas)
+        filas = np.arange(n)
+        columnas = []
+        for k, (inicio, tamano, cantidad) in enumerate(self._tramos):
+            muestra = np.empty((n, cantidad), dtype=np.int64)
+            for m, j in enumerate(range(tamano - cantidad, tamano)):
+                t = (_claves(semillas, (k << 32) | m) % np.uint64(j + 1)).astype(np.int64)
+                repetida = (muestra[:, :m] == t[:, None]).any(axis=1)
+                muestra[:, m] = np.where(repetida, j, t)
+            for m in range(cantidad - 1, 0, -1):
+                r = (_claves(semillas, (k << 32) | _BARAJAR | m) % np.uint64(m + 1)).astype(np.int64)
+                muestra[filas, m], muestra[filas, r] = muestra[filas, r], muestra[:, m].copy()
+            columnas.append(muestra + inicio)
+        elegidas = np.hstack(columnas) if columnas else np.zeros((n, 0), dtype=np.int64)
+
+        q = elegidas.shape[1]
+        orden = np.broadcast_to(np.arange(self._max_opciones), (n, q, self._max_opciones)).copy()
+        if self.barajar_opciones:
+            n_opciones = np.array(self._n_opciones, dtype=np.int64)[elegidas]
+            for j in range(q):
+                columna = orden[:, j]
+                x = np.zeros(n, dtype=np.uint64)
+                for m in range(self._max_opciones - 1, 0, -1):
+                    # Solo barajan (y consumen dígitos) las preguntas que tienen la opción m
+                    activa = m < n_opciones[:, j]
+                    nueva = activa & ((m % _DIGITOS == _DIGITOS - 1) | (m == n_opciones[:, j] - 1))
+                    if nueva.any():
+                        x = np.where(nueva, _claves(semillas, _OPCIONES | (j << 8) | (m // _DIGITOS)), x)
+                    base = np.uint64(m + 1)
+                    r = np.where(activa, x % base, m).astype(np.int64)
+                    x = np.where(activa, x // base, x)
+                    columna[filas, m], columna[filas, r] = columna[filas, r], columna[:, m].copy()
+        return elegidas, orden
+
+    @staticmethod
+    def _filas(elegidas, orden):
+        if isinstance(elegidas, np.ndarray):
+            return elegidas.tolist(), orden.tolist()
+        return elegidas, orden
+
+    def examen(self, elegidas, orden):
+        """Vista para el estudiante (sin respuestas) de `ensamblar_uno` o de una fila de `ensamblar`."""
+        preguntas = []
+        for posicion, opciones_orden in zip(*self._filas(elegidas, orden)):
+            vista = self._vistas[posicion]
+            opciones = vista.get("opciones") or []
+            preguntas.append(dict(vista, opciones=[opciones[o] for o in opciones_orden[:len(opciones)]]))
+        return {"id": self.id, "titulo": self.titulo, "preguntas": preguntas}
+
+    def cuestionario(self, elegidas, orden):
+        """Cuestionario con las respuestas ya traducidas al orden mostrado, para AnswerKey.compile."""
+        preguntas = []
+        for posicion, opciones_orden in zip(*self._filas(elegidas, orden)):
+            pregunta = self._preguntas[posicion]
+            n = self._n_opciones[posicion]
+            mostrada = {original: d for d, original in enumerate(opciones_orden[:n])}
+            respuesta = pregunta.get("respuesta")
+            if isinstance(respuesta, list):
+                respuesta = [mostrada.get(r, r) if type(r) is int else r for r in respuesta]
+            elif type(respuesta) is int:
+                respuesta = mostrada.get(respuesta, respuesta)
+            preguntas.append(dict(pregunta, respuesta=respuesta))
+        return {"id": self.id, "titulo": self.titulo, "preguntas": preguntas}
@@ -0,0 +1,105 @@
+"""
+Benchmark del análisis de ítems: recalcular desde cero sobre todos los
+intentos frente a los conteos incrementales de AnalisisItems.
+
+Uso:
+    cd services/evaluaciones
+    python bench_analisis.py --intentos 1000000 --preguntas 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from analisis import GRUPO, AnalisisItems
+from grading import AnswerKey
+
+
+def _cuestionario(m, rng):
+    return {
+        "id": "bench",
+        "preguntas": [
+            {"id": f"p{j}", "tipo": "opcion", "opciones": ["a", "b", "c", "d"], "respuesta": int(rng.integers(4))}
+            for j in range(m)
+        ],
+    }
+
+
+def _respuestas(key, n, rng):
+    """Respuestas simuladas con un modelo logístico (habilidad del estudiante y dificultad del ítem)."""
+    m = len(key.pregunta_ids)
+    habilidad = rng.normal(size=(n, 1))
+    dificultad = rng.normal(size=m)
+    acierta = rng.random((n, m)) < 1 / (1 + np.exp(-(habilidad - dificultad)))
+    correcta = np.array([int(np.flatnonzero(key._correctas[j, :4])[0]) for j in range(m)])
+    distractor = (correcta + rng.integers(1, 4, size=(n, m))) % 4
+    elegida = np.where(acierta, correcta, distractor)
+    elegida[rng.random((n, m)) < 0.02] = -1  # algunas sin responder
+    ids = key.pregunta_ids
+    return [{ids[j]: v for j, v in enumerate(fila) if v >= 0} for fila in elegida.tolist()]
+
+
+def _desde_cero(key, indices):
+    """Recalcula dificultad, discriminación 27 % y punto-biserial sobre la matriz completa."""
+    aciertos = key.aciertos(indices)
+    n = len(aciertos)
+    puntaje = aciertos.sum(axis=1)
+    orden = np.argsort(puntaje, kind="stable")
+    g = int(round(GRUPO * n))
+    p_inf = aciertos[orden[:g]].mean(axis=0)
+    p_sup = aciertos[orden[-g:]].mean(axis=0)
+    resto = puntaje[:, None] - aciertos
+    biserial = [np.corrcoef(aciertos[:, j], resto[:, j])[0, 1] for j in range(aciertos.shape[1])]
+    return aciertos.mean(axis=0), p_sup - p_inf, np.array(biserial)
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--intentos", type=int, default=1_000_000)
+    parser.add_argument("--preguntas", type=int, default=20)
+    parser.add_argument("--nuevos", type=int, default=1000, help="intentos que llegan entre dos consultas")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    key = AnswerKey.compile(_cuestionario(args.preguntas, rng))
+    print(f"Generando {args.intentos} intentos de {args.preguntas} preguntas...")
+    filas = list(enumerate(_respuestas(key, args.intentos + args.nuevos, rng), start=1))
+    iniciales = args.intentos
+
+    def leer(ultimo_id, limite):
+        return filas[ultimo_id:min(ultimo_id + limite, iniciales)]
+
+    analisis = AnalisisItems(key)
+    start = time.perf_counter()
+    resultado = analisis.ponerse_al_dia(leer)
+    t_inicial = time.perf_counter() - start
+
+    indices, _ = key.encode_many([r for _, r in filas[:iniciales]])
+    start = time.perf_counter()
+    dificultad, discriminacion, biserial = _desde_cero(key, indices)
+    t_cero = time.perf_counter() - start
+
+    preguntas = resultado["preguntas"]
+    assert np.allclose(dificultad, [p["dificultad"] for p in preguntas])
+    assert np.allclose(biserial, [p["punto_biserial"] for p in preguntas])
+    # Los grupos desde cero cortan los empates por orden de llegada; aquí se reparten
+    assert np.allclose(discriminacion, [p["discriminacion"] for p in preguntas], atol=0.02)
+
+    start = time.perf_counter()
+    analisis.ponerse_al_dia(leer)
+    t_cache = time.perf_counter() - start
+
+    iniciales += args.nuevos
+    start = time.perf_counter()
+    analisis.ponerse_al_dia(leer)
+    t_incremental = time.perf_counter() - start
+
+    print(f"  primera consulta (ingesta de {args.intentos})   {t_inicial:8.3f} s")
+    print(f"  recalcular desde cero (ya codificados)     {t_cero:8.3f} s")
+    print(f"  consulta sin intentos nuevos               {t_cache * 1000:8.3f} ms")
+    print(f"  consulta con {args.nuevos} intentos nuevos        {t_incremental * 1000:8.3f} ms")
+    print(f"  KR-20 {resultado['kr20']:.3f}, media {resultado['media']:.2f}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,99 @@
+"""
+Benchmark del ensamblado de exámenes aleatorios por estudiante desde el banco:
+random.Random por estudiante (referencia) frente a Plantilla.ensamblar
+vectorizado, uno a uno (una petición por estudiante) y en lote.
+
+Uso:
+    cd services/evaluaciones
+    python bench_banco.py --estudiantes 10000 --candidatas 200
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from banco import BancoPreguntas, Plantilla
+from grading import AnswerKey
+
+TEMAS = ("variables", "bucles", "funciones", "listas")
+
+
+def _banco(candidatas):
+    banco = BancoPreguntas()
+    for tema in TEMAS:
+        for i in range(candidatas):
+            banco.agregar({
+                "id": f"{tema}-{i}", "curso_id": "bench", "tema": tema, "dificultad": "media",
+                "texto": f"Pregunta {i} de {tema}", "tipo": "opcion",
+                "opciones": [f"opción {j}" for j in range(4)], "respuesta": i % 4, "puntos": 1,
+            })
+    return banco
+
+
+def _referencia(plantilla, candidatas, estudiante_id):
+    """Ensamblado directo con random.Random sembrado por estudiante."""
+    rng = random.Random(plantilla.semilla(estudiante_id))
+    preguntas = []
+    for seccion, grupo in zip(plantilla.secciones, candidatas):
+        for p in rng.sample(grupo, seccion["cantidad"]):
+            opciones = list(p["opciones"])
+            rng.shuffle(opciones)
+            preguntas.append({"id": p["id"], "texto": p["texto"], "opciones": opciones})
+    return {"id": plantilla.id, "preguntas": preguntas}
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estudiantes", type=int, default=10_000)
+    parser.add_argument("--candidatas", type=int, default=200, help="preguntas por tema en el banco")
+    parser.add_argument("--por-tema", type=int, default=5, help="preguntas por tema en cada examen")
+    args = parser.parse_args()
+
+    banco = _banco(args.candidatas)
+    secciones = [{"tema": t, "dificultad": "media", "cantidad": args.por_tema} for t in TEMAS]
+    plantilla = Plantilla.crear(banco, "bench", "bench", "Examen", secciones)
+    candidatas = [[banco.preguntas[pid] for pid in banco.buscar("bench", t, "media")] for t in TEMAS]
+    estudiantes = [f"estudiante-{i}" for i in range(args.estudiantes)]
+    n = len(estudiantes)
+    print(f"{n} estudiantes, {len(TEMAS) * args.por_tema} preguntas de {len(TEMAS) * args.candidatas} candidatas")
+
+    start = time.perf_counter()
+    for e in estudiantes:
+        json.dumps(_referencia(plantilla, candidatas, e))
+    t_ref = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for e in estudiantes:
+        json.dumps(plantilla.examen(*plantilla.ensamblar_uno(e)))
+    t_uno = time.perf_counter() - start
+
+    start = time.perf_counter()
+    elegidas, orden = plantilla.ensamblar(estudiantes)
+    t_lote = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(n):
+        json.dumps(plantilla.examen(elegidas[i], orden[i]))
+    t_vistas = time.perf_counter() - start
+
+    # Un estudiante recibe el mismo examen por las dos vías
+    for i in random.Random(1).sample(range(n), min(n, 200)):
+        e, o = plantilla.ensamblar_uno(estudiantes[i])
+        assert e == elegidas[i].tolist(), "ensamblar_uno y ensamblar no coinciden"
+        assert o == [fila[:len(x)] for fila, x in zip(orden[i].tolist(), o)], "orden de opciones distinto"
+
+    start = time.perf_counter()
+    for i in range(n):
+        AnswerKey.compile(plantilla.cuestionario(elegidas[i], orden[i]))
+    t_claves = time.perf_counter() - start
+
+    print(f"  random.Random por estudiante   {t_ref:8.3f} s  ({t_ref / n * 1e6:6.1f} µs/est.)")
+    print(f"  ensamblar_uno (por petición)   {t_uno:8.3f} s  ({t_uno / n * 1e6:6.1f} µs/est.)")
+    print(f"  ensamblar en lote (NumPy)      {t_lote:8.3f} s  ({t_lote / n * 1e6:6.1f} µs/est.)")
+    print(f"    + vistas JSON                {t_vistas:8.3f} s")
+    print(f"  reconstruir claves (calificar) {t_claves:8.3f} s  ({t_claves / n * 1e6:6.1f} µs/est.)")
+
+
+if __name__ == "__main__":
+    main_bench()
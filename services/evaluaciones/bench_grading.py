@@ -0,0 +1,85 @@
+"""
+Benchmark de calificación: bucle original de /responder frente a la clave
+compilada (AnswerKey) con comparación vectorizada en NumPy.
+
+Uso:
+    cd services/evaluaciones
+    python bench_grading.py --envios 1000000 --preguntas 20
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from grading import AnswerKey
+
+
+def _legacy_grade(q, respuestas):
+    """Réplica del bucle original de responder()."""
+    correct = 0
+    total = len(q.get("preguntas", []))
+    for p in q.get("preguntas", []):
+        pid = p.get("id")
+        if pid in (respuestas or {}) and respuestas[pid] == p.get("respuesta"):
+            correct += 1
+    score = (correct / total * 100) if total else 0
+    return {"score": score, "correct": correct, "total": total}
+
+
+def _cuestionario(n_preguntas, rng):
+    return {
+        "id": "bench",
+        "preguntas": [
+            {"id": f"p{j}", "tipo": "opcion", "opciones": ["a", "b", "c", "d"], "respuesta": rng.randrange(4)}
+            for j in range(n_preguntas)
+        ],
+    }
+
+
+def _envios(q, n, rng):
+    ids = [p["id"] for p in q["preguntas"]]
+    return [{pid: rng.randrange(4) for pid in ids} for _ in range(n)]
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--envios", type=int, default=1_000_000)
+    parser.add_argument("--preguntas", type=int, default=20)
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    q = _cuestionario(args.preguntas, rng)
+    print(f"Generando {args.envios} envíos de {args.preguntas} preguntas...")
+    envios = _envios(q, args.envios, rng)
+
+    start = time.perf_counter()
+    legacy = [_legacy_grade(q, r)["correct"] for r in envios]
+    t_legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    key = AnswerKey.compile(q)
+    t_compile = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indices, multiples = key.encode_many(envios)
+    t_encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, correctas, _ = key.grade_matrix(indices, multiples)
+    t_grade = time.perf_counter() - start
+
+    assert np.array_equal(correctas, np.asarray(legacy)), "las dos calificaciones no coinciden"
+
+    total = t_encode + t_grade
+    print(f"  bucle original                 {t_legacy:8.3f} s")
+    print(f"  compilar clave                 {t_compile * 1000:8.3f} ms")
+    print(f"  codificar envíos               {t_encode:8.3f} s")
+    print(f"  calificar (vectorizado)        {t_grade:8.3f} s")
+    print(f"  codificar + calificar          {total:8.3f} s  (x{t_legacy / total:.1f})")
+    print(f"  solo calificación vs bucle     x{t_legacy / t_grade:.0f}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,193 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import joinedload
+
+from models import Cuestionario, Opcion, PlantillaExamen, Pregunta, PreguntaBanco
+
+# Campos de la pregunta con columna propia; el resto se guarda en `extra`
+_CAMPOS_PREGUNTA = ("id", "tipo", "texto", "puntos", "respuesta", "opciones")
+_CAMPOS_CUESTIONARIO = ("curso_id", "titulo", "tipo", "descripcion", "duracion_minutos", "puntos_totales")
+
+
+def _con_preguntas():
+    # Cuestionario, preguntas y opciones en una sola consulta con JOIN
+    return select(Cuestionario).options(joinedload(Cuestionario.preguntas).joinedload(Pregunta.opciones))
+
+
+def cuestionario_a_dict(c):
+    """Mismo formato que reciben AnswerKey.compile y PublicView.build."""
+    data = {"id": c.id}
+    for campo in _CAMPOS_CUESTIONARIO:
+        data[campo] = getattr(c, campo)
+    if c.num_preguntas is not None:
+        data["preguntas"] = c.num_preguntas
+        return data
+    preguntas = []
+    for p in c.preguntas:
+        pregunta = dict(p.extra or {})
+        pregunta.update(id=p.id, tipo=p.tipo, texto=p.texto, opciones=[o.texto for o in p.opciones], respuesta=p.respuesta)
+        pregunta["puntos"] = p.puntos
+        preguntas.append(pregunta)
+    data["preguntas"] = preguntas
+    return data
+
+
+def get_cuestionario(db, cuestionario_id):
+    c = db.execute(_con_preguntas().where(Cuestionario.id == cuestionario_id)).unique().scalar_one_or_none()
+    return cuestionario_a_dict(c) if c else None
+
+
+def list_cuestionarios(db):
+    return [cuestionario_a_dict(c) for c in db.execute(_con_preguntas()).unique().scalars()]
+
+
+def _fila_pregunta(posicion, data):
+    return {
+        "id": str(data.get("id")),
+        "posicion": posicion,
+        "tipo": data.get("tipo") or "opcion",
+        "texto": data.get("texto"),
+        "puntos": float(data.get("puntos", 1)),
+        "respuesta": data.get("respuesta"),
+        "extra": {k: v for k, v in data.items() if k not in _CAMPOS_PREGUNTA} or None,
+    }
+
+
+def _pregunta(posicion, data):
+    return Pregunta(
+        **_fila_pregunta(posicion, data),
+        opciones=[Opcion(posicion=i, texto=str(o)) for i, o in enumerate(data.get("opciones") or [])],
+    )
+
+
+def _asignar(c, data):
+    for campo in _CAMPOS_CUESTIONARIO:
+        setattr(c, campo, data.get(campo))
+    preguntas = data.get("preguntas")
+    if isinstance(preguntas, list):
+        c.num_preguntas = None
+        c.preguntas = [_pregunta(i, p) for i, p in enumerate(preguntas)]
+    else:
+        c.num_preguntas = preguntas
+
+
+def guardar_cuestionario(db, data):
+    """Crea o reemplaza el cuestionario con todas sus preguntas y opciones."""
+    c = db.get(Cuestionario, data["id"])
+    if c is None:
+        c = Cuestionario(id=data["id"])
+        db.add(c)
+    else:
+        # Las preguntas anteriores se borran antes de insertar las nuevas (mismas claves únicas)
+        c.preguntas = []
+        db.flush()
+    _asignar(c, data)
+    # Si solo cambian las preguntas la fila no se actualiza: la versión se marca a mano
+    c.actualizado_en = datetime.utcnow()
+    db.commit()
+    return c
+
+
+def version_cuestionario(db, cuestionario_id):
+    """Momento de la última escritura del cuestionario; None si no existe."""
+    return db.execute(
+        select(Cuestionario.actualizado_en).where(Cuestionario.id == cuestionario_id)
+    ).scalar_one_or_none()
+
+
+def versiones(db):
+    """{id: actualizado_en} de todos los cuestionarios."""
+    return dict(db.execute(select(Cuestionario.id, Cuestionario.actualizado_en)).all())
+
+
+def ids_existentes(db, ids, lote=1000):
+    """Ids de `ids` que ya tienen cuestionario (una consulta IN por lote)."""
+    ids = list(ids)
+    existentes = set()
+    for i in range(0, len(ids), lote):
+        existentes.update(db.execute(select(Cuestionario.id).where(Cuestionario.id.in_(ids[i:i + lote]))).scalars())
+    return existentes
+
+
+def normalizar(data):
+    """El cuestionario tal como se leerá después de la base de datos."""
+    c = Cuestionario(id=data["id"])
+    _asignar(c, data)
+    return cuestionario_a_dict(c)
+
+
+def insertar_cuestionarios(db, datos):
+    """
+    Inserta cuestionarios nuevos en una sola transacción con un INSERT de
+    varias filas por tabla: cuestionarios, preguntas (con RETURNING de sus
+    claves, en el orden de los parámetros) y opciones.
+    """
+    cuestionarios, preguntas, opciones_por_pregunta = [], [], []
+    for data in datos:
+        fila = {campo: data.get(campo) for campo in _CAMPOS_CUESTIONARIO}
+        fila["id"] = data["id"]
+        lista = data.get("preguntas")
+        fila["num_preguntas"] = None if isinstance(lista, list) else lista
+        cuestionarios.append(fila)
+        for i, p in enumerate(lista if isinstance(lista, list) else []):
+            preguntas.append(dict(_fila_pregunta(i, p), cuestionario_id=data["id"]))
+            opciones_por_pregunta.append(p.get("opciones") or [])
+    if cuestionarios:
+        db.execute(insert(Cuestionario), cuestionarios)
+    if preguntas:
+        pks = db.execute(
+            insert(Pregunta).returning(Pregunta.pk, sort_by_parameter_order=True), preguntas
+        ).scalars().all()
+        opciones = [
+            {"pregunta_pk": pk, "posicion": i, "texto": str(o)}
+            for pk, lista in zip(pks, opciones_por_pregunta)
+            for i, o in enumerate(lista)
+        ]
+        if opciones:
+            db.execute(insert(Opcion), opciones)
+    db.commit()
+
+
+def ids_banco(db, ids):
+    """Ids de `ids` que ya están en el banco."""
+    return set(db.execute(select(PreguntaBanco.id).where(PreguntaBanco.id.in_(list(ids)))).scalars())
+
+
+def agregar_al_banco(db, preguntas):
+    """Agrega las preguntas al banco en un solo INSERT de varias filas."""
+    if preguntas:
+        db.execute(insert(PreguntaBanco), [
+            {"id": p["id"], "curso_id": p["curso_id"], "tema": p["tema"], "dificultad": p["dificultad"], "datos": p}
+            for p in preguntas
+        ])
+    db.commit()
+
+
+def buscar_en_banco(db, curso_id=None, tema=None, dificultad=None):
+    """Preguntas del banco que cumplen los filtros dados, en orden de alta."""
+    consulta = select(PreguntaBanco.datos).order_by(PreguntaBanco.pk)
+    for columna, valor in ((PreguntaBanco.curso_id, curso_id), (PreguntaBanco.tema, tema), (PreguntaBanco.dificultad, dificultad)):
+        if valor is not None:
+            consulta = consulta.where(columna == valor)
+    return list(db.execute(consulta).scalars())
+
+
+def guardar_plantilla(db, plantilla):
+    """Inserta la plantilla (banco.Plantilla) con sus candidatas y su sal."""
+    db.add(PlantillaExamen(
+        id=plantilla.id, curso_id=plantilla.curso_id, titulo=plantilla.titulo, secciones=plantilla.secciones,
+        candidatas=plantilla.candidatas(), barajar_opciones=plantilla.barajar_opciones, sal=plantilla.sal,
+    ))
+    db.commit()
+
+
+def get_plantilla(db, plantilla_id):
+    """Argumentos de banco.Plantilla para la plantilla guardada; None si no existe."""
+    p = db.get(PlantillaExamen, plantilla_id)
+    if p is None:
+        return None
+    return {
+        "id": p.id, "curso_id": p.curso_id, "titulo": p.titulo, "secciones": p.secciones,
+        "candidatas": p.candidatas, "barajar_opciones": p.barajar_opciones, "sal": bytes(p.sal),
+    }
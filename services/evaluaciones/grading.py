@@ -0,0 +1,351 @@
+import json
+from itertools import repeat
+from operator import itemgetter
+
+import numpy as np
+
+# Cada respuesta se codifica como el índice (bit) de la opción elegida. El 63
+# se reserva para valores que no corresponden a ninguna opción conocida
+# (siempre incorrectos) y -1 significa sin responder.
+OTRA = 63
+SIN_RESPUESTA = -1
+# Envíos que se codifican juntos por la vía rápida
+BLOQUE = 8192
+# Marca de pregunta sin responder en la vía rápida (ningún índice real es tan negativo)
+_FALTA = -(1 << 62)
+
+
+def _preguntas(cuestionario):
+    """Lista de preguntas del cuestionario; las evaluaciones creadas sin detalle guardan solo un conteo."""
+    preguntas = cuestionario.get("preguntas")
+    return preguntas if isinstance(preguntas, list) else []
+
+
+class _UnSoloId:
+    """Como itemgetter(pid) pero devolviendo una tupla; a diferencia de una lambda, se puede enviar a otro proceso."""
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    def __call__(self, respuestas):
+        return (respuestas[self.pid],)
+
+
+class AnswerKey:
+    """
+    Clave de respuestas compilada de un cuestionario.
+
+    Cada pregunta ocupa una columna: `mascaras[j]` tiene un bit por opción
+    correcta, `pesos[j]` son sus puntos y `exactas[j]` indica selección
+    múltiple (hay que marcar exactamente las opciones correctas). En el resto
+    de preguntas basta con elegir una de las opciones correctas.
+    """
+
+    def __init__(self, pregunta_ids, mascaras, pesos, exactas, rangos, codigos):
+        self.pregunta_ids = list(pregunta_ids)
+        self.posiciones = {pid: j for j, pid in enumerate(self.pregunta_ids)}
+        self.mascaras = np.asarray(mascaras, dtype=np.uint64)
+        self.pesos = np.asarray(pesos, dtype=np.float64)
+        self.exactas = np.asarray(exactas, dtype=bool)
+        self.puntos_max = float(self.pesos.sum())
+        self.rangos = np.asarray(rangos, dtype=np.int64)
+        # valor -> índice de cada pregunta: enteros en rango, respuestas no enteras y None
+        self._tablas = []
+        for rango, extra in zip(rangos, codigos):
+            tabla = {v: v for v in range(rango)}
+            tabla.update(extra)
+            tabla[None] = SIN_RESPUESTA
+            self._tablas.append(tabla)
+        # correctas[j, b]: elegir el índice b en la pregunta j es correcto.
+        # La columna 64 (a la que apunta -1) queda siempre en False.
+        bits = np.arange(64, dtype=np.uint64)
+        correctas = np.zeros((len(self.pregunta_ids), 65), dtype=bool)
+        correctas[:, :64] = (self.mascaras[:, None] >> bits) & np.uint64(1) == 1
+        self._correctas = correctas
+        self._columnas = np.arange(len(self.pregunta_ids))
+        # itemgetter con un solo id devuelve el valor suelto, no una tupla
+        if not self.pregunta_ids:
+            self._getter = None
+        elif len(self.pregunta_ids) == 1:
+            self._getter = _UnSoloId(self.pregunta_ids[0])
+        else:
+            self._getter = itemgetter(*self.pregunta_ids)
+
+    @classmethod
+    def compile(cls, cuestionario):
+        ids, mascaras, pesos, exactas, rangos, codigos = [], [], [], [], [], []
+        vistos = set()
+        for p in _preguntas(cuestionario):
+            # Las respuestas se asocian por id: cada pregunta necesita uno propio
+            if not isinstance(p, dict):
+                raise ValueError("Cada pregunta debe ser un objeto JSON")
+            if p.get("id") in (None, ""):
+                raise ValueError("Todas las preguntas necesitan un id")
+            if str(p["id"]) in vistos:
+                raise ValueError(f"La pregunta {p['id']} está repetida")
+            vistos.add(str(p["id"]))
+            opciones = p.get("opciones") or []
+            if not isinstance(opciones, list):
+                raise ValueError(f"Las opciones de la pregunta {p['id']} deben ser una lista")
+            try:
+                puntos = float(p.get("puntos", 1))
+            except (TypeError, ValueError):
+                puntos = np.nan
+            if not np.isfinite(puntos):
+                raise ValueError(f"La pregunta {p['id']} tiene puntos inválidos")
+            # Los índices se guardan en int8 y el 63 es OTRA: con más opciones se confundirían
+            if len(opciones) > OTRA:
+                raise ValueError(f"La pregunta {p['id']} tiene más de {OTRA} opciones")
+            respuesta = p.get("respuesta")
+            correctas = respuesta if isinstance(respuesta, list) else [respuesta]
+            enteros = [c for c in correctas if type(c) is int and c >= 0]
+            rango = max([len(opciones)] + [c + 1 for c in enteros])
+            # Respuestas no enteras (texto libre, números reales) reciben un índice propio tras las opciones
+            extra = {}
+            for c in correctas:
+                if c is not None and not (type(c) is int and c >= 0):
+                    try:
+                        extra.setdefault(c, rango + len(extra))
+                    except TypeError:
+                        continue  # valores no hashables no pueden acertarse
+            bits = enteros + list(extra.values())
+            if any(b >= OTRA for b in bits):
+                raise ValueError(f"La pregunta {p.get('id')} tiene demasiadas opciones")
+            mascara = 0
+            for b in bits:
+                mascara |= 1 << b
+            ids.append(p.get("id"))
+            mascaras.append(mascara)
+            pesos.append(puntos)
+            exactas.append(p.get("tipo") == "multiple")
+            rangos.append(rango)
+            codigos.append(extra)
+        return cls(ids, mascaras, pesos, exactas, rangos, codigos)
+
+    def _indice(self, j, valor):
+        try:
+            return self._tablas[j].get(valor, OTRA)
+        except TypeError:
+            return OTRA
+
+    def _codificar_fila(self, respuestas, i, fila, multiples):
+        for pid, valor in (respuestas or {}).items():
+            j = self.posiciones.get(pid)
+            if j is None:
+                continue
+            if isinstance(valor, list):
+                # Solo las preguntas de selección múltiple admiten varias opciones
+                if self.exactas[j]:
+                    mascara = 0
+                    for v in valor:
+                        # null dentro de la lista no es ninguna opción
+                        mascara |= 1 << (OTRA if v is None else self._indice(j, v))
+                    multiples.append((i, j, mascara))
+                fila[j] = OTRA
+            else:
+                fila[j] = self._indice(j, valor)
+
+    def encode_many(self, envios):
+        """
+        Codifica una lista de diccionarios {pregunta_id: respuesta}.
+
+        Devuelve `(indices, multiples)`: una matriz int8 (envíos x preguntas)
+        con el índice elegido (-1 sin responder, 63 valor desconocido) y una
+        lista de (envío, pregunta, máscara) para las respuestas de selección
+        múltiple dadas como lista.
+        """
+        n, m = len(envios), len(self.pregunta_ids)
+        indices = np.full((n, m), SIN_RESPUESTA, dtype=np.int8)
+        multiples = []
+        if m == 0:
+            return indices, multiples
+        for inicio in range(0, n, BLOQUE):
+            bloque = envios[inicio:inicio + BLOQUE]
+            if not self._codificar_bloque(bloque, indices[inicio:inicio + len(bloque)]):
+                for k, respuestas in enumerate(bloque):
+                    self._codificar_fila(respuestas, inicio + k, indices[inicio + k], multiples)
+        return indices, multiples
+
+    def _codificar_bloque(self, bloque, destino):
+        """
+        Vía rápida: todos los envíos responden con enteros (o dejan preguntas
+        sin responder). Devuelve False si el bloque necesita la codificación
+        fila a fila.
+        """
+        valores = []
+        agregar = valores.extend
+        try:
+            for respuestas in bloque:
+                agregar(self._getter(respuestas))
+        except (KeyError, TypeError):
+            # Hay preguntas sin responder: se completan con la marca _FALTA
+            valores = []
+            agregar = valores.extend
+            try:
+                for respuestas in bloque:
+                    agregar(map(respuestas.get, self.pregunta_ids, repeat(_FALTA)))
+            except (AttributeError, TypeError):
+                return False
+        # fromiter convertiría "1" o 1.5 en 1: solo se acepta si todo son int
+        if set(map(type, valores)) != {int}:
+            return False
+        try:
+            matriz = np.fromiter(valores, dtype=np.int64, count=len(valores)).reshape(len(bloque), -1)
+        except OverflowError:
+            # Enteros fuera de int64: fila a fila se codifican como OTRA
+            return False
+        destino[:] = np.where(
+            matriz == _FALTA, SIN_RESPUESTA, np.where((matriz >= 0) & (matriz < self.rangos), matriz, OTRA)
+        )
+        return True
+
+    def aciertos(self, indices, multiples=()):
+        """Matriz booleana (envíos x preguntas) de respuestas correctas."""
+        aciertos = self._correctas[self._columnas, indices]
+        exactas = np.flatnonzero(self.exactas)
+        if len(exactas):
+            # Selección múltiple: la máscara marcada debe coincidir con la correcta
+            marcadas = np.where(
+                indices[:, exactas] >= 0,
+                np.left_shift(np.uint64(1), np.maximum(indices[:, exactas], 0).astype(np.uint64)),
+                np.uint64(0),
+            )
+            posicion = {j: k for k, j in enumerate(exactas)}
+            for i, j, mascara in multiples:
+                marcadas[i, posicion[j]] = mascara
+            aciertos[:, exactas] = (marcadas != 0) & (marcadas == self.mascaras[exactas])
+        return aciertos
+
+    def grade_matrix(self, indices, multiples=()):
+        """Puntos, número de aciertos y nota (0-100) de cada envío."""
+        return self.puntuar(self.aciertos(indices, multiples))
+
+    def puntuar(self, aciertos):
+        puntos = aciertos @ self.pesos
+        correctas = aciertos.sum(axis=1)
+        notas = puntos / self.puntos_max * 100 if self.puntos_max else np.zeros(len(aciertos))
+        return puntos, correctas, notas
+
+    def grade(self, respuestas):
+        """Calificación de un solo envío, con el mismo formato que devuelve /responder."""
+        puntos, correctas, notas = self.grade_matrix(*self.encode_many([respuestas]))
+        return {
+            "score": float(notas[0]),
+            "correct": int(correctas[0]),
+            "total": len(self.pregunta_ids),
+            "puntos": float(puntos[0]),
+            "puntos_max": self.puntos_max,
+        }
+
+
+def _parsear_lineas(envios):
+    """
+    Parsea las líneas NDJSON de un bloque con una sola llamada a json.loads;
+    si alguna no es válida se repite línea a línea y el error queda en su fila.
+    """
+    if not envios or not isinstance(envios[0], (bytes, str)):
+        return envios
+    try:
+        if isinstance(envios[0], bytes):
+            return json.loads(b"[" + b",".join(envios) + b"]")
+        return json.loads("[" + ",".join(envios) + "]")
+    except (TypeError, ValueError):
+        pass
+    parseados = []
+    for linea in envios:
+        if not isinstance(linea, (bytes, str)):
+            parseados.append(linea)  # array JSON con elementos de varios tipos
+            continue
+        try:
+            parseados.append(json.loads(linea))
+        except ValueError as e:
+            parseados.append(e)
+    return parseados
+
+
+def calificar_lote(key, envios):
+    """
+    Califica un bloque de envíos {"estudiante_id": ..., "respuestas": {...}}.
+    Los envíos pueden llegar como líneas NDJSON sin parsear, así el parseo
+    también se reparte cuando la función se ejecuta en un pool de procesos.
+    """
+    validos, errores = [], []
+    envios = _parsear_lineas(envios)
+    for fila, envio in enumerate(envios):
+        if isinstance(envio, ValueError):
+            errores.append((fila, f"JSON inválido: {envio}"))
+            continue
+        if not isinstance(envio, dict):
+            errores.append((fila, "Cada envío debe ser un objeto JSON"))
+            continue
+        if not isinstance(envio.get("respuestas") or {}, dict):
+            errores.append((fila, "`respuestas` debe ser un objeto JSON"))
+            continue
+        validos.append((fila, envio))
+    try:
+        indices, multiples = key.encode_many([e.get("respuestas") or {} for _, e in validos])
+    except (TypeError, ValueError, OverflowError):
+        # Algún envío no se puede codificar: se busca fila a fila y se aparta
+        codificables = []
+        for fila, envio in validos:
+            try:
+                key.encode_many([envio.get("respuestas") or {}])
+            except (TypeError, ValueError, OverflowError) as e:
+                errores.append((fila, f"Respuestas no válidas: {e}"))
+                continue
+            codificables.append((fila, envio))
+        errores.sort()
+        validos = codificables
+        indices, multiples = key.encode_many([e.get("respuestas") or {} for _, e in validos])
+    aciertos = key.aciertos(indices, multiples)
+    puntos, correctas, notas = key.puntuar(aciertos)
+    return {
+        "estudiantes": [e.get("estudiante_id") for _, e in validos],
+        "puntos": puntos,
+        "correctas": correctas,
+        "notas": notas,
+        "aciertos_pregunta": aciertos.sum(axis=0),
+        "errores": errores,
+    }
+
+
+class ResumenCohorte:
+    """Estadísticas agregadas de una cohorte, acumuladas bloque a bloque."""
+
+    BINS = 10  # histograma de notas en tramos de 10 puntos
+
+    def __init__(self, key):
+        self.key = key
+        self.n = 0
+        self.suma = 0.0
+        self.suma_cuadrados = 0.0
+        self.histograma = np.zeros(self.BINS, dtype=np.int64)
+        self.aciertos_pregunta = np.zeros(len(key.pregunta_ids), dtype=np.int64)
+
+    def agregar(self, lote):
+        notas = lote["notas"]
+        self.n += len(notas)
+        self.suma += float(notas.sum())
+        self.suma_cuadrados += float(np.square(notas).sum())
+        # La nota 100 cae en el último tramo
+        tramos = np.minimum((notas // (100 / self.BINS)).astype(np.int64), self.BINS - 1)
+        self.histograma += np.bincount(tramos, minlength=self.BINS)
+        self.aciertos_pregunta += lote["aciertos_pregunta"]
+
+    def resultado(self):
+        media = self.suma / self.n if self.n else 0.0
+        varianza = max(self.suma_cuadrados / self.n - media * media, 0.0) if self.n else 0.0
+        ancho = 100 // self.BINS
+        return {
+            "n": self.n,
+            "media": media,
+            "desviacion": float(np.sqrt(varianza)),
+            "histograma": [
+                {"desde": i * ancho, "hasta": (i + 1) * ancho, "n": int(c)} for i, c in enumerate(self.histograma)
+            ],
+            # Dificultad clásica: proporción de estudiantes que aciertan la pregunta
+            "dificultad": [
+                {"pregunta_id": pid, "aciertos": int(a), "p": float(a) / self.n if self.n else 0.0}
+                for pid, a in zip(self.key.pregunta_ids, self.aciertos_pregunta)
+            ],
+        }
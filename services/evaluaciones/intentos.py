@@ -0,0 +1,205 @@
+import atexit
+import bisect
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from models import Intento
+
+# Intentos por escritura, espera máxima para completar un lote y tamaño de la cola
+INTENTOS_BATCH_SIZE = int(os.getenv("INTENTOS_BATCH_SIZE", "500"))
+INTENTOS_FLUSH_INTERVAL = float(os.getenv("INTENTOS_FLUSH_INTERVAL", "0.2"))
+INTENTOS_QUEUE_MAX = int(os.getenv("INTENTOS_QUEUE_MAX", "100000"))
+
+
+def nuevo_intento(cuestionario_id, estudiante_id, resultado, respuestas):
+    """Fila de la tabla intentos a partir del resultado de AnswerKey.grade."""
+    return {
+        "cuestionario_id": cuestionario_id,
+        "estudiante_id": estudiante_id,
+        "score": resultado["score"],
+        "correct": resultado["correct"],
+        "total": resultado["total"],
+        "puntos": resultado["puntos"],
+        "respuestas": respuestas,
+        # La marca de tiempo es la de la calificación, no la de la escritura diferida
+        "creado_en": datetime.utcnow(),
+    }
+
+
+def _serializar(intento):
+    return {
+        "id": intento["id"],
+        "cuestionario_id": intento["cuestionario_id"],
+        "estudiante_id": intento["estudiante_id"],
+        "score": intento["score"],
+        "correct": intento["correct"],
+        "total": intento["total"],
+        "puntos": intento["puntos"],
+        "respuestas": intento["respuestas"],
+        "creado_en": intento["creado_en"].isoformat(),
+    }
+
+
+class LocalIntentoStore:
+    """Intentos en memoria del proceso (sustituto de la base de datos)."""
+
+    def __init__(self):
+        self._intentos = {}
+        self._por_cuestionario = {}
+        self._mejores = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def guardar(self, intento):
+        key = (intento["cuestionario_id"], intento["estudiante_id"])
+        with self._lock:
+            self._seq += 1
+            intento = dict(intento, id=self._seq)
+            self._intentos.setdefault(key, []).append(intento)
+            self._por_cuestionario.setdefault(key[0], []).append(intento)
+            mejor = self._mejores.get(key)
+            if mejor is None or intento["score"] > mejor["score"]:
+                self._mejores[key] = intento
+
+    def flush(self, timeout=None):
+        return True
+
+    def mejor(self, cuestionario_id, estudiante_id):
+        intento = self._mejores.get((cuestionario_id, estudiante_id))
+        return _serializar(intento) if intento else None
+
+    def desde(self, cuestionario_id, ultimo_id, limite):
+        """(id, respuestas) de los intentos del cuestionario con id > ultimo_id, en orden."""
+        lista = self._por_cuestionario.get(cuestionario_id, [])
+        inicio = bisect.bisect_right(lista, ultimo_id, key=lambda i: i["id"])
+        return [(i["id"], i["respuestas"]) for i in lista[inicio:inicio + limite]]
+
+
+class SqlIntentoStore:
+    """
+    Intentos en la tabla `intentos`. `guardar` solo encola: un hilo escritor
+    agrupa los intentos (hasta INTENTOS_BATCH_SIZE o INTENTOS_FLUSH_INTERVAL)
+    y los inserta con un único executemany, así la calificación no espera al
+    commit. Si la base de datos no responde, el lote se reintenta con espera
+    creciente; si rechaza alguna fila, esa fila se descarta.
+    """
+
+    def __init__(self, session_factory, batch_size=INTENTOS_BATCH_SIZE, intervalo=INTENTOS_FLUSH_INTERVAL):
+        self._session_factory = session_factory
+        self._batch_size = batch_size
+        self._intervalo = intervalo
+        self._queue = queue.Queue(maxsize=INTENTOS_QUEUE_MAX)
+        self._thread = threading.Thread(target=self._run, name="intentos-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def guardar(self, intento):
+        try:
+            self._queue.put_nowait(intento)
+        except queue.Full:
+            # Mejor perder el registro que bloquear la calificación
+            print(f"Cola de intentos llena; se descarta el intento de {intento['estudiante_id']}")
+
+    def flush(self, timeout=5.0):
+        """
+        Espera a que todo lo encolado hasta ahora esté confirmado en la base de
+        datos, como mucho `timeout` segundos contando la espera para entrar en
+        una cola llena. Devuelve False si no dio tiempo: las lecturas siguen
+        con lo ya confirmado.
+        """
+        hecho = threading.Event()
+        limite = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._queue.put(hecho, timeout=timeout)
+        except queue.Full:
+            return False
+        return hecho.wait(None if limite is None else max(0.0, limite - time.monotonic()))
+
+    def mejor(self, cuestionario_id, estudiante_id):
+        self.flush()  # que el estudiante vea el intento que acaba de enviar
+        with self._session_factory() as db:
+            intento = db.execute(
+                select(Intento)
+                .where(Intento.cuestionario_id == cuestionario_id, Intento.estudiante_id == estudiante_id)
+                .order_by(Intento.score.desc(), Intento.id)
+                .limit(1)
+            ).scalar_one_or_none()
+            return _serializar(vars(intento)) if intento else None
+
+    def desde(self, cuestionario_id, ultimo_id, limite):
+        """(id, respuestas) de los intentos del cuestionario con id > ultimo_id, en orden."""
+        self.flush()
+        with self._session_factory() as db:
+            return db.execute(
+                select(Intento.id, Intento.respuestas)
+                .where(Intento.cuestionario_id == cuestionario_id, Intento.id > ultimo_id)
+                .order_by(Intento.id)
+                .limit(limite)
+            ).all()
+
+    def _run(self):
+        while True:
+            lote, eventos = self._siguiente_lote()
+            if lote:
+                self._escribir(lote)
+            for evento in eventos:
+                evento.set()
+
+    def _siguiente_lote(self):
+        """Bloquea hasta el primer intento y junta los que lleguen dentro del intervalo."""
+        lote, eventos = [], []
+        item = self._queue.get()
+        limite = time.monotonic() + self._intervalo
+        while True:
+            if isinstance(item, threading.Event):
+                # Un flush pendiente no espera a que se complete el lote
+                eventos.append(item)
+                return lote, eventos
+            lote.append(item)
+            restante = limite - time.monotonic()
+            if len(lote) >= self._batch_size or restante <= 0:
+                return lote, eventos
+            try:
+                item = self._queue.get(timeout=restante)
+            except queue.Empty:
+                return lote, eventos
+
+    def _escribir(self, lote):
+        espera = 0.5
+        while True:
+            try:
+                with self._session_factory() as db:
+                    db.execute(insert(Intento), lote)
+                    db.commit()
+                return
+            except OperationalError as e:
+                # Conexión perdida o base de datos caída: el mismo lote entrará más tarde
+                print(f"Error guardando {len(lote)} intentos ({e}); reintento en {espera:.1f}s")
+                time.sleep(espera)
+                espera = min(espera * 2, 30)
+            except SQLAlchemyError as e:
+                # Error de los datos: reintentar no sirve. Se escribe fila a fila y se
+                # descartan las que fallan para no bloquear a las que vienen detrás
+                if len(lote) == 1:
+                    print(f"Se descarta el intento de {lote[0]['estudiante_id']!r} en {lote[0]['cuestionario_id']!r} ({e})")
+                    return
+                for intento in lote:
+                    self._escribir([intento])
+                return
+
+def create_intento_store():
+    """Usa la base de datos SQL si responde; si no, un almacén local al proceso."""
+    try:
+        from database_sql import SessionLocal, create_db_and_tables
+
+        create_db_and_tables()
+        return SqlIntentoStore(SessionLocal)
+    except Exception as e:
+        print(f"Base de datos no disponible para los intentos ({e}); usando almacén local")
+        return LocalIntentoStore()
@@ -1,6 +1,25 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from typing import Any, List, Optional, Union
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import threading
+
+import crud
+from analisis import AnalisisItems
+from banco import BancoPreguntas, Plantilla
+from database_sql import SessionLocal, create_db_and_tables, get_db
+from grading import AnswerKey, ResumenCohorte, calificar_lote
+from intentos import create_intento_store, nuevo_intento
+from public_views import PublicView
+from sesiones import SESION_BARRIDO, TemporizadorSesiones, create_sesion_store, nueva_sesion, vencimiento
+from trabajos import TRABAJOS_ESPERA_MAX, create_trabajo_store, nuevo_trabajo
+import time
 
 app = FastAPI(title="Evaluaciones Service")
 
@@ -10,23 +29,127 @@ class Evaluacion(BaseModel):
     curso_id: str
     titulo: str
     tipo: str
-    preguntas: Optional[int] = None
+    # Número de preguntas o la lista completa (con `respuesta` para la calificación)
+    preguntas: Optional[Union[int, list]] = None
     duracion_minutos: Optional[int] = None
     puntos_totales: int
     descripcion: Optional[str] = None
 
-# Simple mock cuestionarios
-DATA = {
-    "cuestionarios": {
-        "c1": {
-            "id": "c1",
-            "titulo": "Evaluación Inicial Python",
-            "preguntas": [
-                {"id": "p1", "tipo": "opcion", "texto": "¿Qué imprime print(1+1)?", "opciones": ["1", "2", "11"], "respuesta": 1},
-            ]
-        }
+# Cuestionario de ejemplo; se siembra en la base de datos si está vacía
+CUESTIONARIOS_INICIALES = [
+    {
+        "id": "c1",
+        "titulo": "Evaluación Inicial Python",
+        "preguntas": [
+            {"id": "p1", "tipo": "opcion", "texto": "¿Qué imprime print(1+1)?", "opciones": ["1", "2", "11"], "respuesta": 1},
+        ]
     }
-}
+]
+
+# Los cuestionarios viven en la base de datos (tablas cuestionarios, preguntas y
+# opciones). En memoria se guarda cada uno ya cargado junto con su clave de
+# respuestas compilada y su vista pública serializada; sin base de datos, la
+# memoria es el único almacén.
+DATA = {"cuestionarios": {}}
+ANSWER_KEYS = {}
+PUBLIC_VIEWS = {}
+# Otra réplica puede reemplazar un cuestionario: cada cuánto (segundos) se compara
+# la copia en memoria con `actualizado_en` de la base de datos, y
+# id -> (actualizado_en de la copia en memoria, última comprobación)
+CUESTIONARIOS_TTL = float(os.getenv("CUESTIONARIOS_TTL", "2"))
+VERSIONES = {}
+
+
+def _cachear(cuestionario, version=None):
+    """
+    Guarda en memoria el cuestionario junto con su clave compilada y su vista
+    pública. `version` es su `actualizado_en` (None: desconocida, se relee en
+    la próxima comprobación).
+    """
+    key = AnswerKey.compile(cuestionario)
+    view = PublicView.build(cuestionario)
+    cid = cuestionario["id"]
+    DATA["cuestionarios"][cid] = cuestionario
+    ANSWER_KEYS[cid] = key
+    PUBLIC_VIEWS[cid] = view
+    VERSIONES[cid] = (version, time.monotonic())
+
+
+def _conectar_db():
+    """
+    Crea las tablas, siembra los cuestionarios iniciales y los carga todos
+    como pares (cuestionario, versión); None si no hay base de datos.
+    """
+    try:
+        create_db_and_tables()
+        with SessionLocal() as db:
+            if not crud.list_cuestionarios(db):
+                try:
+                    for q in CUESTIONARIOS_INICIALES:
+                        crud.guardar_cuestionario(db, q)
+                except IntegrityError:
+                    db.rollback()  # otra réplica sembró a la vez
+            # Versiones antes que datos: si algo cambia entre medias, se relee en la primera comprobación
+            versiones = crud.versiones(db)
+            return [(q, versiones.get(q["id"])) for q in crud.list_cuestionarios(db)]
+    except Exception as e:
+        print(f"Base de datos no disponible para los cuestionarios ({e}); usando memoria")
+        return None
+
+
+_cargados = _conectar_db()
+DB_DISPONIBLE = _cargados is not None
+for _q, _version in (_cargados if DB_DISPONIBLE else [(q, None) for q in CUESTIONARIOS_INICIALES]):
+    _cachear(_q, _version)
+
+
+def _cargar(cuestionario_id):
+    """
+    Trae a memoria un cuestionario creado o reemplazado por otra réplica; True
+    si existe. Una copia ya en memoria se da por buena durante
+    CUESTIONARIOS_TTL segundos; después se consulta solo su `actualizado_en`
+    y se relee si cambió.
+    """
+    if not DB_DISPONIBLE:
+        return cuestionario_id in ANSWER_KEYS
+    version, comprobado = VERSIONES.get(cuestionario_id, (None, 0))
+    en_memoria = cuestionario_id in ANSWER_KEYS
+    if en_memoria and time.monotonic() - comprobado < CUESTIONARIOS_TTL:
+        return True
+    try:
+        with SessionLocal() as db:
+            actual = crud.version_cuestionario(db, cuestionario_id)
+            if actual is None:
+                return en_memoria
+            if en_memoria and actual == version:
+                VERSIONES[cuestionario_id] = (version, time.monotonic())
+                return True
+            cuestionario = crud.get_cuestionario(db, cuestionario_id)
+    except SQLAlchemyError as e:
+        if not en_memoria:
+            raise
+        # Sin base de datos se sigue sirviendo la copia en memoria
+        print(f"No se pudo comprobar la versión de {cuestionario_id} ({e})")
+        return True
+    _cachear(cuestionario, actual)
+    return True
+
+
+def _registrar(cuestionario, db):
+    """Guarda el cuestionario (base de datos y memoria)."""
+    try:
+        AnswerKey.compile(cuestionario)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    version = None
+    if DB_DISPONIBLE:
+        # Lo que queda en memoria es lo que se leerá de la base de datos
+        guardado = crud.guardar_cuestionario(db, cuestionario)
+        cuestionario, version = crud.cuestionario_a_dict(guardado), guardado.actualizado_en
+    _cachear(cuestionario, version)
+
+# Intentos calificados: tabla `intentos` con escritura por lotes, o memoria si no hay base de datos
+intentos = create_intento_store()
 
 
 @app.get("/")
@@ -40,17 +163,26 @@ def health_check():
 
 
 @app.get("/{cuestionario_id}")
-def get_cuestionario(cuestionario_id: str):
-    q = DATA.get("cuestionarios", {}).get(cuestionario_id)
-    if not q:
+def get_cuestionario(cuestionario_id: str, request: Request):
+    # La vista sin respuestas se construye al guardar el cuestionario: aquí solo se sirven sus bytes
+    _cargar(cuestionario_id)
+    view = PUBLIC_VIEWS.get(cuestionario_id)
+    if view is None:
         raise HTTPException(status_code=404, detail="Cuestionario no encontrado")
-    # Do not expose answers in the response
-    safe = {"id": q["id"], "titulo": q["titulo"], "preguntas": []}
-    for p in q.get("preguntas", []):
-        qp = p.copy()
-        qp.pop("respuesta", None)
-        safe["preguntas"].append(qp)
-    return safe
+    if view.is_fresh(request.headers):
+        return Response(status_code=304, headers=view.headers())
+    return Response(content=view.body, media_type="application/json", headers=view.headers())
+
+
+@app.put("/{cuestionario_id}")
+def update_cuestionario(cuestionario_id: str, evaluacion: Evaluacion, db: Session = Depends(get_db)):
+    """Reemplazar un cuestionario; recompila su clave y su vista pública"""
+    if evaluacion.id != cuestionario_id:
+        raise HTTPException(status_code=400, detail="El id del cuerpo no coincide con la URL")
+    if not _cargar(cuestionario_id):
+        raise HTTPException(status_code=404, detail="Cuestionario no encontrado")
+    _registrar(evaluacion.dict(), db)
+    return {"message": "Evaluación actualizada", "evaluacion": evaluacion.dict()}
 
 
 class Respuestas(BaseModel):
@@ -58,27 +190,510 @@ class Respuestas(BaseModel):
 
 
 @app.post("/evaluaciones")
-def create_evaluacion(evaluacion: Evaluacion):
+def create_evaluacion(evaluacion: Evaluacion, db: Session = Depends(get_db)):
     """Crear una nueva evaluación"""
-    if evaluacion.id in DATA.get("cuestionarios", {}):
+    if _cargar(evaluacion.id):
         raise HTTPException(status_code=400, detail="Evaluación ya existe")
     
-    DATA.setdefault("cuestionarios", {})[evaluacion.id] = evaluacion.dict()
+    _registrar(evaluacion.dict(), db)
     return {"message": "Evaluación creada", "evaluacion": evaluacion.dict()}
 
 
+# Filas cuyo id se consulta de una vez en la base de datos durante el alta masiva
+BULK_BATCH_SIZE = 1000
+_write_lock = threading.Lock()
+
+
+def _parsear_fila(row):
+    """Las filas NDJSON llegan sin parsear; devuelve el dict o un str con el error."""
+    if isinstance(row, (bytes, str)):
+        try:
+            row = json.loads(row)
+        except ValueError as e:
+            return f"JSON inválido: {e}"
+    return row if isinstance(row, dict) else "Se esperaba un objeto JSON"
+
+
+def _ingest_evaluaciones(rows, atomic):
+    """Valida todas las filas y escribe las válidas en una sola transacción."""
+    results = []
+    valid = []
+    for fila, row in enumerate(rows):
+        row = _parsear_fila(row)
+        if isinstance(row, str):
+            results.append({"fila": fila, "status": "invalido", "error": row})
+            continue
+        try:
+            doc = Evaluacion(**row).dict()
+            AnswerKey.compile(doc)
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results.append({"fila": fila, "id": row.get("id"), "status": "invalido", "error": error})
+            continue
+        except (TypeError, ValueError) as e:
+            # Un campo con forma inesperada invalida solo su fila, no el lote
+            results.append({"fila": fila, "id": row.get("id"), "status": "invalido", "error": str(e)})
+            continue
+        valid.append((fila, doc))
+
+    with _write_lock, SessionLocal() as db:
+        # Duplicados contra el índice en memoria y, para los que no estén cargados,
+        # una consulta IN por lote a la tabla de cuestionarios
+        existentes = set()
+        if DB_DISPONIBLE:
+            pendientes = [doc["id"] for _, doc in valid if doc["id"] not in ANSWER_KEYS]
+            existentes = crud.ids_existentes(db, pendientes, BULK_BATCH_SIZE)
+        seen = set()
+        to_insert = []
+        for fila, doc in valid:
+            if doc["id"] in ANSWER_KEYS or doc["id"] in existentes or doc["id"] in seen:
+                error = "Id repetido en el lote" if doc["id"] in seen else "Evaluación ya existe"
+                results.append({"fila": fila, "id": doc["id"], "status": "duplicado", "error": error})
+                continue
+            seen.add(doc["id"])
+            to_insert.append((fila, doc))
+
+        failed = len(results)
+        if not (atomic and failed):
+            docs = [doc for _, doc in to_insert]
+            if DB_DISPONIBLE and docs:
+                try:
+                    crud.insertar_cuestionarios(db, docs)
+                except IntegrityError:
+                    # Otra réplica creó alguno de los ids entre la comprobación y el commit
+                    raise HTTPException(status_code=409, detail="Conflicto de ids con otra escritura; reintente")
+            for doc in docs:
+                # Lo que queda en memoria es lo que se leerá de la base de datos
+                _cachear(crud.normalizar(doc) if DB_DISPONIBLE else doc)
+            results.extend({"fila": fila, "id": doc["id"], "status": "creado"} for fila, doc in to_insert)
+
+    results.sort(key=lambda r: r["fila"])
+    created = len(results) - failed if not (atomic and failed) else 0
+    return {"total": len(rows), "creados": created, "errores": failed, "resultados": results}
+
+
+@app.post("/evaluaciones/bulk")
+async def create_evaluaciones_bulk(request: Request, atomic: bool = False):
+    """
+    Alta masiva de evaluaciones desde un array JSON o NDJSON (Content-Type: application/x-ndjson).
+    Con `atomic=true` no se escribe nada si alguna fila es inválida o duplicada.
+    """
+    rows = await _read_rows(request)
+    summary = await run_in_threadpool(_ingest_evaluaciones, rows, atomic)
+    if atomic and summary["errores"]:
+        return JSONResponse(status_code=400, content=summary)
+    return summary
+
+
+# Los intentos guardan el estudiante en una columna String(64): un id más largo se
+# rechaza en la petición en lugar de fallar después en el escritor de intentos
+ESTUDIANTE_ID_MAX = 64
+
+
 @app.post("/{cuestionario_id}/responder")
-def responder(cuestionario_id: str, body: Respuestas):
-    # very simple auto-grading using the stored answers if present
-    q = DATA.get("cuestionarios", {}).get(cuestionario_id)
-    if not q:
+def responder(
+    cuestionario_id: str, body: Respuestas, estudiante_id: Optional[str] = Query(default=None, max_length=ESTUDIANTE_ID_MAX)
+):
+    # auto-grading against the compiled answer key of the cuestionario
+    _cargar(cuestionario_id)
+    key = ANSWER_KEYS.get(cuestionario_id)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Cuestionario no encontrado")
+    resultado = key.grade(body.respuestas or {})
+    if estudiante_id:
+        # Se encola: el commit lo hace el escritor de intentos en segundo plano
+        intentos.guardar(nuevo_intento(cuestionario_id, estudiante_id, resultado, body.respuestas))
+    return resultado
+
+
+# Análisis de ítems por cuestionario; se pone al día con los intentos nuevos en cada consulta
+ANALISIS = {}
+
+
+@app.get("/{cuestionario_id}/analisis")
+def analisis_items(cuestionario_id: str):
+    """Dificultad, discriminación y distractores de cada pregunta según los intentos guardados"""
+    _cargar(cuestionario_id)
+    key = ANSWER_KEYS.get(cuestionario_id)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Cuestionario no encontrado")
+    analisis = ANALISIS.get(cuestionario_id)
+    if analisis is None or analisis.key is not key:
+        # Cuestionario nuevo o actualizado (otra clave): se recalcula desde el principio
+        analisis = ANALISIS[cuestionario_id] = AnalisisItems(key)
+    resultado = analisis.ponerse_al_dia(lambda ultimo, limite: intentos.desde(cuestionario_id, ultimo, limite))
+    return dict(resultado, cuestionario_id=cuestionario_id)
+
+
+@app.get("/{cuestionario_id}/estudiantes/{estudiante_id}/mejor-intento")
+def mejor_intento(cuestionario_id: str, estudiante_id: str):
+    """Intento con mayor nota del estudiante (el más antiguo en caso de empate)"""
+    intento = intentos.mejor(cuestionario_id, estudiante_id)
+    if intento is None:
+        raise HTTPException(status_code=404, detail="El estudiante no tiene intentos en este cuestionario")
+    return intento
+
+
+# Calificación por lotes: tamaño de bloque vectorizado y a partir de cuántos
+# envíos se reparten los bloques en un pool de procesos
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "5000"))
+BATCH_POOL_MIN = int(os.getenv("BATCH_POOL_MIN", "50000"))
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+_process_pool = None
+_encode = json.JSONEncoder().encode
+
+
+def _pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+    return _process_pool
+
+
+async def _read_rows(request: Request):
+    """
+    Lee el cuerpo como array JSON (lista de objetos) o NDJSON. Las líneas
+    NDJSON se devuelven sin parsear: lo hace calificar_lote en cada bloque.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in NDJSON_CONTENT_TYPES:
+        try:
+            data = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="Se esperaba un array JSON")
+        return data
+
+    rows = []
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        rows.extend(line for line in lines if line.strip())
+    if buffer.strip():
+        rows.append(buffer)
+    return rows
+
+
+def _stream_batch(key, envios):
+    """Genera una línea NDJSON por estudiante y, al final, el resumen de la cohorte."""
+    resumen = ResumenCohorte(key)
+    chunks = [envios[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(envios), BATCH_CHUNK_SIZE)]
+    if len(envios) >= BATCH_POOL_MIN and len(chunks) > 1 and (os.cpu_count() or 1) > 1:
+        # map conserva el orden de los bloques aunque terminen desordenados
+        lotes = _pool().map(calificar_lote, [key] * len(chunks), chunks)
+    else:
+        lotes = (calificar_lote(key, chunk) for chunk in chunks)
+    total = len(key.pregunta_ids)
+    for inicio, lote in zip(range(0, len(envios), BATCH_CHUNK_SIZE), lotes):
+        resumen.agregar(lote)
+        lines = [json.dumps({"fila": inicio + fila, "error": error}) for fila, error in lote["errores"]]
+        # Plantilla en lugar de json.dumps por línea: solo el id necesita codificarse
+        lines += [
+            f'{{"estudiante_id": {_encode(est)}, "score": {nota!r}, "correct": {ok}, "total": {total}, "puntos": {pts!r}}}'
+            for est, nota, ok, pts in zip(
+                lote["estudiantes"], lote["notas"].tolist(), lote["correctas"].tolist(), lote["puntos"].tolist()
+            )
+        ]
+        if lines:
+            yield "\n".join(lines) + "\n"
+    yield json.dumps({"resumen": resumen.resultado()}) + "\n"
+
+
+@app.post("/{cuestionario_id}/responder/batch")
+async def responder_batch(cuestionario_id: str, request: Request):
+    """
+    Califica una cohorte completa. El cuerpo es un array JSON o NDJSON de
+    {"estudiante_id": ..., "respuestas": {...}}; la respuesta es NDJSON con
+    una línea por estudiante (o {"fila", "error"} si el envío no es válido)
+    y una última línea {"resumen": {...}}.
+    """
+    _cargar(cuestionario_id)
+    key = ANSWER_KEYS.get(cuestionario_id)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Cuestionario no encontrado")
+    envios = await _read_rows(request)
+    return StreamingResponse(_stream_batch(key, envios), media_type="application/x-ndjson")
+
+
+# Calificación asíncrona: el envío se encola y lo califica un pool de procesos
+# local o, con Redis, los procesos de worker.py; el cliente consulta el trabajo
+def _trabajo_terminado(trabajo):
+    if trabajo["resultado"] is not None and trabajo["estudiante_id"]:
+        intentos.guardar(nuevo_intento(
+            trabajo["cuestionario_id"], trabajo["estudiante_id"], trabajo["resultado"], trabajo["respuestas"]
+        ))
+
+
+# Los workers externos leen los cuestionarios de la base de datos: sin ella la cola es local
+trabajos = create_trabajo_store(_trabajo_terminado, usar_redis=DB_DISPONIBLE)
+
+
+def _vista_trabajo(trabajo):
+    return {k: v for k, v in trabajo.items() if k != "respuestas"}
+
+
+@app.post("/{cuestionario_id}/responder/async", status_code=202)
+def responder_async(
+    cuestionario_id: str, body: Respuestas, estudiante_id: Optional[str] = Query(default=None, max_length=ESTUDIANTE_ID_MAX)
+):
+    """Encola el envío y devuelve el id del trabajo sin esperar a la calificación"""
+    _cargar(cuestionario_id)
+    key = ANSWER_KEYS.get(cuestionario_id)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Cuestionario no encontrado")
+    trabajo = trabajos.encolar(nuevo_trabajo(cuestionario_id, estudiante_id, body.respuestas or {}), key)
+    return _vista_trabajo(trabajo)
+
+
+@app.get("/trabajos/{trabajo_id}")
+def get_trabajo(trabajo_id: str, espera: float = 0):
+    """Estado y resultado del trabajo; con `espera` (segundos) se responde en cuanto termine"""
+    if espera > 0:
+        trabajo = trabajos.esperar(trabajo_id, min(espera, TRABAJOS_ESPERA_MAX))
+    else:
+        trabajo = trabajos.obtener(trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return _vista_trabajo(trabajo)
+
+
+# Banco de preguntas y plantillas de examen aleatorio por estudiante. Con base de
+# datos viven en las tablas banco_preguntas y plantillas y PLANTILLAS es una copia
+# (no cambian una vez creadas); sin ella, la memoria es el único almacén
+BANCO = BancoPreguntas()
+PLANTILLAS = {}
+
+
+class PreguntaBanco(BaseModel):
+    id: str
+    curso_id: str
+    tema: str
+    dificultad: str
+    texto: str
+    tipo: str = "opcion"
+    opciones: List[Any] = []
+    respuesta: Any = None
+    puntos: float = 1
+
+
+class SeccionPlantilla(BaseModel):
+    tema: str
+    dificultad: str
+    cantidad: int
+
+
+class PlantillaExamen(BaseModel):
+    id: str
+    curso_id: str
+    titulo: str
+    secciones: List[SeccionPlantilla]
+    barajar_opciones: bool = True
+
+
+@app.post("/banco/preguntas")
+def agregar_preguntas(preguntas: List[PreguntaBanco], db: Session = Depends(get_db)):
+    """Agregar preguntas al banco; las existentes no se modifican"""
+    ids = [p.id for p in preguntas]
+    existentes = crud.ids_banco(db, ids) if DB_DISPONIBLE else BANCO.preguntas.keys()
+    repetidas = sorted({pid for pid in ids if pid in existentes or ids.count(pid) > 1})
+    if repetidas:
+        raise HTTPException(status_code=400, detail=f"Preguntas ya existentes o repetidas: {', '.join(repetidas)}")
+    datos = [p.dict() for p in preguntas]
+    try:
+        # Cada pregunta tiene que poder calificarse cuando salga en un examen
+        for p in datos:
+            AnswerKey.compile({"preguntas": [p]})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if DB_DISPONIBLE:
+        try:
+            crud.agregar_al_banco(db, datos)
+        except IntegrityError:
+            raise HTTPException(status_code=400, detail="Preguntas ya existentes o repetidas")
+    else:
+        for p in datos:
+            BANCO.agregar(p)
+    return {"message": "Preguntas agregadas", "total": len(preguntas)}
+
+
+@app.get("/banco/preguntas")
+def buscar_preguntas(
+    curso_id: Optional[str] = None, tema: Optional[str] = None, dificultad: Optional[str] = None, db: Session = Depends(get_db)
+):
+    if DB_DISPONIBLE:
+        return {"preguntas": crud.buscar_en_banco(db, curso_id, tema, dificultad)}
+    ids = BANCO.buscar(curso_id, tema, dificultad)
+    return {"preguntas": [BANCO.preguntas[pid] for pid in ids]}
+
+
+@app.post("/plantillas")
+def crear_plantilla(plantilla: PlantillaExamen, db: Session = Depends(get_db)):
+    """Crear una plantilla; congela las preguntas candidatas de cada sección"""
+    if plantilla.id in PLANTILLAS or (DB_DISPONIBLE and crud.get_plantilla(db, plantilla.id)):
+        raise HTTPException(status_code=400, detail="Plantilla ya existe")
+    if any(s.cantidad < 1 for s in plantilla.secciones):
+        raise HTTPException(status_code=400, detail="Cada sección debe pedir al menos una pregunta")
+    banco = BANCO
+    if DB_DISPONIBLE:
+        # Las preguntas del curso, en orden de alta: las mismas candidatas que daría el banco en memoria
+        banco = BancoPreguntas()
+        for p in crud.buscar_en_banco(db, plantilla.curso_id):
+            banco.agregar(p)
+    try:
+        nueva = Plantilla.crear(
+            banco, plantilla.id, plantilla.curso_id, plantilla.titulo,
+            [s.dict() for s in plantilla.secciones], plantilla.barajar_opciones,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if DB_DISPONIBLE:
+        try:
+            crud.guardar_plantilla(db, nueva)
+        except IntegrityError:
+            raise HTTPException(status_code=400, detail="Plantilla ya existe")
+    PLANTILLAS[plantilla.id] = nueva
+    return {"message": "Plantilla creada", "plantilla": plantilla.dict()}
+
+
+def _plantilla(plantilla_id):
+    plantilla = PLANTILLAS.get(plantilla_id)
+    if plantilla is None and DB_DISPONIBLE:
+        # Creada por otra réplica o antes de reiniciar: con su sal guardada el examen es el mismo
+        with SessionLocal() as db:
+            guardada = crud.get_plantilla(db, plantilla_id)
+        if guardada is not None:
+            plantilla = PLANTILLAS[plantilla_id] = Plantilla(**guardada)
+    if plantilla is None:
+        raise HTTPException(status_code=404, detail="Plantilla no encontrada")
+    return plantilla
+
+
+@app.get("/plantillas/{plantilla_id}/examen")
+def examen_estudiante(plantilla_id: str, estudiante_id: str):
+    """Examen del estudiante, ensamblado al vuelo a partir de su semilla"""
+    plantilla = _plantilla(plantilla_id)
+    return plantilla.examen(*plantilla.ensamblar_uno(estudiante_id))
+
+
+@app.post("/plantillas/{plantilla_id}/responder")
+def responder_examen(plantilla_id: str, body: Respuestas, estudiante_id: str = Query(max_length=ESTUDIANTE_ID_MAX)):
+    """Califica con la clave reconstruida desde la semilla del estudiante; no hay copia guardada"""
+    plantilla = _plantilla(plantilla_id)
+    cuestionario = plantilla.cuestionario(*plantilla.ensamblar_uno(estudiante_id))
+    try:
+        key = AnswerKey.compile(cuestionario)
+    except ValueError as e:
+        # Preguntas de la plantilla que no se pueden calificar (p. ej. ids repetidos entre secciones)
+        raise HTTPException(status_code=422, detail=str(e))
+    resultado = key.grade(body.respuestas or {})
+    intentos.guardar(nuevo_intento(plantilla_id, estudiante_id, resultado, body.respuestas))
+    return resultado
+
+
+# Sesiones de examen con tiempo límite: el estado vive en Redis (o en memoria) y
+# un temporizador entrega automáticamente las que vencen sin haberse entregado
+sesiones = create_sesion_store()
+
+
+class Entrega(BaseModel):
+    respuestas: Optional[dict] = None
+
+
+def _cerrar_sesion(sesion_id, estado, respuestas=None):
+    """Cierra la sesión y la califica; devuelve None si ya estaba cerrada."""
+    sesion = sesiones.cerrar(sesion_id, estado)
+    if sesion is None:
+        return None
+    temporizador.cancelar(sesion_id)
+    if respuestas is not None:
+        sesion["respuestas"] = respuestas
+    _cargar(sesion["cuestionario_id"])
+    key = ANSWER_KEYS.get(sesion["cuestionario_id"])
+    resultado = key.grade(sesion["respuestas"] or {}) if key else None
+    sesiones.completar(sesion_id, resultado)
+    if resultado is not None:
+        intentos.guardar(nuevo_intento(sesion["cuestionario_id"], sesion["estudiante_id"], resultado, sesion["respuestas"]))
+    return dict(sesion, resultado=resultado)
+
+
+temporizador = TemporizadorSesiones(lambda sesion_id: _cerrar_sesion(sesion_id, "expirada"))
+# Vencimientos pendientes (p. ej. tras un reinicio); si otra réplica entrega antes, el cierre es un no-op
+for _limite, _sesion_id in sesiones.pendientes():
+    temporizador.programar(_limite, _sesion_id)
+
+
+def _barrer_vencidas():
+    """
+    Entrega las sesiones vencidas que no programó ningún temporizador vivo (las
+    de una réplica caída). Cada réplica reclama un lote distinto.
+    """
+    while True:
+        time.sleep(SESION_BARRIDO)
+        try:
+            reclamadas = sesiones.reclamar_vencidas(time.time())
+            while reclamadas:
+                for sesion_id in reclamadas:
+                    _cerrar_sesion(sesion_id, "expirada")
+                reclamadas = sesiones.reclamar_vencidas(time.time())
+        except Exception as e:
+            print(f"Error reclamando sesiones vencidas: {e}")
+
+
+threading.Thread(target=_barrer_vencidas, name="sesiones-barrido", daemon=True).start()
+
+
+def _vista_sesion(sesion):
+    limite = sesion["limite"]
+    restante = max(0.0, limite - time.time()) if limite is not None and sesion["estado"] == "abierta" else None
+    return dict(sesion, restante_segundos=restante)
+
+
+@app.post("/{cuestionario_id}/sesiones")
+def iniciar_sesion(cuestionario_id: str, estudiante_id: str = Query(max_length=ESTUDIANTE_ID_MAX)):
+    """Inicia el examen; si el estudiante ya tiene una sesión abierta se devuelve esa"""
+    _cargar(cuestionario_id)
+    q = DATA["cuestionarios"].get(cuestionario_id)
+    if q is None:
         raise HTTPException(status_code=404, detail="Cuestionario no encontrado")
-    correct = 0
-    total = len(q.get("preguntas", []))
-    for p in q.get("preguntas", []):
-        pid = p.get("id")
-        if pid in (body.respuestas or {}) and body.respuestas[pid] == p.get("respuesta"):
-            correct += 1
-    score = (correct / total * 100) if total else 0
-    return {"score": score, "correct": correct, "total": total}
+    sesion = sesiones.crear(nueva_sesion(cuestionario_id, estudiante_id, q.get("duracion_minutos")))
+    if sesion["limite"] is not None:
+        temporizador.programar(vencimiento(sesion), sesion["id"])
+    return _vista_sesion(sesion)
+
+
+def _sesion(sesion_id):
+    sesion = sesiones.obtener(sesion_id)
+    if sesion is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return sesion
+
+
+@app.get("/sesiones/{sesion_id}")
+def get_sesion(sesion_id: str):
+    return _vista_sesion(_sesion(sesion_id))
+
+
+@app.put("/sesiones/{sesion_id}/respuestas")
+def guardar_respuestas(sesion_id: str, body: Respuestas):
+    """Guarda el avance; es lo que se califica si la sesión vence sin entregarse"""
+    sesion = _sesion(sesion_id)
+    if sesion["limite"] is not None and time.time() > vencimiento(sesion):
+        raise HTTPException(status_code=409, detail="El tiempo de la sesión terminó")
+    if not sesiones.guardar_respuestas(sesion_id, body.respuestas or {}):
+        raise HTTPException(status_code=409, detail=f"La sesión ya está {sesiones.obtener(sesion_id)['estado']}")
+    return {"message": "Respuestas guardadas"}
+
 
+@app.post("/sesiones/{sesion_id}/entregar")
+def entregar_sesion(sesion_id: str, body: Entrega):
+    """Entrega y califica la sesión; sin `respuestas` se usan las guardadas"""
+    sesion = _sesion(sesion_id)
+    if sesion["limite"] is not None and time.time() > vencimiento(sesion):
+        # El temporizador la entregará (o ya lo hizo) con las respuestas guardadas
+        raise HTTPException(status_code=409, detail="El tiempo de la sesión terminó")
+    cerrada = _cerrar_sesion(sesion_id, "entregada", body.respuestas)
+    if cerrada is None:
+        raise HTTPException(status_code=409, detail=f"La sesión ya está {sesiones.obtener(sesion_id)['estado']}")
+    return _vista_sesion(cerrada)
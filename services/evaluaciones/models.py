@@ -1,32 +1,124 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Float, ForeignKey, Index, JSON, LargeBinary, Text, UniqueConstraint
+from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
-from pydantic import BaseModel
-from typing import Optional
-
 Base = declarative_base()
 
-class YourModel(Base):
-    __tablename__ = "[nombre_de_tu_tabla]"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+class Cuestionario(Base):
+    __tablename__ = "cuestionarios"
+    id = Column(String(64), primary_key=True)
+    curso_id = Column(String(64), index=True)
+    titulo = Column(String(255), nullable=False)
+    tipo = Column(String(32))
+    descripcion = Column(Text)
+    duracion_minutos = Column(Integer)
+    puntos_totales = Column(Integer)
+    # Evaluaciones creadas solo con el número de preguntas, sin su detalle
+    num_preguntas = Column(Integer)
+    creado_en = Column(DateTime, default=datetime.utcnow, nullable=False)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    preguntas = relationship(
+        "Pregunta", back_populates="cuestionario", order_by="Pregunta.posicion",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
 
     def __repr__(self):
-        return f"<YourModel(id={self.id}, name='{self.name}')>"
+        return f"<Cuestionario(id='{self.id}', titulo='{self.titulo}')>"
+
+
+class Pregunta(Base):
+    __tablename__ = "preguntas"
+    pk = Column(Integer, primary_key=True)
+    cuestionario_id = Column(String(64), ForeignKey("cuestionarios.id", ondelete="CASCADE"), nullable=False)
+    # Id de la pregunta dentro del cuestionario ("p1"), el que usan las respuestas
+    id = Column(String(64), nullable=False)
+    posicion = Column(Integer, nullable=False)
+    tipo = Column(String(32), default="opcion", nullable=False)
+    texto = Column(Text)
+    puntos = Column(Float, default=1, nullable=False)
+    # Índice, lista de índices o texto de la respuesta correcta
+    respuesta = Column(JSON)
+    # Otros campos de la pregunta que no tienen columna propia
+    extra = Column(JSON)
+
+    cuestionario = relationship("Cuestionario", back_populates="preguntas")
+    opciones = relationship(
+        "Opcion", order_by="Opcion.posicion", cascade="all, delete-orphan", passive_deletes=True,
+    )
+
+    __table_args__ = (
+        UniqueConstraint("cuestionario_id", "id", name="uq_preguntas_cuestionario_id"),
+        Index("ix_preguntas_cuestionario_posicion", "cuestionario_id", "posicion"),
+    )
+
+
+class Opcion(Base):
+    __tablename__ = "opciones"
+    pk = Column(Integer, primary_key=True)
+    pregunta_pk = Column(Integer, ForeignKey("preguntas.pk", ondelete="CASCADE"), nullable=False)
+    posicion = Column(Integer, nullable=False)
+    texto = Column(Text, nullable=False)
 
-class YourModelBase(BaseModel):
-    name: str
-    description: Optional[str] = None
+    __table_args__ = (
+        UniqueConstraint("pregunta_pk", "posicion", name="uq_opciones_pregunta_posicion"),
+    )
 
-class YourModelCreate(YourModelBase):
-    pass
 
-class YourModelRead(YourModelBase):
-    id: int
-    created_at: datetime
-    
-    class Config:
-        orm_mode = True
+class PreguntaBanco(Base):
+    """Pregunta del banco; no se modifica una vez agregada."""
+    __tablename__ = "banco_preguntas"
+    # El orden de alta es el de `pk`
+    pk = Column(Integer, primary_key=True)
+    id = Column(String(64), nullable=False, unique=True)
+    curso_id = Column(String(64), nullable=False)
+    tema = Column(String(64), nullable=False)
+    dificultad = Column(String(64), nullable=False)
+    # La pregunta completa, tal como se agregó
+    datos = Column(JSON, nullable=False)
+
+    __table_args__ = (
+        Index("ix_banco_preguntas_curso_tema_dificultad", "curso_id", "tema", "dificultad", "pk"),
+    )
+
+
+class PlantillaExamen(Base):
+    """
+    Plantilla de examen con sus preguntas candidatas congeladas y su sal:
+    cualquier réplica, también tras reiniciar, reconstruye el mismo examen.
+    """
+    __tablename__ = "plantillas"
+    id = Column(String(64), primary_key=True)
+    curso_id = Column(String(64), nullable=False)
+    titulo = Column(String(255), nullable=False)
+    secciones = Column(JSON, nullable=False)
+    # Una lista de preguntas por sección
+    candidatas = Column(JSON, nullable=False)
+    barajar_opciones = Column(Boolean, nullable=False)
+    sal = Column(LargeBinary(16), nullable=False)
+    creado_en = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Intento(Base):
+    """Un envío calificado de un estudiante a un cuestionario."""
+    __tablename__ = "intentos"
+    id = Column(Integer, primary_key=True)
+    cuestionario_id = Column(String(64), nullable=False)
+    estudiante_id = Column(String(64), nullable=False)
+    score = Column(Float, nullable=False)
+    correct = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+    puntos = Column(Float, nullable=False)
+    respuestas = Column(JSON)
+    creado_en = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    __table_args__ = (
+        # Búsqueda por (cuestionario, estudiante); al incluir la nota ordenada, el
+        # mejor intento es el primer elemento del índice (una sola búsqueda en el B-tree)
+        Index("ix_intentos_cuestionario_estudiante", "cuestionario_id", "estudiante_id", score.desc(), "id"),
+        # Lectura incremental por cuestionario a partir del último id procesado (análisis de ítems)
+        Index("ix_intentos_cuestionario_id", "cuestionario_id", "id"),
+    )
+
+    def __repr__(self):
+        return f"<Intento(id={self.id}, cuestionario_id='{self.cuestionario_id}', estudiante_id='{self.estudiante_id}')>"
@@ -0,0 +1,48 @@
+import json
+import time
+from email.utils import formatdate
+
+from common.helpers.http_cache import is_fresh, strong_etag
+from grading import _preguntas
+
+
+def _sin_respuestas(cuestionario):
+    """Copia del cuestionario que se puede mostrar al estudiante: sin el campo `respuesta`."""
+    return {
+        "id": cuestionario["id"],
+        "titulo": cuestionario.get("titulo"),
+        "preguntas": [{k: v for k, v in p.items() if k != "respuesta"} for p in _preguntas(cuestionario)],
+    }
+
+
+class PublicView:
+    """
+    Vista pública de un cuestionario ya serializada. Se construye al crear o
+    actualizar el cuestionario y GET /{id} sirve estos bytes sin tocarlos.
+    """
+
+    __slots__ = ("body", "etag", "modified_at")
+
+    def __init__(self, body, modified_at):
+        self.body = body
+        self.etag = strong_etag(body)
+        self.modified_at = modified_at
+
+    @classmethod
+    def build(cls, cuestionario):
+        # Mismos bytes que produciría JSONResponse, para que el ETag describa lo enviado
+        body = json.dumps(
+            _sin_respuestas(cuestionario), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        return cls(body, time.time())
+
+    def headers(self):
+        return {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.modified_at, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+
+    def is_fresh(self, request_headers):
+        """True si la petición condicional del cliente sigue siendo válida (304)."""
+        return is_fresh(request_headers, self.etag, self.modified_at)
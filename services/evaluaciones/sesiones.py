@@ -0,0 +1,272 @@
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+
+# Segundos de cortesía tras el límite para aceptar una entrega en tránsito
+SESION_GRACIA = float(os.getenv("SESION_GRACIA", "5"))
+# Cuánto se conservan las sesiones cerradas en Redis
+SESION_TTL = int(os.getenv("SESION_TTL", str(7 * 24 * 3600)))
+# Cada cuánto cada réplica reclama las sesiones vencidas que nadie entregó (p. ej.
+# las de una réplica caída) y cuántas como mucho por vuelta
+SESION_BARRIDO = float(os.getenv("SESION_BARRIDO", "10"))
+SESION_BARRIDO_LOTE = int(os.getenv("SESION_BARRIDO_LOTE", "100"))
+
+PREFIJO = "evaluaciones:sesion:"
+LIMITES_KEY = "evaluaciones:sesiones:limites"
+
+# Crea la sesión salvo que el estudiante ya tenga una abierta en ese cuestionario
+_CREAR_SCRIPT = """
+local actual = redis.call('GET', KEYS[2])
+if actual and redis.call('HGET', ARGV[4] .. actual, 'estado') == 'abierta' then
+    return actual
+end
+redis.call('HSET', KEYS[1], 'id', ARGV[1], 'estado', 'abierta', 'datos', ARGV[2])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[5])
+if ARGV[3] ~= '' then
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+end
+return ARGV[1]
+"""
+
+# Solo se guardan respuestas mientras la sesión siga abierta
+_RESPUESTAS_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'estado') ~= 'abierta' then return 0 end
+redis.call('HSET', KEYS[1], 'respuestas', ARGV[1])
+return 1
+"""
+
+# abierta -> entregada/expirada: solo un llamador (de cualquier réplica) gana la transición
+_CERRAR_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'estado') ~= 'abierta' then return false end
+redis.call('HSET', KEYS[1], 'estado', ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[2])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+
+# Reclama las sesiones vencidas: las abiertas se aplazan ARGV[2] (si quien las reclama
+# cae antes de cerrarlas, otra réplica las vuelve a reclamar) y las ya cerradas o
+# caducadas salen del sorted set
+_RECLAMAR_SCRIPT = """
+local reclamadas = {}
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])) do
+    if redis.call('HGET', ARGV[4] .. id, 'estado') == 'abierta' then
+        redis.call('ZADD', KEYS[1], ARGV[2], id)
+        table.insert(reclamadas, id)
+    else
+        redis.call('ZREM', KEYS[1], id)
+    end
+end
+return reclamadas
+"""
+
+
+def nueva_sesion(cuestionario_id, estudiante_id, duracion_minutos):
+    inicio = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "cuestionario_id": cuestionario_id,
+        "estudiante_id": estudiante_id,
+        "inicio": inicio,
+        "limite": inicio + duracion_minutos * 60 if duracion_minutos else None,
+        "estado": "abierta",
+        "respuestas": {},
+        "resultado": None,
+    }
+
+
+def vencimiento(sesion):
+    """Momento a partir del cual la sesión se entrega sola (límite más cortesía)."""
+    return sesion["limite"] + SESION_GRACIA if sesion["limite"] is not None else None
+
+
+class LocalSesionStore:
+    """Sesiones en memoria del proceso (sustituto de Redis)."""
+
+    def __init__(self):
+        self._sesiones = {}
+        self._activas = {}
+        self._lock = threading.Lock()
+
+    def crear(self, sesion):
+        with self._lock:
+            key = (sesion["cuestionario_id"], sesion["estudiante_id"])
+            actual = self._sesiones.get(self._activas.get(key))
+            if actual is not None and actual["estado"] == "abierta":
+                return dict(actual)
+            self._sesiones[sesion["id"]] = dict(sesion)
+            self._activas[key] = sesion["id"]
+            return dict(sesion)
+
+    def obtener(self, sesion_id):
+        sesion = self._sesiones.get(sesion_id)
+        return dict(sesion) if sesion else None
+
+    def guardar_respuestas(self, sesion_id, respuestas):
+        with self._lock:
+            sesion = self._sesiones.get(sesion_id)
+            if sesion is None or sesion["estado"] != "abierta":
+                return False
+            sesion["respuestas"] = respuestas
+            return True
+
+    def cerrar(self, sesion_id, estado):
+        with self._lock:
+            sesion = self._sesiones.get(sesion_id)
+            if sesion is None or sesion["estado"] != "abierta":
+                return None
+            sesion["estado"] = estado
+            return dict(sesion)
+
+    def completar(self, sesion_id, resultado):
+        with self._lock:
+            self._sesiones[sesion_id]["resultado"] = resultado
+
+    def pendientes(self):
+        return []
+
+    def reclamar_vencidas(self, ahora, limite=SESION_BARRIDO_LOTE):
+        # Solo este proceso tiene sesiones y su temporizador ya las programó todas
+        return []
+
+
+class RedisSesionStore:
+    """
+    Sesiones en Redis, compartidas por todas las réplicas: un hash por sesión
+    y un sorted set con los vencimientos de las abiertas, del que cada réplica
+    recupera sus temporizadores al arrancar y reclama periódicamente las que
+    vencieron sin que nadie las entregara.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._crear = client.register_script(_CREAR_SCRIPT)
+        self._respuestas = client.register_script(_RESPUESTAS_SCRIPT)
+        self._cerrar = client.register_script(_CERRAR_SCRIPT)
+        self._reclamar = client.register_script(_RECLAMAR_SCRIPT)
+
+    @staticmethod
+    def _decodificar(campos):
+        if not campos:
+            return None
+        campos = {k.decode(): v.decode() for k, v in campos.items()}
+        sesion = json.loads(campos["datos"])
+        sesion["estado"] = campos["estado"]
+        sesion["respuestas"] = json.loads(campos.get("respuestas", "{}"))
+        sesion["resultado"] = json.loads(campos["resultado"]) if "resultado" in campos else None
+        return sesion
+
+    def crear(self, sesion):
+        datos = {k: v for k, v in sesion.items() if k not in ("estado", "respuestas", "resultado")}
+        limite = vencimiento(sesion)
+        sesion_id = self._crear(
+            keys=[
+                PREFIJO + sesion["id"],
+                f"{PREFIJO}activa:{sesion['cuestionario_id']}:{sesion['estudiante_id']}",
+                LIMITES_KEY,
+            ],
+            args=[sesion["id"], json.dumps(datos), "" if limite is None else limite, PREFIJO, SESION_TTL],
+        ).decode()
+        return self.obtener(sesion_id)
+
+    def obtener(self, sesion_id):
+        return self._decodificar(self._client.hgetall(PREFIJO + sesion_id))
+
+    def guardar_respuestas(self, sesion_id, respuestas):
+        return bool(self._respuestas(keys=[PREFIJO + sesion_id], args=[json.dumps(respuestas)]))
+
+    def cerrar(self, sesion_id, estado):
+        campos = self._cerrar(keys=[PREFIJO + sesion_id, LIMITES_KEY], args=[estado, sesion_id])
+        if not campos:
+            return None
+        return self._decodificar(dict(zip(campos[::2], campos[1::2])))
+
+    def completar(self, sesion_id, resultado):
+        pipe = self._client.pipeline()
+        pipe.hset(PREFIJO + sesion_id, "resultado", json.dumps(resultado))
+        pipe.expire(PREFIJO + sesion_id, SESION_TTL)
+        pipe.execute()
+
+    def pendientes(self):
+        return [(limite, sid.decode()) for sid, limite in self._client.zrange(LIMITES_KEY, 0, -1, withscores=True)]
+
+    def reclamar_vencidas(self, ahora, limite=SESION_BARRIDO_LOTE):
+        """Ids de hasta `limite` sesiones abiertas ya vencidas, reservadas para esta réplica."""
+        ids = self._reclamar(keys=[LIMITES_KEY], args=[ahora, ahora + SESION_BARRIDO, limite, PREFIJO])
+        return [sid.decode() for sid in ids]
+
+
+class TemporizadorSesiones:
+    """
+    Vencimientos de sesiones en un heap. Un único hilo duerme hasta el más
+    próximo (Condition.wait con ese plazo) y despierta antes solo si llega uno
+    más cercano: no hay sondeo y programar o cancelar cuesta O(log n).
+    """
+
+    def __init__(self, al_vencer):
+        self._al_vencer = al_vencer
+        self._heap = []
+        self._programados = {}
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="sesiones-timer", daemon=True)
+        self._thread.start()
+
+    def programar(self, limite, sesion_id):
+        with self._cond:
+            heapq.heappush(self._heap, (limite, sesion_id))
+            self._programados[sesion_id] = limite
+            if self._heap[0][1] == sesion_id:
+                self._cond.notify()
+
+    def cancelar(self, sesion_id):
+        # Borrado perezoso: la entrada se descarta cuando llega a la cima del heap
+        with self._cond:
+            self._programados.pop(sesion_id, None)
+
+    def __len__(self):
+        return len(self._programados)
+
+    def _vencidas(self):
+        """Bloquea hasta que haya vencimientos y los saca todos de una vez."""
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                espera = self._heap[0][0] - time.time()
+                if espera > 0:
+                    self._cond.wait(espera)
+                    continue
+                vencidas = []
+                ahora = time.time()
+                while self._heap and self._heap[0][0] <= ahora:
+                    limite, sesion_id = heapq.heappop(self._heap)
+                    if self._programados.get(sesion_id) == limite:
+                        del self._programados[sesion_id]
+                        vencidas.append(sesion_id)
+                if vencidas:
+                    return vencidas
+
+    def _run(self):
+        while True:
+            for sesion_id in self._vencidas():
+                try:
+                    self._al_vencer(sesion_id)
+                except Exception as e:
+                    print(f"Error entregando la sesión vencida {sesion_id}: {e}")
+
+
+def create_sesion_store():
+    """Usa Redis si responde; si no, un almacén local al proceso."""
+    try:
+        from database_redis import get_redis_client
+
+        client = get_redis_client(socket_connect_timeout=1, socket_timeout=2)
+        client.ping()
+        return RedisSesionStore(client)
+    except Exception as e:
+        print(f"Redis no disponible para las sesiones ({e}); usando almacén local")
+        return LocalSesionStore()
@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Procesos que califican en modo local y cuánto se conservan los trabajos terminados
+TRABAJOS_PROCESOS = int(os.getenv("TRABAJOS_PROCESOS", str(os.cpu_count() or 2)))
+TRABAJOS_TTL = int(os.getenv("TRABAJOS_TTL", str(24 * 3600)))
+# Espera máxima de una consulta larga (long-poll) por el resultado
+TRABAJOS_ESPERA_MAX = float(os.getenv("TRABAJOS_ESPERA_MAX", "30"))
+
+PREFIJO = "evaluaciones:trabajo:"
+COLA_KEY = "evaluaciones:trabajos:cola"
+EN_CURSO_PREFIJO = "evaluaciones:trabajos:en_curso:"
+
+
+def nuevo_trabajo(cuestionario_id, estudiante_id, respuestas):
+    return {
+        "id": uuid.uuid4().hex,
+        "cuestionario_id": cuestionario_id,
+        "estudiante_id": estudiante_id,
+        "respuestas": respuestas,
+        "estado": "pendiente",
+        "creado_en": time.time(),
+        "terminado_en": None,
+        "resultado": None,
+        "error": None,
+    }
+
+
+def calificar_envio(key, respuestas):
+    """
+    Califica un envío fuera del proceso web. Aquí se enchufan las
+    calificaciones costosas (crédito parcial en texto libre o código);
+    hoy es la comparación exacta de AnswerKey.grade.
+    """
+    return key.grade(respuestas or {})
+
+
+def _terminado(trabajo, resultado=None, error=None):
+    return dict(
+        trabajo,
+        estado="error" if error else "completado",
+        resultado=resultado,
+        error=error,
+        terminado_en=time.time(),
+    )
+
+
+class LocalTrabajoStore:
+    """
+    Cola en el propio proceso (sustituto de Redis): los trabajos se reparten
+    en un pool de procesos y `al_terminar` recibe cada trabajo terminado.
+    """
+
+    def __init__(self, al_terminar, procesos=TRABAJOS_PROCESOS):
+        self._al_terminar = al_terminar
+        self._procesos = procesos
+        self._pool = None
+        self._trabajos = OrderedDict()
+        self._eventos = {}
+        self._lock = threading.Lock()
+
+    def _ejecutor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._procesos)
+        return self._pool
+
+    def encolar(self, trabajo, key):
+        evento = threading.Event()
+        with self._lock:
+            self._purgar()
+            self._trabajos[trabajo["id"]] = dict(trabajo)
+            self._eventos[trabajo["id"]] = evento
+        futuro = self._ejecutor().submit(calificar_envio, key, trabajo["respuestas"])
+        futuro.add_done_callback(lambda f: self._terminar(trabajo, f))
+        return dict(trabajo)
+
+    def _terminar(self, trabajo, futuro):
+        try:
+            terminado = _terminado(trabajo, resultado=futuro.result())
+        except Exception as e:
+            terminado = _terminado(trabajo, error=str(e))
+        with self._lock:
+            self._trabajos[trabajo["id"]] = terminado
+            evento = self._eventos.pop(trabajo["id"], None)
+        try:
+            self._al_terminar(terminado)
+        finally:
+            if evento:
+                evento.set()
+
+    def _purgar(self):
+        # Los trabajos están en orden de llegada: se descartan los más antiguos ya terminados
+        limite = time.time() - TRABAJOS_TTL
+        while self._trabajos:
+            trabajo = next(iter(self._trabajos.values()))
+            if trabajo["terminado_en"] is None or trabajo["terminado_en"] > limite:
+                break
+            self._trabajos.popitem(last=False)
+
+    def obtener(self, trabajo_id):
+        trabajo = self._trabajos.get(trabajo_id)
+        return dict(trabajo) if trabajo else None
+
+    def esperar(self, trabajo_id, timeout):
+        """Devuelve el trabajo en cuanto termine o al agotar `timeout`."""
+        evento = self._eventos.get(trabajo_id)
+        if evento is not None:
+            evento.wait(timeout)
+        return self.obtener(trabajo_id)
+
+
+class RedisTrabajoStore:
+    """
+    Cola en Redis compartida por todas las réplicas: cada trabajo es un hash
+    y su id se encola en una lista que consumen los procesos de worker.py.
+    Cada worker mueve el id a su propia lista "en curso" (BLMOVE), así un
+    trabajo no se pierde si el worker muere a mitad: al arrancar los devuelve
+    a la cola. Al terminar se publica en el canal del trabajo.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    @staticmethod
+    def _decodificar(campos):
+        if not campos:
+            return None
+        return json.loads(campos[b"datos"])
+
+    def _guardar(self, pipe, trabajo):
+        pipe.hset(PREFIJO + trabajo["id"], mapping={"datos": json.dumps(trabajo), "estado": trabajo["estado"]})
+        pipe.expire(PREFIJO + trabajo["id"], TRABAJOS_TTL)
+
+    def encolar(self, trabajo, key=None):
+        # La clave no viaja por Redis: el worker carga el cuestionario de la base de datos
+        pipe = self._client.pipeline()
+        self._guardar(pipe, trabajo)
+        pipe.lpush(COLA_KEY, trabajo["id"])
+        pipe.execute()
+        return dict(trabajo)
+
+    def obtener(self, trabajo_id):
+        return self._decodificar(self._client.hgetall(PREFIJO + trabajo_id))
+
+    def esperar(self, trabajo_id, timeout):
+        trabajo = self.obtener(trabajo_id)
+        if trabajo is None or trabajo["estado"] not in ("pendiente", "en_curso"):
+            return trabajo
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(PREFIJO + trabajo_id)
+            # Se vuelve a leer tras suscribirse: pudo terminar entre la lectura y la suscripción
+            trabajo = self.obtener(trabajo_id)
+            limite = time.monotonic() + timeout
+            while trabajo["estado"] in ("pendiente", "en_curso"):
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                if pubsub.get_message(timeout=restante):
+                    trabajo = self.obtener(trabajo_id)
+            return trabajo
+        finally:
+            pubsub.close()
+
+    # Lado del worker
+
+    def recuperar(self, worker):
+        """Devuelve a la cola los trabajos que este worker dejó a medias."""
+        n = 0
+        while self._client.lmove(EN_CURSO_PREFIJO + worker, COLA_KEY, "RIGHT", "RIGHT"):
+            n += 1
+        return n
+
+    def tomar(self, worker, timeout=5):
+        trabajo_id = self._client.blmove(COLA_KEY, EN_CURSO_PREFIJO + worker, timeout, "RIGHT", "LEFT")
+        if trabajo_id is None:
+            return None
+        trabajo = self.obtener(trabajo_id.decode())
+        if trabajo is None:
+            # Expiró antes de procesarse
+            self._client.lrem(EN_CURSO_PREFIJO + worker, 1, trabajo_id)
+            return None
+        trabajo["estado"] = "en_curso"
+        self._client.hset(PREFIJO + trabajo["id"], mapping={"datos": json.dumps(trabajo), "estado": "en_curso"})
+        return trabajo
+
+    def terminar(self, worker, trabajo, resultado=None, error=None):
+        terminado = _terminado(trabajo, resultado, error)
+        pipe = self._client.pipeline()
+        self._guardar(pipe, terminado)
+        pipe.lrem(EN_CURSO_PREFIJO + worker, 1, trabajo["id"])
+        pipe.publish(PREFIJO + trabajo["id"], terminado["estado"])
+        pipe.execute()
+        return terminado
+
+
+def create_trabajo_store(al_terminar, usar_redis=True):
+    """Usa Redis si responde (y lo pide el llamador); si no, una cola local al proceso."""
+    if usar_redis:
+        try:
+            from database_redis import get_redis_client
+
+            client = get_redis_client(socket_connect_timeout=1, socket_timeout=TRABAJOS_ESPERA_MAX + 5)
+            client.ping()
+            return RedisTrabajoStore(client)
+        except Exception as e:
+            print(f"Redis no disponible para los trabajos ({e}); usando cola local")
+    return LocalTrabajoStore(al_terminar)
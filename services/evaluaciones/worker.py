@@ -0,0 +1,81 @@
+"""
+Worker de calificación asíncrona: toma trabajos de la cola de Redis que
+llena POST /{cuestionario_id}/responder/async, los califica y guarda el
+resultado (y el intento) para que el cliente lo consulte.
+
+Uso:
+    cd services/evaluaciones
+    python worker.py --procesos 4
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+
+# Segundos que se reutiliza una clave de respuestas antes de releer el cuestionario
+WORKER_CACHE_TTL = float(os.getenv("WORKER_CACHE_TTL", "60"))
+
+
+def _bucle(worker):
+    # Cada proceso abre sus propias conexiones (Redis, pool SQL, escritor de intentos)
+    import crud
+    from database_redis import get_redis_client
+    from database_sql import SessionLocal
+    from grading import AnswerKey
+    from intentos import create_intento_store, nuevo_intento
+    from trabajos import RedisTrabajoStore, calificar_envio
+
+    store = RedisTrabajoStore(get_redis_client())
+    intentos = create_intento_store()
+    claves = {}
+
+    def clave(cuestionario_id):
+        key, cargada = claves.get(cuestionario_id, (None, 0))
+        if key is None or time.monotonic() - cargada > WORKER_CACHE_TTL:
+            with SessionLocal() as db:
+                cuestionario = crud.get_cuestionario(db, cuestionario_id)
+            key = AnswerKey.compile(cuestionario) if cuestionario else None
+            claves[cuestionario_id] = (key, time.monotonic())
+        return key
+
+    recuperados = store.recuperar(worker)
+    if recuperados:
+        print(f"[{worker}] {recuperados} trabajos devueltos a la cola")
+    while True:
+        trabajo = store.tomar(worker)
+        if trabajo is None:
+            continue
+        try:
+            key = clave(trabajo["cuestionario_id"])
+            if key is None:
+                store.terminar(worker, trabajo, error="Cuestionario no encontrado")
+                continue
+            resultado = calificar_envio(key, trabajo["respuestas"])
+        except Exception as e:
+            store.terminar(worker, trabajo, error=str(e))
+            continue
+        if trabajo["estudiante_id"]:
+            intentos.guardar(nuevo_intento(trabajo["cuestionario_id"], trabajo["estudiante_id"], resultado, trabajo["respuestas"]))
+        store.terminar(worker, trabajo, resultado=resultado)
+
+
+def main_worker():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--nombre", default=socket.gethostname(), help="prefijo estable de los workers (para recuperar trabajos tras un reinicio)")
+    args = parser.parse_args()
+
+    procesos = [
+        multiprocessing.Process(target=_bucle, args=(f"{args.nombre}-{i}",), daemon=True)
+        for i in range(args.procesos)
+    ]
+    for p in procesos:
+        p.start()
+    print(f"{len(procesos)} workers de calificación en marcha")
+    for p in procesos:
+        p.join()
+
+
+if __name__ == "__main__":
+    main_worker()
@@ -0,0 +1,98 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+# Segundos que abarca cada intervalo y cuánto se conserva (en días) cada resolución:
+# por estudiante y curso hay como mucho ~2880 minutos, ~2160 horas y ~730 días guardados
+RESOLUCIONES = {"minuto": 60, "hora": 3600, "dia": 86400}
+RETENCION = {
+    "minuto": float(os.getenv("ACTIVIDAD_RETENCION_MINUTOS", "2")),
+    "hora": float(os.getenv("ACTIVIDAD_RETENCION_HORAS", "90")),
+    "dia": float(os.getenv("ACTIVIDAD_RETENCION_DIAS", "730")),
+}
+# Cada cuánto se borran los intervalos vencidos y máximo de puntos por consulta
+ACTIVIDAD_PURGA_INTERVALO = float(os.getenv("ACTIVIDAD_PURGA_INTERVALO", "600"))
+ACTIVIDAD_PUNTOS_MAX = int(os.getenv("ACTIVIDAD_PUNTOS_MAX", "2000"))
+
+# Unidades de consulta -> resolución guardada de la que salen (semana y mes se agregan de días)
+UNIDADES = {"minuto": "minuto", "hora": "hora", "dia": "dia", "semana": "dia", "mes": "dia"}
+# Ventana por defecto de una consulta sin `desde`
+VENTANA = {
+    "minuto": timedelta(hours=1),
+    "hora": timedelta(days=1),
+    "dia": timedelta(days=30),
+    "semana": timedelta(weeks=26),
+    "mes": timedelta(days=365),
+}
+
+
+def utc(instante):
+    """Datetime naive en UTC, como el resto de columnas DateTime del servicio."""
+    if instante.tzinfo is not None:
+        instante = instante.astimezone(timezone.utc).replace(tzinfo=None)
+    return instante
+
+
+def inicio_intervalo(instante, unidad):
+    """Comienzo del intervalo de `unidad` que contiene `instante` (semanas desde el lunes)."""
+    if unidad == "minuto":
+        return instante.replace(second=0, microsecond=0)
+    if unidad == "hora":
+        return instante.replace(minute=0, second=0, microsecond=0)
+    dia = instante.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unidad == "dia":
+        return dia
+    if unidad == "semana":
+        return dia - timedelta(days=dia.weekday())
+    return dia.replace(day=1)
+
+
+def siguiente_intervalo(inicio, unidad):
+    if unidad == "mes":
+        return (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if unidad == "semana":
+        return inicio + timedelta(weeks=1)
+    return inicio + timedelta(seconds=RESOLUCIONES[unidad])
+
+
+def cubetas(evento):
+    """
+    Contadores que suma un evento con `minutos`: (clave, segundos) por cada
+    resolución, con clave (estudiante, curso, resolución, inicio).
+    """
+    segundos = round(evento["minutos"] * 60)
+    instante = evento["instante"]
+    return [
+        ((evento["estudiante_id"], evento["curso_id"], resolucion, inicio_intervalo(instante, resolucion)), segundos)
+        for resolucion in RESOLUCIONES
+    ]
+
+
+def limite_retencion(resolucion, ahora=None):
+    return (ahora or datetime.utcnow()) - timedelta(days=RETENCION[resolucion])
+
+
+def serie(filas, unidad, desde, hasta):
+    """
+    Serie densa de `unidad` entre `desde` y `hasta` a partir de las filas
+    (inicio, segundos, eventos) de la resolución guardada: los intervalos sin
+    actividad salen con cero y semanas y meses suman sus días.
+    """
+    totales = {}
+    for inicio, segundos, eventos in filas:
+        t = totales.setdefault(inicio_intervalo(inicio, unidad), [0, 0])
+        t[0] += segundos
+        t[1] += eventos
+    puntos = []
+    inicio = inicio_intervalo(desde, unidad)
+    while inicio <= hasta:
+        segundos, eventos = totales.get(inicio, (0, 0))
+        puntos.append({"inicio": inicio, "horas": round(segundos / 3600, 2), "eventos": eventos})
+        inicio = siguiente_intervalo(inicio, unidad)
+    return puntos
+
+
+def numero_puntos(unidad, desde, hasta):
+    """Puntos que tendría la serie (aproximado para meses), para rechazar consultas enormes."""
+    segundos = (hasta - desde).total_seconds()
+    paso = {"semana": 7 * 86400, "mes": 28 * 86400}.get(unidad) or RESOLUCIONES[unidad]
+    return int(segundos // paso) + 1
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+
+import requests
+
+# Cada cuánto se revalida el catálogo en segundo plano y espera máxima por petición
+CATALOGO_REFRESH = float(os.getenv("CATALOGO_REFRESH", "30"))
+CATALOGO_TIMEOUT = float(os.getenv("CATALOGO_TIMEOUT", "3"))
+# Tope de la espera entre reintentos mientras cursos no responde
+CATALOGO_BACKOFF_MAX = float(os.getenv("CATALOGO_BACKOFF_MAX", "300"))
+
+
+class CatalogoCursos:
+    """
+    Copia local de los ids del catálogo de cursos, versionada con el ETag
+    de cursos.
+
+    `ids()` devuelve la copia en memoria sin tocar la red; un hilo la
+    revalida cada CATALOGO_REFRESH segundos con If-None-Match (un 304 no
+    trae cuerpo) sobre una sesión HTTP con keep-alive. Mientras tanto se
+    sigue sirviendo la copia anterior (stale-while-revalidate), y si cursos
+    no responde se conserva y se reintenta con espera creciente. Solo la
+    primera llamada espera a la red.
+    """
+
+    def __init__(self, url, refresh=CATALOGO_REFRESH, timeout=CATALOGO_TIMEOUT):
+        self.url = url
+        self.refresh = refresh
+        self.timeout = timeout
+        self.version = None
+        self.actualizado = None
+        self._ids = None
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._thread = None
+
+    def ids(self):
+        """Tupla de ids de cursos, o None si todavía no se pudo cargar el catálogo."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    # Primera llamada: se carga aquí y el hilo se encarga del resto
+                    self._revalidar()
+                    self._thread = threading.Thread(target=self._run, name="catalogo-cursos", daemon=True)
+                    self._thread.start()
+        return self._ids
+
+    def invalidar(self):
+        """Pide una revalidación inmediata (sin esperarla)."""
+        self._despertar.set()
+
+    def _revalidar(self):
+        """Una petición condicional; True si la copia queda al día."""
+        headers = {"If-None-Match": self.version} if self.version and self._ids is not None else {}
+        try:
+            r = self._session.get(self.url, headers=headers, timeout=self.timeout)
+            if r.status_code != 304:
+                r.raise_for_status()
+                # Se guarda solo lo que progreso usa: los ids, en una tupla inmutable
+                self._ids = tuple(c.get("id") for c in r.json().get("cursos", []) if c.get("id"))
+                self.version = r.headers.get("ETag")
+            self.actualizado = time.time()
+            return True
+        except Exception as e:
+            print(f"Error obteniendo cursos ({e}); se mantiene la copia anterior")
+            return False
+
+    def _run(self):
+        espera = self.refresh if self._ids is not None else 1
+        while True:
+            self._despertar.wait(espera)
+            self._despertar.clear()
+            if self._revalidar():
+                espera = self.refresh
+            else:
+                # Sin copia todavía no se espera más que el intervalo normal
+                tope = CATALOGO_BACKOFF_MAX if self._ids is not None else self.refresh
+                espera = min(max(espera, 1) * 2, tope)
@@ -0,0 +1,226 @@
+import os
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+# Cada cuánto se leen los estudiantes modificados, margen hacia atrás de esa lectura
+# (commits tardíos, relojes de otras réplicas) y cada cuánto se recarga todo (0: nunca)
+COHORTES_INTERVALO = float(os.getenv("COHORTES_INTERVALO", "2"))
+COHORTES_MARGEN = float(os.getenv("COHORTES_MARGEN", "5"))
+COHORTES_RECARGA = float(os.getenv("COHORTES_RECARGA", "3600"))
+# Filas por página de la carga completa y máximo de filas por respuesta
+COHORTES_LOTE = int(os.getenv("COHORTES_LOTE", "50000"))
+COHORTES_PAGINA_MAX = int(os.getenv("COHORTES_PAGINA_MAX", "1000"))
+
+# Orden de los resultados -> columna; con "-" delante, descendente
+ORDENES = ("actividad", "avance", "horas", "calificacion")
+
+# Fechas como días desde 1970-01-01; sin actividad cuenta como la fecha más antigua posible
+_EPOCA = date(1970, 1, 1).toordinal()
+_SIN_FECHA = np.iinfo(np.int32).min
+_INT32 = np.iinfo(np.int32)
+
+
+def _dia(fecha):
+    return _SIN_FECHA if fecha is None else fecha.toordinal() - _EPOCA
+
+
+def _entero(valor):
+    """Valor para una columna int32: fuera de rango se satura en lugar de desbordar."""
+    return 0 if valor is None else min(max(int(valor), _INT32.min), _INT32.max)
+
+
+class InstantaneaProgreso:
+    """
+    Copia en columnas NumPy de la tabla progreso para consultas de cohorte:
+    una posición por fila (estudiante, curso) en arrays de índice de
+    estudiante, índice de curso, avance, horas, día de la última actividad
+    y calificación (NaN sin calificar). Un filtro es una máscara booleana
+    sobre todas las filas, sin índices ni SQL.
+
+    Las filas se cambian en su sitio y al borrar se mueve la última al
+    hueco, así los arrays siguen densos; crecen duplicando su capacidad.
+    Los ids de estudiantes y cursos se internan una vez y no se liberan
+    hasta la siguiente carga completa.
+    """
+
+    _COLUMNAS = ("_estudiante", "_curso", "_pct", "_horas", "_ultima", "_calificacion")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.actualizada = None
+        self._vaciar(0)
+
+    def _vaciar(self, capacidad):
+        self._estudiantes, self._idx_estudiante = [], {}
+        self._cursos, self._idx_curso = [], {}
+        # índice de estudiante -> índice de curso -> posición
+        self._posiciones = {}
+        self._n = 0
+        self._estudiante = np.empty(capacidad, np.int32)
+        self._curso = np.empty(capacidad, np.int32)
+        self._pct = np.empty(capacidad, np.int32)
+        self._horas = np.empty(capacidad, np.int32)
+        self._ultima = np.empty(capacidad, np.int32)
+        self._calificacion = np.empty(capacidad, np.float32)
+
+    def __len__(self):
+        return self._n
+
+    def _crecer(self):
+        capacidad = max(1024, 2 * len(self._estudiante))
+        for nombre in self._COLUMNAS:
+            viejo = getattr(self, nombre)
+            nuevo = np.empty(capacidad, viejo.dtype)
+            nuevo[:self._n] = viejo[:self._n]
+            setattr(self, nombre, nuevo)
+
+    def _interno(self, ids, indices, valor):
+        i = indices.get(valor)
+        if i is None:
+            i = indices[valor] = len(ids)
+            ids.append(valor)
+        return i
+
+    def _poner(self, fila):
+        estudiante_id, curso_id, pct, horas, ultima, calificacion = fila
+        # Se convierte todo antes de reservar la posición: un valor que falle no deja una fila a medias
+        valores = (_entero(pct), _entero(horas), _dia(ultima), np.nan if calificacion is None else float(calificacion))
+        ie = self._interno(self._estudiantes, self._idx_estudiante, estudiante_id)
+        ic = self._interno(self._cursos, self._idx_curso, curso_id)
+        cursos = self._posiciones.setdefault(ie, {})
+        i = cursos.get(ic)
+        if i is None:
+            if self._n == len(self._estudiante):
+                self._crecer()
+            i = cursos[ic] = self._n
+            self._n += 1
+            self._estudiante[i], self._curso[i] = ie, ic
+        self._pct[i], self._horas[i], self._ultima[i], self._calificacion[i] = valores
+
+    def _quitar(self, ie, ic):
+        i = self._posiciones[ie].pop(ic)
+        ultima = self._n - 1
+        if i != ultima:
+            for nombre in self._COLUMNAS:
+                columna = getattr(self, nombre)
+                columna[i] = columna[ultima]
+            self._posiciones[int(self._estudiante[i])][int(self._curso[i])] = i
+        self._n = ultima
+
+    def cargar(self, paginas):
+        """
+        Sustituye la instantánea por las filas de `paginas` (iterable de listas
+        de tuplas (estudiante, curso, avance, horas, última actividad,
+        calificación)). Se construye aparte: las consultas siguen viendo la
+        anterior hasta el cambio.
+        """
+        nueva = InstantaneaProgreso()
+        for pagina in paginas:
+            for fila in pagina:
+                nueva._poner(fila)
+        with self._lock:
+            self.__dict__.update({k: v for k, v in nueva.__dict__.items() if k != "_lock"})
+            self.actualizada = datetime.utcnow()
+
+    def reemplazar_estudiantes(self, filas, estudiantes):
+        """Deja a cada estudiante de `estudiantes` exactamente con sus filas en `filas`."""
+        nuevas = {}
+        for fila in filas:
+            nuevas.setdefault(fila[0], []).append(fila)
+        with self._lock:
+            for estudiante_id in estudiantes:
+                ie = self._idx_estudiante.get(estudiante_id)
+                cursos = nuevas.get(estudiante_id, [])
+                if ie is not None:
+                    quedan = {self._idx_curso.get(f[1]) for f in cursos}
+                    for ic in [ic for ic in self._posiciones.get(ie, {}) if ic not in quedan]:
+                        self._quitar(ie, ic)
+                for fila in cursos:
+                    self._poner(fila)
+            self.actualizada = datetime.utcnow()
+
+    def consultar(
+        self,
+        curso_id=None,
+        completado_min=None,
+        completado_max=None,
+        horas_min=None,
+        horas_max=None,
+        inactivo_dias=None,
+        activo_dias=None,
+        calificacion_min=None,
+        calificacion_max=None,
+        orden="actividad",
+        inicio=0,
+        limite=100,
+        hoy=None,
+    ):
+        """
+        Filas que cumplen todos los filtros dados. `inactivo_dias`: sin
+        actividad en los últimos N días (incluye las que nunca tuvieron);
+        `activo_dias`: con actividad en los últimos N días. Con filtros de
+        calificación quedan fuera las filas sin calificar. Devuelve (total de
+        filas, estudiantes distintos, página de filas en el `orden` pedido).
+        """
+        hoy = _dia(hoy or date.today())
+        with self._lock:
+            n = self._n
+            if curso_id is not None:
+                ic = self._idx_curso.get(curso_id)
+                if ic is None:
+                    return 0, 0, []
+                mascara = self._curso[:n] == ic
+            else:
+                mascara = np.ones(n, bool)
+            pct, horas, ultima, calificacion = self._pct[:n], self._horas[:n], self._ultima[:n], self._calificacion[:n]
+            for columna, minimo, maximo in (
+                (pct, completado_min, completado_max),
+                (horas, horas_min, horas_max),
+                (calificacion, calificacion_min, calificacion_max),
+            ):
+                if minimo is not None:
+                    mascara &= columna >= minimo
+                if maximo is not None:
+                    mascara &= columna <= maximo
+            if inactivo_dias is not None:
+                mascara &= ultima <= hoy - inactivo_dias
+            if activo_dias is not None:
+                mascara &= ultima > hoy - activo_dias
+
+            filas = np.flatnonzero(mascara)
+            total = len(filas)
+            estudiantes = int(np.count_nonzero(np.bincount(self._estudiante[filas], minlength=1))) if total else 0
+
+            descendente = orden.startswith("-")
+            columna = {"actividad": ultima, "avance": pct, "horas": horas, "calificacion": calificacion}[orden.lstrip("-")]
+            clave = columna[filas].astype(np.float64)
+            if columna is ultima:
+                clave[clave == _SIN_FECHA] = -np.inf
+            if descendente:
+                clave = -clave
+            # Sin calificación siempre al final
+            clave[np.isnan(clave)] = np.inf
+            fin = inicio + limite
+            if fin < total:
+                # Solo se ordenan las candidatas a la página (con todos los empates del corte)
+                corte = np.partition(clave, fin - 1)[fin - 1]
+                candidatas = clave <= corte
+                filas, clave = filas[candidatas], clave[candidatas]
+            pagina = filas[np.lexsort((self._curso[filas], self._estudiante[filas], clave))[inicio:fin]]
+            return total, estudiantes, [self._fila(int(i), hoy) for i in pagina]
+
+    def _fila(self, i, hoy):
+        ultima = int(self._ultima[i])
+        calificacion = float(self._calificacion[i])
+        return {
+            "estudiante_id": self._estudiantes[self._estudiante[i]],
+            "curso_id": self._cursos[self._curso[i]],
+            "completado_pct": int(self._pct[i]),
+            "tiempo_invertido_horas": int(self._horas[i]),
+            "fecha_ultima_actividad": None if ultima == _SIN_FECHA else date.fromordinal(ultima + _EPOCA),
+            "dias_inactivo": None if ultima == _SIN_FECHA else hoy - ultima,
+            "calificacion": None if np.isnan(calificacion) else round(calificacion, 2),
+        }
+
@@ -0,0 +1,556 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, delete, func, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Actividad, HistogramaCurso, Progreso, ResumenCurso, ResumenEstudiante, SolicitudIdempotente
+
+# Columnas que se reemplazan cuando el par (estudiante, curso) ya existe
+_CAMPOS = (
+    "completado_pct", "tiempo_invertido_horas", "ultima_leccion",
+    "fecha_inicio", "fecha_ultima_actividad", "calificacion",
+)
+# Contadores de ResumenEstudiante y de ResumenCurso, en el orden de aporte y aporte_curso
+CAMPOS_ESTUDIANTE = ("num_cursos", "suma_pct", "pendientes", "calificados", "suma_calificacion")
+CAMPOS_CURSO = (
+    "inscritos", "suma_pct", "completados", "pendientes",
+    "calificados", "suma_calificacion", "suma_calificacion2",
+)
+TRAMOS = 10
+
+
+def _insert(db):
+    # INSERT ... ON CONFLICT nativo; SQLite lo admite con la misma sintaxis (pruebas locales)
+    return sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+
+
+def progreso_a_dict(p):
+    data = {"curso_id": p.curso_id}
+    for campo in _CAMPOS:
+        data[campo] = getattr(p, campo)
+    return data
+
+
+def pagina_progresos(db, despues_de=None, limite=5000):
+    """
+    Una página de toda la tabla en orden de clave primaria, a partir de la
+    clave (estudiante, curso) `despues_de`: para exportar sin OFFSET ni una
+    transacción abierta durante toda la exportación.
+    """
+    stmt = select(Progreso).order_by(Progreso.estudiante_id, Progreso.curso_id).limit(limite)
+    if despues_de is not None:
+        stmt = stmt.where(tuple_(Progreso.estudiante_id, Progreso.curso_id) > tuple_(*despues_de))
+    return [dict(progreso_a_dict(p), estudiante_id=p.estudiante_id) for p in db.execute(stmt).scalars()]
+
+
+# Columnas de la instantánea de cohortes (cohortes.InstantaneaProgreso)
+_COLUMNAS_COHORTE = (
+    Progreso.estudiante_id, Progreso.curso_id, Progreso.completado_pct,
+    Progreso.tiempo_invertido_horas, Progreso.fecha_ultima_actividad, Progreso.calificacion,
+)
+
+
+def pagina_cohorte(db, despues_de=None, limite=50000):
+    """Como pagina_progresos, pero con solo las columnas de la instantánea y como tuplas."""
+    stmt = select(*_COLUMNAS_COHORTE).order_by(Progreso.estudiante_id, Progreso.curso_id).limit(limite)
+    if despues_de is not None:
+        stmt = stmt.where(tuple_(Progreso.estudiante_id, Progreso.curso_id) > tuple_(*despues_de))
+    return [tuple(f) for f in db.execute(stmt)]
+
+
+def cohorte_de(db, estudiantes, lote=1000):
+    """Filas de la instantánea de los estudiantes dados (todas las de cada uno)."""
+    estudiantes = list(estudiantes)
+    filas = []
+    for i in range(0, len(estudiantes), lote):
+        filas.extend(
+            tuple(f) for f in db.execute(
+                select(*_COLUMNAS_COHORTE).where(Progreso.estudiante_id.in_(estudiantes[i:i + lote]))
+            )
+        )
+    return filas
+
+
+def estudiantes_modificados(db, desde):
+    """
+    Estudiantes con alguna fila de progreso o su resumen modificados desde
+    `desde`, y la marca más reciente vista (None si no hay). El resumen
+    cubre las filas borradas, que ya no están para dejar su marca.
+    """
+    estudiantes, marca = set(), None
+    for modelo in (Progreso, ResumenEstudiante):
+        for estudiante_id, actualizado_en in db.execute(
+            select(modelo.estudiante_id, modelo.actualizado_en).where(modelo.actualizado_en >= desde)
+        ):
+            estudiantes.add(estudiante_id)
+            marca = actualizado_en if marca is None else max(marca, actualizado_en)
+    return estudiantes, marca
+
+
+def get_cursos(db, estudiante_id):
+    """Progreso del estudiante en cada curso (lectura por la clave primaria)."""
+    filas = db.execute(
+        select(Progreso).where(Progreso.estudiante_id == estudiante_id).order_by(Progreso.curso_id)
+    ).scalars()
+    return [progreso_a_dict(p) for p in filas]
+
+
+def aporte(completado_pct, calificacion):
+    """
+    Lo que suma un curso al resumen del estudiante: (cursos, suma de avance,
+    evaluaciones pendientes, cursos calificados, suma de calificaciones).
+    """
+    return (
+        1, completado_pct, int(completado_pct > 50 and calificacion is None),
+        int(calificacion is not None), calificacion or 0.0,
+    )
+
+
+def aporte_curso(completado_pct, calificacion):
+    """Lo que suma una fila de progreso a los contadores de su curso (CAMPOS_CURSO)."""
+    c = calificacion or 0.0
+    return (
+        1, completado_pct, int(completado_pct >= 100), aporte(completado_pct, calificacion)[2],
+        int(calificacion is not None), c, c * c,
+    )
+
+
+def tramo(completado_pct):
+    return max(0, min(completado_pct // 10, TRAMOS - 1))
+
+
+def promedio_avance(num_cursos, suma_pct):
+    return suma_pct / num_cursos if num_cursos else None
+
+
+def promedio_calificacion(calificados, suma_calificacion):
+    return suma_calificacion / calificados if calificados else None
+
+
+def resumen_a_dict(estudiante_id, num_cursos=0, suma_pct=0, pendientes=0, calificados=0, suma_calificacion=0.0):
+    calificacion = promedio_calificacion(calificados, suma_calificacion)
+    return {
+        "estudiante_id": estudiante_id,
+        "num_cursos": num_cursos,
+        "promedio_progreso": round(suma_pct / num_cursos) if num_cursos else 0,
+        "evaluaciones_pendientes": pendientes,
+        "promedio_calificacion": round(calificacion, 2) if calificacion is not None else None,
+    }
+
+
+def get_resumen(db, estudiante_id):
+    """Una lectura por clave primaria, sin importar cuántos cursos tenga el estudiante."""
+    r = db.get(ResumenEstudiante, estudiante_id)
+    return resumen_a_dict(estudiante_id, *(getattr(r, campo) for campo in CAMPOS_ESTUDIANTE)) if r else resumen_a_dict(estudiante_id)
+
+
+def estadisticas_a_dict(curso_id, contadores=None, histograma=None):
+    r = dict(zip(CAMPOS_CURSO, contadores or (0,) * len(CAMPOS_CURSO)))
+    n, k = r["inscritos"], r["calificados"]
+    media = r["suma_calificacion"] / k if k else None
+    # Varianza poblacional; el max evita un negativo diminuto por redondeo
+    varianza = max(r["suma_calificacion2"] / k - media * media, 0.0) if k else None
+    histograma = histograma or [0] * TRAMOS
+    return {
+        "curso_id": curso_id,
+        "inscritos": n,
+        "promedio_progreso": round(r["suma_pct"] / n) if n else 0,
+        "completados": r["completados"],
+        "evaluaciones_pendientes": r["pendientes"],
+        "histograma": [
+            {"desde": i * 10, "hasta": 100 if i == TRAMOS - 1 else i * 10 + 9, "estudiantes": e}
+            for i, e in enumerate(histograma)
+        ],
+        "calificaciones": {
+            "cantidad": k,
+            "promedio": round(media, 2) if k else None,
+            "varianza": round(varianza, 4) if k else None,
+        },
+    }
+
+
+def get_estadisticas_curso(db, curso_id):
+    return get_estadisticas_cursos(db, [curso_id])[0]
+
+
+def get_estadisticas_cursos(db, curso_ids):
+    """Dos lecturas, sin importar cuántos cursos se pidan ni cuántos estudiantes tengan."""
+    contadores = {
+        r.curso_id: tuple(getattr(r, campo) for campo in CAMPOS_CURSO)
+        for r in db.scalars(select(ResumenCurso).where(ResumenCurso.curso_id.in_(curso_ids)))
+    }
+    histogramas = {c: [0] * TRAMOS for c in curso_ids}
+    for c, t, e in db.execute(
+        select(HistogramaCurso.curso_id, HistogramaCurso.tramo, HistogramaCurso.estudiantes)
+        .where(HistogramaCurso.curso_id.in_(curso_ids))
+    ):
+        histogramas[c][t] = e
+    return [estadisticas_a_dict(c, contadores.get(c), histogramas[c]) for c in curso_ids]
+
+
+def _bloquear_resumenes(db, estudiantes):
+    """
+    Crea las filas de resumen que falten y las bloquea (en orden, sin
+    interbloqueos) hasta el commit: los cambios de un mismo estudiante desde
+    varias réplicas se serializan y los deltas no se pisan. Devuelve el
+    estado anterior de sus cursos: (estudiante, curso) -> (avance, calificación).
+    """
+    estudiantes = sorted(set(estudiantes))
+    db.execute(_insert(db)(ResumenEstudiante).on_conflict_do_nothing(), [{"estudiante_id": e} for e in estudiantes])
+    db.execute(
+        select(ResumenEstudiante.estudiante_id)
+        .where(ResumenEstudiante.estudiante_id.in_(estudiantes))
+        .order_by(ResumenEstudiante.estudiante_id)
+        .with_for_update()
+    )
+    filas = db.execute(
+        select(Progreso.estudiante_id, Progreso.curso_id, Progreso.completado_pct, Progreso.calificacion)
+        .where(Progreso.estudiante_id.in_(estudiantes))
+    )
+    return {(e, c): (pct, calificacion) for e, c, pct, calificacion in filas}
+
+
+def _sumar(acumulado, clave, valores, signo):
+    totales = acumulado.setdefault(clave, [0] * len(valores))
+    for i, valor in enumerate(valores):
+        totales[i] += signo * valor
+
+
+def _aplicar_deltas(db, antes, despues):
+    """
+    Suma a los resúmenes de cada estudiante y de cada curso la diferencia
+    entre el aporte nuevo y el anterior de cada fila tocada. `despues[clave]`
+    es None si se borró. Los cursos no se bloquean por adelantado (los
+    comparten muchos estudiantes): se incrementan en orden de curso y cada
+    fila queda bloqueada solo desde su UPDATE hasta el commit.
+    """
+    estudiantes, cursos, tramos = {}, {}, {}
+    for (estudiante_id, curso_id), nuevo in despues.items():
+        for fila, signo in ((antes.get((estudiante_id, curso_id)), -1), (nuevo, 1)):
+            if fila is None:
+                continue
+            _sumar(estudiantes, estudiante_id, aporte(*fila), signo)
+            _sumar(cursos, curso_id, aporte_curso(*fila), signo)
+            _sumar(tramos, (curso_id, tramo(fila[0])), (1,), signo)
+
+    cambios = [
+        {"e": e, **{"d_" + campo: d for campo, d in zip(CAMPOS_ESTUDIANTE, deltas)}}
+        for e, deltas in sorted(estudiantes.items()) if any(deltas)
+    ]
+    if cambios:
+        t = ResumenEstudiante.__table__
+        db.execute(
+            update(t)
+            .where(t.c.estudiante_id == bindparam("e"))
+            .values({campo: t.c[campo] + bindparam("d_" + campo) for campo in CAMPOS_ESTUDIANTE}),
+            cambios,
+        )
+
+    cambios = [
+        {"c": c, **{"d_" + campo: d for campo, d in zip(CAMPOS_CURSO, deltas)}}
+        for c, deltas in sorted(cursos.items()) if any(deltas)
+    ]
+    if cambios:
+        db.execute(_insert(db)(ResumenCurso).on_conflict_do_nothing(), [{"curso_id": c["c"]} for c in cambios])
+        t = ResumenCurso.__table__
+        db.execute(
+            update(t)
+            .where(t.c.curso_id == bindparam("c"))
+            .values({campo: t.c[campo] + bindparam("d_" + campo) for campo in CAMPOS_CURSO}),
+            cambios,
+        )
+    cambios = [
+        {"curso_id": c, "tramo": n, "estudiantes": d}
+        for (c, n), (d,) in sorted(tramos.items()) if d
+    ]
+    if cambios:
+        stmt = _insert(db)(HistogramaCurso)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[HistogramaCurso.curso_id, HistogramaCurso.tramo],
+            set_={"estudiantes": HistogramaCurso.estudiantes + stmt.excluded.estudiantes},
+        )
+        db.execute(stmt, cambios)
+
+
+def _resumenes(db, estudiantes=None):
+    """estudiante -> contadores de CAMPOS_ESTUDIANTE (de todos si `estudiantes` es None)."""
+    stmt = select(ResumenEstudiante.estudiante_id, *(ResumenEstudiante.__table__.c[c] for c in CAMPOS_ESTUDIANTE))
+    if estudiantes is not None:
+        stmt = stmt.where(ResumenEstudiante.estudiante_id.in_(estudiantes))
+    return {e: tuple(contadores) for e, *contadores in db.execute(stmt)}
+
+
+def _notificar(db, al_cambiar, despues):
+    """
+    Llama a `al_cambiar(filas, resumenes)` con las filas tocadas y los
+    resúmenes nuevos de sus estudiantes antes del commit, con los resúmenes
+    todavía bloqueados: los avisos de un mismo estudiante salen en el orden
+    de sus transacciones aunque escriban varias réplicas.
+    """
+    if al_cambiar is not None and despues:
+        al_cambiar(despues, _resumenes(db, {e for e, _ in despues}))
+
+
+def filas_ranking(db):
+    """Todas las filas y resúmenes con la forma que recibe `al_cambiar`, para reconstruir rankings."""
+    filas = {
+        (e, c): (pct, calificacion)
+        for e, c, pct, calificacion in db.execute(
+            select(Progreso.estudiante_id, Progreso.curso_id, Progreso.completado_pct, Progreso.calificacion)
+        )
+    }
+    return filas, _resumenes(db)
+
+
+def _pendiente():
+    return case((Progreso.completado_pct > 50, case((Progreso.calificacion.is_(None), 1), else_=0)), else_=0)
+
+
+def _bloquear_tabla(db, modelo):
+    # Las escrituras concurrentes esperan al final de la reconstrucción y aplican
+    # su delta sobre ella; SQLite ya serializa las escrituras
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"LOCK TABLE {modelo.__tablename__} IN EXCLUSIVE MODE"))
+
+
+def reconstruir_resumenes(db):
+    """Recalcula todos los resúmenes de estudiantes desde la tabla progreso."""
+    _bloquear_tabla(db, ResumenEstudiante)
+    db.execute(delete(ResumenEstudiante))
+    db.execute(
+        ResumenEstudiante.__table__.insert().from_select(
+            ["estudiante_id", *CAMPOS_ESTUDIANTE],
+            select(
+                Progreso.estudiante_id, func.count(), func.sum(Progreso.completado_pct), func.sum(_pendiente()),
+                func.count(Progreso.calificacion), func.coalesce(func.sum(Progreso.calificacion), 0.0),
+            ).group_by(Progreso.estudiante_id),
+        )
+    )
+    db.commit()
+
+
+def reconstruir_cursos(db):
+    """Recalcula los resúmenes e histogramas de todos los cursos desde la tabla progreso."""
+    _bloquear_tabla(db, ResumenCurso)
+    _bloquear_tabla(db, HistogramaCurso)
+    db.execute(delete(ResumenCurso))
+    db.execute(delete(HistogramaCurso))
+    pct, calificacion = Progreso.completado_pct, Progreso.calificacion
+    db.execute(
+        ResumenCurso.__table__.insert().from_select(
+            list(CAMPOS_CURSO) + ["curso_id"],
+            select(
+                func.count(), func.sum(pct), func.sum(case((pct >= 100, 1), else_=0)), func.sum(_pendiente()),
+                func.count(calificacion), func.coalesce(func.sum(calificacion), 0.0),
+                func.coalesce(func.sum(calificacion * calificacion), 0.0), Progreso.curso_id,
+            ).group_by(Progreso.curso_id),
+        )
+    )
+    tramo_sql = case((pct >= (TRAMOS - 1) * 10, TRAMOS - 1), (pct < 10, 0), else_=pct // 10)
+    db.execute(
+        HistogramaCurso.__table__.insert().from_select(
+            ["curso_id", "tramo", "estudiantes"],
+            select(Progreso.curso_id, tramo_sql, func.count()).group_by(Progreso.curso_id, tramo_sql),
+        )
+    )
+    db.commit()
+
+
+def resumen_vacio(db, modelo):
+    """True si la tabla de resumen no tiene filas pero progreso sí (recién creada)."""
+    return (
+        db.execute(select(modelo).limit(1)).first() is None
+        and db.execute(select(Progreso.estudiante_id).limit(1)).first() is not None
+    )
+
+
+def upsert_progresos(db, filas, al_cambiar=None, confirmar=True):
+    """
+    Crea o actualiza varias filas en una sola sentencia INSERT ... ON CONFLICT
+    (estudiante_id, curso_id) DO UPDATE. Devuelve los pares que ya existían.
+    """
+    if not filas:
+        return set()
+    antes = _bloquear_resumenes(db, (f["estudiante_id"] for f in filas))
+    stmt = _insert(db)(Progreso).values(filas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Progreso.estudiante_id, Progreso.curso_id],
+        set_={campo: stmt.excluded[campo] for campo in _CAMPOS + ("actualizado_en",)},
+    )
+    db.execute(stmt)
+    despues = {(f["estudiante_id"], f["curso_id"]): (f["completado_pct"], f.get("calificacion")) for f in filas}
+    _aplicar_deltas(db, antes, despues)
+    _notificar(db, al_cambiar, despues)
+    if confirmar:
+        db.commit()
+    return set(despues) & set(antes)
+
+
+def reemplazar_cursos(db, estudiante_id, filas, al_cambiar=None, confirmar=True):
+    """Sustituye todos los cursos del estudiante en una transacción."""
+    antes = _bloquear_resumenes(db, [estudiante_id])
+    _reemplazar(db, estudiante_id, filas, antes, al_cambiar)
+    if confirmar:
+        db.commit()
+
+
+def inscribir(db, estudiante_id, nuevas_filas, al_cambiar=None, confirmar=True):
+    """
+    Inscribe al estudiante en las filas que devuelve `nuevas_filas()` solo si
+    no tiene ningún curso; si ya tiene, no se llama. Con su resumen
+    bloqueado, dos primeras visitas simultáneas no se pisan: la segunda
+    encuentra los cursos de la primera. Devuelve (cursos, creado).
+    """
+    antes = _bloquear_resumenes(db, [estudiante_id])
+    if antes:
+        cursos = get_cursos(db, estudiante_id)
+        creado = False
+    else:
+        filas = nuevas_filas()
+        _reemplazar(db, estudiante_id, filas, antes, al_cambiar)
+        # Mismo orden que get_cursos
+        cursos = sorted(({k: f.get(k) for k in ("curso_id",) + _CAMPOS} for f in filas), key=lambda c: c["curso_id"])
+        creado = True
+    if confirmar:
+        db.commit()
+    return cursos, creado
+
+
+def _reemplazar(db, estudiante_id, filas, antes, al_cambiar):
+    db.execute(delete(Progreso).where(Progreso.estudiante_id == estudiante_id))
+    if filas:
+        db.execute(_insert(db)(Progreso).values(filas))
+    despues = dict.fromkeys(antes)
+    despues.update({(estudiante_id, f["curso_id"]): (f["completado_pct"], f.get("calificacion")) for f in filas})
+    _aplicar_deltas(db, antes, despues)
+    _notificar(db, al_cambiar, despues)
+
+
+def aplicar_eventos(db, filas, al_cambiar=None):
+    """
+    Upsert de las filas combinadas por eventos.IngestaEventos, con las mismas
+    reglas que eventos.combinar: avance, horas y última actividad nunca
+    retroceden, lección y calificación solo cambian si el evento las trae y
+    la fecha de inicio es la de la primera fila. Se envía como executemany,
+    que el driver agrupa en INSERT de varias filas.
+    """
+    if not filas:
+        return
+    sqlite_ = db.get_bind().dialect.name == "sqlite"
+    mayor = func.max if sqlite_ else func.greatest
+    t = Progreso.__table__.c
+    stmt = _insert(db)(Progreso)
+    x = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Progreso.estudiante_id, Progreso.curso_id],
+        set_={
+            "completado_pct": mayor(t.completado_pct, x.completado_pct),
+            "tiempo_invertido_horas": mayor(t.tiempo_invertido_horas, x.tiempo_invertido_horas),
+            "ultima_leccion": func.coalesce(x.ultima_leccion, t.ultima_leccion),
+            "calificacion": func.coalesce(x.calificacion, t.calificacion),
+            "fecha_inicio": func.coalesce(t.fecha_inicio, x.fecha_inicio),
+            # Con NULL en un lado, greatest de PostgreSQL y max de SQLite difieren: se evita
+            "fecha_ultima_actividad": mayor(
+                func.coalesce(t.fecha_ultima_actividad, x.fecha_ultima_actividad),
+                func.coalesce(x.fecha_ultima_actividad, t.fecha_ultima_actividad),
+            ),
+            "actualizado_en": x.actualizado_en,
+        },
+    )
+    antes = _bloquear_resumenes(db, (f["estudiante_id"] for f in filas))
+    # Los valores finales los decide la base de datos (greatest/coalesce): se leen con RETURNING
+    nuevas = db.execute(
+        stmt.returning(Progreso.estudiante_id, Progreso.curso_id, Progreso.completado_pct, Progreso.calificacion),
+        [
+            dict(f, completado_pct=f["completado_pct"] or 0, tiempo_invertido_horas=f["tiempo_invertido_horas"] or 0)
+            for f in filas
+        ],
+    )
+    despues = {(e, c): (pct, calificacion) for e, c, pct, calificacion in nuevas}
+    _aplicar_deltas(db, antes, despues)
+    _notificar(db, al_cambiar, despues)
+    db.commit()
+
+
+def reservar_solicitud(db, clave, ruta):
+    """
+    Reserva una Idempotency-Key en la transacción en curso. Devuelve None si
+    es nueva (la escritura y completar_solicitud siguen en esta transacción)
+    o (ruta, codigo, respuesta) de la petición que la usó antes: si está en
+    curso, el INSERT espera a su commit.
+    """
+    nueva = db.execute(
+        _insert(db)(SolicitudIdempotente)
+        .values(clave=clave, ruta=ruta, creado_en=datetime.utcnow())
+        .on_conflict_do_nothing()
+        .returning(SolicitudIdempotente.clave)
+    ).first()
+    if nueva is not None:
+        return None
+    db.rollback()
+    fila = db.execute(
+        select(SolicitudIdempotente.ruta, SolicitudIdempotente.codigo, SolicitudIdempotente.respuesta)
+        .where(SolicitudIdempotente.clave == clave)
+    ).first()
+    return tuple(fila)
+
+
+def completar_solicitud(db, clave, codigo, respuesta):
+    db.execute(
+        update(SolicitudIdempotente)
+        .where(SolicitudIdempotente.clave == clave)
+        .values(codigo=codigo, respuesta=respuesta)
+    )
+
+
+def purgar_solicitudes(db, antes_de):
+    db.execute(delete(SolicitudIdempotente).where(SolicitudIdempotente.creado_en < antes_de))
+    db.commit()
+
+
+def sumar_actividad(db, actividad, confirmar=True):
+    """
+    Suma los contadores de IngestaEventos (clave (estudiante, curso,
+    resolución, inicio) -> [segundos, eventos]) con un upsert por lotes; en
+    orden de clave para que dos réplicas no se bloqueen en cruz.
+    """
+    if actividad:
+        stmt = _insert(db)(Actividad)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Actividad.estudiante_id, Actividad.resolucion, Actividad.inicio, Actividad.curso_id],
+            set_={
+                "segundos": Actividad.segundos + stmt.excluded.segundos,
+                "eventos": Actividad.eventos + stmt.excluded.eventos,
+            },
+        )
+        db.execute(stmt, [
+            {"estudiante_id": e, "curso_id": c, "resolucion": r, "inicio": i, "segundos": s, "eventos": n}
+            for (e, c, r, i), (s, n) in sorted(actividad.items())
+        ])
+    if confirmar:
+        db.commit()
+
+
+def get_actividad(db, estudiante_id, resolucion, desde, hasta, curso_id=None):
+    """Filas (inicio, segundos, eventos) de una resolución en [desde, hasta], sumando los cursos si no se filtra."""
+    stmt = (
+        select(Actividad.inicio, func.sum(Actividad.segundos), func.sum(Actividad.eventos))
+        .where(
+            Actividad.estudiante_id == estudiante_id,
+            Actividad.resolucion == resolucion,
+            Actividad.inicio.between(desde, hasta),
+        )
+        .group_by(Actividad.inicio)
+        .order_by(Actividad.inicio)
+    )
+    if curso_id is not None:
+        stmt = stmt.where(Actividad.curso_id == curso_id)
+    return [tuple(f) for f in db.execute(stmt)]
+
+
+def purgar_actividad(db, resolucion, antes_de):
+    borradas = db.execute(
+        delete(Actividad).where(Actividad.resolucion == resolucion, Actividad.inicio < antes_de)
+    ).rowcount
+    db.commit()
+    return borradas
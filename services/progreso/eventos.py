@@ -0,0 +1,297 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+
+from actividad import cubetas
+
+# Filas distintas (estudiante, curso) que disparan una escritura y espera máxima entre escrituras
+EVENTOS_LOTE = int(os.getenv("EVENTOS_LOTE", "5000"))
+EVENTOS_INTERVALO = float(os.getenv("EVENTOS_INTERVALO", "1.0"))
+# Registro local de solo anexado (vacío: sin registro) y si se hace fsync antes de responder
+EVENTOS_WAL = os.getenv("EVENTOS_WAL", "")
+EVENTOS_FSYNC = os.getenv("EVENTOS_FSYNC", "0") == "1"
+# Filas rechazadas por la base de datos que se guardan para inspección (las demás solo se registran)
+EVENTOS_APARTADAS_MAX = 1000
+
+CAMPOS = (
+    "completado_pct", "tiempo_invertido_horas", "ultima_leccion",
+    "fecha_inicio", "fecha_ultima_actividad", "calificacion",
+)
+
+
+def _mayor(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _menor(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def combinar(fila, evento):
+    """
+    Aplica un evento a la fila acumulada de su (estudiante, curso). El avance,
+    las horas y la última actividad solo crecen; la lección y la calificación
+    son las del último evento que las trae; el inicio es la fecha más antigua.
+    Aplicar dos veces el mismo evento no cambia el resultado, así que se puede
+    reproducir el registro tras una caída.
+    """
+    fecha = evento.get("fecha")
+    fila["completado_pct"] = _mayor(fila["completado_pct"], evento.get("completado_pct"))
+    fila["tiempo_invertido_horas"] = _mayor(fila["tiempo_invertido_horas"], evento.get("tiempo_invertido_horas"))
+    if evento.get("ultima_leccion") is not None:
+        fila["ultima_leccion"] = evento["ultima_leccion"]
+    if evento.get("calificacion") is not None:
+        fila["calificacion"] = evento["calificacion"]
+    fila["fecha_inicio"] = _menor(fila["fecha_inicio"], fecha)
+    fila["fecha_ultima_actividad"] = _mayor(fila["fecha_ultima_actividad"], fecha)
+    return fila
+
+
+def fila_vacia(estudiante_id, curso_id):
+    return dict.fromkeys(CAMPOS, None) | {"estudiante_id": estudiante_id, "curso_id": curso_id}
+
+
+def fusionar(actual, fila):
+    """
+    Lleva una fila combinada a la guardada con las mismas reglas que el upsert
+    SQL de crud.aplicar_eventos (para el modo sin base de datos).
+    """
+    if actual is None:
+        actual = {"curso_id": fila["curso_id"], "completado_pct": 0, "tiempo_invertido_horas": 0,
+                  "ultima_leccion": None, "fecha_inicio": None, "fecha_ultima_actividad": None, "calificacion": None}
+    actual["completado_pct"] = _mayor(actual["completado_pct"], fila["completado_pct"])
+    actual["tiempo_invertido_horas"] = _mayor(actual["tiempo_invertido_horas"], fila["tiempo_invertido_horas"])
+    for campo in ("ultima_leccion", "calificacion"):
+        if fila[campo] is not None:
+            actual[campo] = fila[campo]
+    if actual["fecha_inicio"] is None:
+        actual["fecha_inicio"] = fila["fecha_inicio"]
+    actual["fecha_ultima_actividad"] = _mayor(actual["fecha_ultima_actividad"], fila["fecha_ultima_actividad"])
+    return actual
+
+
+class RegistroEventos:
+    """
+    Registro de solo anexado en segmentos numerados. Cada lote que se escribe
+    en la base de datos corresponde a los segmentos cerrados antes de tomarlo,
+    que se borran cuando la escritura se confirma; al arrancar se reproducen
+    los que queden.
+    """
+
+    def __init__(self, ruta, fsync=EVENTOS_FSYNC):
+        self.ruta = ruta
+        self.fsync = fsync
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self._segmento = max((self._numero(p) for p in self._segmentos()), default=0) + 1
+        self._archivo = open(self._nombre(self._segmento), "ab")
+
+    def _nombre(self, n):
+        return f"{self.ruta}.{n:08d}"
+
+    @staticmethod
+    def _numero(ruta):
+        return int(ruta.rsplit(".", 1)[1])
+
+    def _segmentos(self):
+        return sorted(glob.glob(glob.escape(self.ruta) + ".[0-9]*"), key=self._numero)
+
+    def anexar(self, datos):
+        """Una línea por petición (un array JSON de eventos); con fsync, durable al volver."""
+        self._archivo.write(datos + b"\n")
+        self._archivo.flush()
+        if self.fsync:
+            os.fsync(self._archivo.fileno())
+
+    def rotar(self):
+        """Cierra el segmento actual y devuelve los cerrados pendientes de confirmar."""
+        self._archivo.close()
+        cerrados = [p for p in self._segmentos() if self._numero(p) <= self._segmento]
+        self._segmento += 1
+        self._archivo = open(self._nombre(self._segmento), "ab")
+        return cerrados
+
+    def pendientes(self):
+        """Eventos de los segmentos anteriores a este proceso, para reproducirlos."""
+        for ruta in self._segmentos():
+            if self._numero(ruta) >= self._segmento:
+                continue
+            with open(ruta, "rb") as f:
+                for linea in f:
+                    try:
+                        yield from json.loads(linea)
+                    except ValueError:
+                        # Línea a medio escribir en una caída: se descarta
+                        continue
+
+    @staticmethod
+    def confirmar(segmentos):
+        for ruta in segmentos:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+
+class IngestaEventos:
+    """
+    Buffer de eventos de progreso con escritura diferida. `agregar` solo
+    combina cada evento con la fila pendiente de su (estudiante, curso) en un
+    dict; un hilo toma el dict entero cuando hay EVENTOS_LOTE filas o pasa
+    EVENTOS_INTERVALO y llama a `escribir(filas)` con una fila por par, de
+    modo que mil latidos del mismo estudiante son una sola fila del upsert.
+    Los eventos con `minutos` suman además a sus contadores de actividad por
+    minuto, hora y día, que viajan en la misma escritura como
+    `escribir(filas, actividad)`. Si la escritura falla con uno de los
+    errores `transitorios` (base de datos caída) se reintenta con espera
+    creciente; mientras, los eventos nuevos se acumulan en el siguiente
+    buffer. Con cualquier otro error el lote se parte en mitades hasta
+    aislar las filas que fallan solas, que se apartan en `apartadas` para
+    que no bloqueen al resto.
+    """
+
+    def __init__(self, escribir, lote=EVENTOS_LOTE, intervalo=EVENTOS_INTERVALO, registro=None, transitorios=()):
+        self._escribir = escribir
+        self._transitorios = tuple(transitorios)
+        self._lote = lote
+        self._intervalo = intervalo
+        self._registro = registro
+        self._pendientes = {}
+        self._actividad = {}
+        self._cond = threading.Condition()
+        self._escribiendo = False
+        self._esperas = []
+        self.recibidos = 0
+        self.escritos = 0
+        self.apartadas = deque(maxlen=EVENTOS_APARTADAS_MAX)
+        if registro is not None:
+            eventos = list(registro.pendientes())
+            if eventos:
+                print(f"Reproduciendo {len(eventos)} eventos del registro")
+                self._combinar(_con_fechas(eventos))
+        self._thread = threading.Thread(target=self._run, name="eventos-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _combinar(self, eventos):
+        pendientes = self._pendientes
+        actividad = self._actividad
+        for evento in eventos:
+            clave = (evento["estudiante_id"], evento["curso_id"])
+            fila = pendientes.get(clave)
+            if fila is None:
+                fila = pendientes[clave] = fila_vacia(*clave)
+            combinar(fila, evento)
+            if evento.get("minutos"):
+                for cubeta, segundos in cubetas(evento):
+                    contador = actividad.get(cubeta)
+                    if contador is None:
+                        actividad[cubeta] = [segundos, 1]
+                    else:
+                        contador[0] += segundos
+                        contador[1] += 1
+
+    def agregar(self, eventos, datos=None):
+        """
+        Añade eventos (dicts con estudiante_id, curso_id, fecha y los campos
+        opcionales). `datos` es su serialización para el registro.
+        """
+        with self._cond:
+            if self._registro is not None:
+                self._registro.anexar(datos if datos is not None else _serializar(eventos))
+            self._combinar(eventos)
+            self.recibidos += len(eventos)
+            if len(self._pendientes) >= self._lote:
+                self._cond.notify()
+
+    def __len__(self):
+        return len(self._pendientes)
+
+    @property
+    def registra(self):
+        return self._registro is not None
+
+    def flush(self, timeout=10.0):
+        """Espera a que todo lo recibido hasta ahora esté escrito."""
+        hecho = threading.Event()
+        with self._cond:
+            if not self._pendientes and not self._escribiendo:
+                return True
+            self._esperas.append(hecho)
+            self._cond.notify()
+        return hecho.wait(timeout)
+
+    def _tomar(self):
+        """Bloquea hasta el disparo por tamaño, tiempo o flush y se lleva el buffer entero."""
+        with self._cond:
+            limite = time.monotonic() + self._intervalo
+            while len(self._pendientes) < self._lote and not self._esperas:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._cond.wait(restante)
+            filas, self._pendientes = self._pendientes, {}
+            actividad, self._actividad = self._actividad, {}
+            esperas, self._esperas = self._esperas, []
+            segmentos = self._registro.rotar() if self._registro is not None and filas else []
+            self._escribiendo = bool(filas)
+            return list(filas.values()), actividad, esperas, segmentos
+
+    def _run(self):
+        while True:
+            filas, actividad, esperas, segmentos = self._tomar()
+            if filas:
+                self.escritos += self._escribir_con_reintentos(filas, actividad)
+                if self._registro is not None:
+                    self._registro.confirmar(segmentos)
+                with self._cond:
+                    self._escribiendo = False
+            for hecho in esperas:
+                hecho.set()
+
+    def _escribir_con_reintentos(self, filas, actividad):
+        """Escribe el lote y devuelve cuántas filas quedaron escritas (las apartadas no cuentan)."""
+        espera = 0.5
+        while True:
+            try:
+                self._escribir(filas, actividad)
+                return len(filas)
+            except self._transitorios as e:
+                print(f"Error escribiendo {len(filas)} filas de progreso ({e}); reintento en {espera:.1f}s")
+                time.sleep(espera)
+                espera = min(espera * 2, 30)
+            except Exception as e:
+                if len(filas) == 1:
+                    self.apartadas.append((filas[0], actividad, str(e)))
+                    print(f"Se aparta la fila de progreso {_serializar(filas[0]).decode()} ({e})")
+                    return 0
+                break
+        # Cada mitad se lleva los contadores de actividad de sus pares (estudiante, curso)
+        mitad = len(filas) // 2
+        escritas = 0
+        for parte in (filas[:mitad], filas[mitad:]):
+            pares = {(f["estudiante_id"], f["curso_id"]) for f in parte}
+            escritas += self._escribir_con_reintentos(parte, {k: v for k, v in actividad.items() if k[:2] in pares})
+        return escritas
+
+
+def _serializar(eventos):
+    return json.dumps(eventos, default=lambda v: v.isoformat()).encode()
+
+
+def _con_fechas(eventos):
+    for evento in eventos:
+        if isinstance(evento.get("fecha"), str):
+            evento["fecha"] = date.fromisoformat(evento["fecha"])
+        if isinstance(evento.get("instante"), str):
+            evento["instante"] = datetime.fromisoformat(evento["instante"])
+        yield evento
+
+
+def create_registro():
+    """Registro local de eventos si EVENTOS_WAL indica una ruta; si no, None (solo memoria)."""
+    return RegistroEventos(EVENTOS_WAL) if EVENTOS_WAL else None
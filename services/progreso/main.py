@@ -1,29 +1,153 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from typing import List, Optional, Union
+from datetime import date, datetime, timedelta
+import csv
+import io
+import json
 import os
 import random
-import requests
+import threading
+import time
+
+import crud
+import actividad
+import cohortes
+from catalogo import CatalogoCursos
+from common.helpers.http_cache import is_fresh, strong_etag
+from database_sql import SessionLocal, create_db_and_tables
+from eventos import EVENTOS_FSYNC, IngestaEventos, create_registro, fusionar
+from models import ResumenCurso, ResumenEstudiante
+from rankings import CRITERIOS, RANKING_PAGINA_MAX, cambios_ranking, create_ranking_store, tablero_curso, tablero_global
 
 app = FastAPI(title="Progreso Service")
 
 
 class Progreso(BaseModel):
-    estudiante_id: str
-    curso_id: str
-    completado_pct: int
-    tiempo_invertido_horas: int
-    ultima_leccion: str
-    fecha_inicio: str
-    fecha_ultima_actividad: str
-    calificacion: Optional[float] = None
+    # Mismos límites que las columnas de la tabla y que la instantánea de cohortes
+    estudiante_id: str = Field(min_length=1, max_length=255)
+    curso_id: str = Field(min_length=1, max_length=64)
+    completado_pct: int = Field(ge=0, le=100)
+    tiempo_invertido_horas: int = Field(ge=0, le=2**31 - 1)
+    ultima_leccion: str = Field(max_length=255)
+    fecha_inicio: date
+    fecha_ultima_actividad: date
+    calificacion: Optional[float] = Field(default=None, ge=0, le=100)
 
-# Mock progreso data
+# El progreso vive en la tabla `progreso` (clave (estudiante_id, curso_id)), compartida
+# por todas las réplicas. Sin base de datos se guarda aquí: estudiante -> curso -> fila,
+# en "resumen" los agregados del panel: estudiante -> contadores de crud.CAMPOS_ESTUDIANTE,
+# y en "cursos"/"histograma" los de cada curso: curso -> contadores de crud.CAMPOS_CURSO / tramos.
 DATA = {
-    "progreso": {}
+    "progreso": {},
+    "resumen": {},
+    "cursos": {},
+    "histograma": {},
+    # (estudiante, resolución) -> (inicio, curso) -> [segundos, eventos]
+    "actividad": {},
 }
 
+
+# Rankings por curso y global en sorted sets de Redis (o skip lists locales),
+# actualizados con cada cambio de progreso
+rankings = create_ranking_store()
+
+
+def _actualizar_rankings(filas, resumenes):
+    # Un fallo de Redis no debe perder la escritura del progreso: se corrige con reconstruir.py
+    try:
+        rankings.actualizar(cambios_ranking(filas, resumenes))
+    except Exception as e:
+        print(f"Error actualizando rankings ({e})")
+
+
+# Copia en columnas del progreso para las consultas de cohorte (ver _refrescar_cohortes)
+instantanea = cohortes.InstantaneaProgreso()
+
+
+def _avisar_memoria(claves):
+    """Modo memoria: lleva el cambio de las filas `claves` a los rankings y a la instantánea."""
+    filas = {}
+    for estudiante_id, curso_id in claves:
+        fila = DATA["progreso"].get(estudiante_id, {}).get(curso_id)
+        filas[(estudiante_id, curso_id)] = (fila["completado_pct"], fila["calificacion"]) if fila else None
+    _actualizar_rankings(filas, {e: tuple(DATA["resumen"][e]) for e, _ in filas if e in DATA["resumen"]})
+    estudiantes = {e for e, _ in filas}
+    instantanea.reemplazar_estudiantes(
+        [
+            (e, c["curso_id"], c["completado_pct"], c["tiempo_invertido_horas"], c["fecha_ultima_actividad"], c["calificacion"])
+            for e in estudiantes
+            for c in DATA["progreso"].get(e, {}).values()
+        ],
+        estudiantes,
+    )
+
+
+def _conectar_db():
+    try:
+        create_db_and_tables()
+        with SessionLocal() as db:
+            if crud.resumen_vacio(db, ResumenEstudiante):
+                print("Reconstruyendo los resúmenes de estudiantes desde el progreso")
+                crud.reconstruir_resumenes(db)
+            if crud.resumen_vacio(db, ResumenCurso):
+                print("Reconstruyendo los resúmenes de cursos desde el progreso")
+                crud.reconstruir_cursos(db)
+        return True
+    except Exception as e:
+        print(f"Base de datos no disponible para el progreso ({e}); usando memoria")
+        return False
+
+
+DB_DISPONIBLE = _conectar_db()
+
+if DB_DISPONIBLE and rankings.vacio():
+    # Redis vacío (o rankings locales): se cargan desde la base de datos
+    with SessionLocal() as db:
+        filas, resumenes = crud.filas_ranking(db)
+    if filas:
+        print(f"Cargando rankings desde {len(filas)} filas de progreso")
+        rankings.reemplazar(cambios_ranking(filas, resumenes))
+
+
+def _ajustar_resumen(estudiante_id, viejo, nuevo):
+    """Modo memoria: resta el aporte de la fila anterior y suma el de la nueva (None si no hay)."""
+    resumen = DATA["resumen"].setdefault(estudiante_id, [0] * len(crud.CAMPOS_ESTUDIANTE))
+    for fila, signo in ((viejo, -1), (nuevo, 1)):
+        if fila is None:
+            continue
+        pct, calificacion = fila["completado_pct"], fila["calificacion"]
+        for i, valor in enumerate(crud.aporte(pct, calificacion)):
+            resumen[i] += signo * valor
+        curso = DATA["cursos"].setdefault(fila["curso_id"], [0] * len(crud.CAMPOS_CURSO))
+        for i, valor in enumerate(crud.aporte_curso(pct, calificacion)):
+            curso[i] += signo * valor
+        DATA["histograma"].setdefault(fila["curso_id"], [0] * crud.TRAMOS)[crud.tramo(pct)] += signo
+
+
+def _cursos_de(estudiante_id):
+    if DB_DISPONIBLE:
+        with SessionLocal() as db:
+            return crud.get_cursos(db, estudiante_id)
+    return list(DATA["progreso"].get(estudiante_id, {}).values())
+
+
+def _reemplazar_en_memoria(estudiante_id, cursos):
+    anteriores = DATA["progreso"].get(estudiante_id, {})
+    for viejo in anteriores.values():
+        _ajustar_resumen(estudiante_id, viejo, None)
+    DATA["progreso"][estudiante_id] = {c["curso_id"]: c for c in cursos}
+    for nuevo in cursos:
+        _ajustar_resumen(estudiante_id, None, nuevo)
+    _avisar_memoria({(estudiante_id, c) for c in [*anteriores, *DATA["progreso"][estudiante_id]]})
+
 CURSOS_SERVICE_URL = os.getenv("CURSOS_SERVICE_URL", "http://cursos-service:8002")
+# Ids del catálogo de cursos en memoria, revalidados en segundo plano con ETag
+catalogo = CatalogoCursos(f"{CURSOS_SERVICE_URL}/")
 
 
 @app.get("/")
@@ -36,112 +160,759 @@ def health_check():
     return {"status": "ok"}
 
 
-@app.get("/estudiantes/{estudiante_id}/cursos")
-def progreso_estudiante(estudiante_id: str):
-    # Si no hay progreso para este estudiante, asigna cursos aleatorios en caliente
-    existing = DATA.get("progreso", {}).get(estudiante_id)
-    
-    # Verificar si no existe o si existe pero está vacío
-    if not existing or not existing.get("cursos"):
-        try:
-            resp = requests.get(f"{CURSOS_SERVICE_URL}/", timeout=3)
-            resp.raise_for_status()
-            cursos = resp.json().get("cursos", [])
-        except Exception as e:
-            print(f"Error obteniendo cursos: {e}")
-            cursos = []
-
-        if cursos:
-            # Seleccionar entre 3 y 5 cursos aleatorios
-            num_cursos = min(random.randint(3, 5), len(cursos))
-            seleccion = random.sample(cursos, k=num_cursos)
-            cursos_asignados = []
-            
-            for c in seleccion:
-                pct = random.randint(10, 95)
-                # Calificación solo si completado >= 75%
-                calificacion = None if pct < 75 else round(random.uniform(3.5, 5.0), 1)
-                
-                item = {
-                    "curso_id": c.get("id"),
-                    "completado_pct": pct,
-                    "tiempo_invertido_horas": random.randint(1, 40),
-                    "ultima_leccion": f"Lección {random.randint(1, 10)}",
-                    "fecha_inicio": "2025-01-15",
-                    "fecha_ultima_actividad": "2025-11-17",
-                    "calificacion": calificacion,
-                }
-                cursos_asignados.append(item)
-            
-            DATA["progreso"][estudiante_id] = {"cursos": cursos_asignados}
-            return DATA["progreso"][estudiante_id]
-        else:
-            # No hay cursos disponibles
-            return {"cursos": []}
-    
-    return existing
+def _json(data):
+    # Mismos bytes que produciría JSONResponse
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
 
 
-@app.post("/progreso")
-def create_progreso(progreso: Progreso):
-    """Crear o actualizar progreso de un estudiante en un curso"""
-    estudiante_data = DATA["progreso"].setdefault(progreso.estudiante_id, {"cursos": []})
-    
-    # Verificar si ya existe progreso para este curso
-    for idx, c in enumerate(estudiante_data["cursos"]):
-        if c.get("curso_id") == progreso.curso_id:
-            # Actualizar existente
-            estudiante_data["cursos"][idx] = progreso.dict(exclude={"estudiante_id"})
-            return {"message": "Progreso actualizado", "progreso": progreso.dict()}
-    
-    # Agregar nuevo
-    estudiante_data["cursos"].append(progreso.dict(exclude={"estudiante_id"}))
-    return {"message": "Progreso creado", "progreso": progreso.dict()}
+def _respuesta_cacheable(request, data):
+    """JSON con ETag: el gateway y el frontend revalidan con If-None-Match y reciben 304."""
+    body = _json(data)
+    headers = {"ETag": strong_etag(body), "Cache-Control": "private, no-cache"}
+    if is_fresh(request.headers, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-@app.post("/estudiantes/{estudiante_id}/asignar-cursos")
-def asignar_cursos_aleatorios(estudiante_id: str):
+@app.get("/estudiantes/{estudiante_id}/cursos")
+def progreso_estudiante(estudiante_id: str, request: Request):
     """
-    Asignar cursos aleatorios con progreso y calificaciones a un estudiante.
-    Este endpoint POST fuerza la asignación de cursos nuevos.
+    Progreso del estudiante en sus cursos. Es solo lectura: un estudiante sin
+    cursos recibe una lista vacía y se inscribe con POST .../inscripcion.
     """
-    try:
-        resp = requests.get(f"{CURSOS_SERVICE_URL}/")
-        resp.raise_for_status()
-        cursos = resp.json().get("cursos", [])
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error obteniendo cursos: {e}")
+    return _respuesta_cacheable(request, {"cursos": _cursos_de(estudiante_id)})
 
-    if not cursos:
-        raise HTTPException(status_code=404, detail="No hay cursos disponibles")
 
-    # Seleccionar entre 3 y 5 cursos aleatorios
-    num_cursos = min(random.randint(3, 5), len(cursos))
-    seleccion = random.sample(cursos, k=num_cursos)
-    
+def _cursos_aleatorios(cursos, pct_min, pct_max, pct_calificado, horas_max):
+    """Entre 3 y 5 cursos del catálogo con progreso y calificación simulados."""
+    seleccion = random.sample(cursos, k=min(random.randint(3, 5), len(cursos)))
     cursos_asignados = []
     for c in seleccion:
-        pct = random.randint(5, 100)
-        # Calificación solo si progreso >= 80%
-        calificacion = round(random.uniform(3.5, 5.0), 1) if pct >= 80 else None
-        
-        item = {
-            "curso_id": c.get("id"),
+        pct = random.randint(pct_min, pct_max)
+        # Calificación solo a partir de cierto avance
+        calificacion = round(random.uniform(3.5, 5.0), 1) if pct >= pct_calificado else None
+        cursos_asignados.append({
+            "curso_id": c,
             "completado_pct": pct,
-            "tiempo_invertido_horas": random.randint(1, 50),
+            "tiempo_invertido_horas": random.randint(1, horas_max),
             "ultima_leccion": f"Lección {random.randint(1, 10)}",
-            "fecha_inicio": "2025-01-15",
-            "fecha_ultima_actividad": "2025-11-17",
+            "fecha_inicio": date(2025, 1, 15),
+            "fecha_ultima_actividad": date(2025, 11, 17),
             "calificacion": calificacion,
-        }
-        cursos_asignados.append(item)
-    
-    # Reemplazar cursos del estudiante
-    DATA["progreso"][estudiante_id] = {"cursos": cursos_asignados}
-    
+        })
+    return cursos_asignados
+
+
+def _catalogo_o_503():
+    cursos = catalogo.ids()
+    if cursos is None:
+        raise HTTPException(status_code=503, detail="Catálogo de cursos no disponible")
+    return cursos
+
+
+# Idempotency-Key: cuánto se recuerda la respuesta de una petición para repetirla en reintentos
+IDEMPOTENCIA_TTL = int(os.getenv("IDEMPOTENCIA_TTL", str(24 * 3600)))
+# Sin base de datos: clave -> (ruta, código, cuerpo, creada); el lock serializa las escrituras
+_SOLICITUDES = {}
+_lock_memoria = threading.Lock()
+_ultima_purga = 0.0
+
+
+def _clave_idempotencia(request):
+    clave = request.headers.get("Idempotency-Key")
+    if clave is not None and not 0 < len(clave) <= 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key debe tener entre 1 y 255 caracteres")
+    return clave
+
+
+def _repetir(ruta, guardada):
+    """Respuesta de una petición anterior con la misma Idempotency-Key."""
+    ruta_original, codigo, body = guardada
+    if ruta_original != ruta:
+        raise HTTPException(status_code=422, detail="Idempotency-Key ya usada en otra petición")
+    if codigo is None:
+        raise HTTPException(status_code=409, detail="Petición con esta Idempotency-Key en curso")
+    return Response(content=body, status_code=codigo, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+
+def _purgar_solicitudes():
+    global _ultima_purga
+    ahora = time.time()
+    if ahora - _ultima_purga < 600:
+        return
+    _ultima_purga = ahora
+    limite = datetime.utcnow() - timedelta(seconds=IDEMPOTENCIA_TTL)
+    if DB_DISPONIBLE:
+        with SessionLocal() as db:
+            crud.purgar_solicitudes(db, limite)
+    else:
+        with _lock_memoria:
+            for clave in [c for c, (*_, creada) in _SOLICITUDES.items() if creada < limite]:
+                del _SOLICITUDES[clave]
+
+
+def _escritura_idempotente(request, escribir_db, escribir_memoria):
+    """
+    Ejecuta una escritura como máximo una vez por Idempotency-Key. `escribir_*`
+    devuelven (código, cuerpo); la de base de datos recibe la sesión y no hace
+    commit: la reserva de la clave, la escritura y la respuesta guardada se
+    confirman juntas.
+    """
+    clave = _clave_idempotencia(request)
+    ruta = request.url.path
+    if clave is not None:
+        _purgar_solicitudes()
+    if DB_DISPONIBLE:
+        with SessionLocal() as db:
+            if clave is not None:
+                guardada = crud.reservar_solicitud(db, clave, ruta)
+                if guardada is not None:
+                    return _repetir(ruta, guardada)
+            codigo, data = escribir_db(db)
+            body = _json(data)
+            if clave is not None:
+                crud.completar_solicitud(db, clave, codigo, body.decode("utf-8"))
+            db.commit()
+    else:
+        with _lock_memoria:
+            if clave is not None and clave in _SOLICITUDES:
+                return _repetir(ruta, _SOLICITUDES[clave][:3])
+            codigo, data = escribir_memoria()
+            body = _json(data)
+            if clave is not None:
+                _SOLICITUDES[clave] = (ruta, codigo, body, datetime.utcnow())
+    return Response(content=body, status_code=codigo, media_type="application/json")
+
+
+@app.post("/estudiantes/{estudiante_id}/inscripcion")
+def inscribir_estudiante(estudiante_id: str, request: Request):
+    """
+    Inscribe al estudiante en cursos del catálogo si todavía no tiene ninguno
+    (201) y, si ya tiene, devuelve los suyos sin cambiarlos (200), junto con
+    su resumen. Repetirla es inofensivo; con Idempotency-Key un reintento
+    recibe la misma respuesta.
+    """
+    # El catálogo solo hace falta si el estudiante no tiene cursos: los ya inscritos no dependen de él
+    def nuevos():
+        cursos = _catalogo_o_503()
+        return _cursos_aleatorios(cursos, 10, 95, 75, 40) if cursos else []
+
+    def respuesta(inscritos, creado, resumen):
+        codigo = 201 if creado else 200
+        return codigo, {"estudiante_id": estudiante_id, "creado": creado, "cursos": inscritos, "resumen": resumen}
+
+    def en_db(db):
+        def filas():
+            return [dict(c, estudiante_id=estudiante_id) for c in nuevos()]
+
+        inscritos, creado = crud.inscribir(db, estudiante_id, filas, _actualizar_rankings, confirmar=False)
+        return respuesta(inscritos, creado, crud.get_resumen(db, estudiante_id))
+
+    def en_memoria():
+        existentes = _cursos_de(estudiante_id)
+        asignados = [] if existentes else nuevos()
+        if not asignados:
+            return respuesta(existentes, False, _resumen_memoria(estudiante_id))
+        _reemplazar_en_memoria(estudiante_id, asignados)
+        return respuesta(asignados, True, _resumen_memoria(estudiante_id))
+
+    return _escritura_idempotente(request, en_db, en_memoria)
+
+
+@app.get("/estudiantes/{estudiante_id}/resumen")
+def resumen_estudiante(estudiante_id: str):
+    """
+    Agregados del panel (número de cursos, progreso promedio y evaluaciones
+    pendientes), mantenidos con cada cambio de progreso: una sola lectura.
+    """
+    if DB_DISPONIBLE:
+        with SessionLocal() as db:
+            return crud.get_resumen(db, estudiante_id)
+    return _resumen_memoria(estudiante_id)
+
+
+def _resumen_memoria(estudiante_id):
+    return crud.resumen_a_dict(estudiante_id, *DATA["resumen"].get(estudiante_id, ()))
+
+
+# Cursos por petición en las estadísticas por lotes
+ESTADISTICAS_CURSOS_MAX = 500
+
+
+@app.get("/cursos/estadisticas")
+def estadisticas_cursos(cursos: str = ""):
+    """
+    Las estadísticas de varios cursos (ids separados por comas) en una sola
+    llamada, en el orden pedido: el panel del instructor no hace una por curso.
+    """
+    curso_ids = list(dict.fromkeys(c for c in (c.strip() for c in cursos.split(",")) if c))
+    if len(curso_ids) > ESTADISTICAS_CURSOS_MAX:
+        raise HTTPException(status_code=400, detail=f"Como mucho {ESTADISTICAS_CURSOS_MAX} cursos por petición")
+    if not curso_ids:
+        return {"cursos": []}
+    if DB_DISPONIBLE:
+        with SessionLocal() as db:
+            return {"cursos": crud.get_estadisticas_cursos(db, curso_ids)}
+    return {"cursos": [
+        crud.estadisticas_a_dict(c, DATA["cursos"].get(c), DATA["histograma"].get(c)) for c in curso_ids
+    ]}
+
+
+@app.get("/cursos/{curso_id}/estadisticas")
+def estadisticas_curso(curso_id: str):
+    """
+    Estadísticas del curso para instructores: inscritos, progreso promedio,
+    histograma de completado_pct y media y varianza de las calificaciones,
+    mantenidas con cada cambio de progreso.
+    """
+    if DB_DISPONIBLE:
+        with SessionLocal() as db:
+            return crud.get_estadisticas_curso(db, curso_id)
+    return crud.estadisticas_a_dict(curso_id, DATA["cursos"].get(curso_id), DATA["histograma"].get(curso_id))
+
+
+def _validar_criterio(criterio):
+    if criterio not in CRITERIOS:
+        raise HTTPException(status_code=400, detail=f"criterio debe ser uno de: {', '.join(CRITERIOS)}")
+
+
+def _pagina_ranking(tablero, criterio, inicio, cantidad):
+    _validar_criterio(criterio)
+    if inicio < 0 or cantidad < 1:
+        raise HTTPException(status_code=400, detail="inicio debe ser >= 0 y cantidad >= 1")
+    total, filas = rankings.top(tablero, inicio, min(cantidad, RANKING_PAGINA_MAX))
+    return {
+        "criterio": criterio,
+        "total": total,
+        "inicio": inicio,
+        "estudiantes": [
+            {"posicion": inicio + i + 1, "estudiante_id": estudiante_id, "puntaje": round(puntaje, 2)}
+            for i, (estudiante_id, puntaje) in enumerate(filas)
+        ],
+    }
+
+
+@app.get("/rankings/global")
+def ranking_global(criterio: str = "avance", inicio: int = 0, cantidad: int = 10):
+    """Estudiantes por promedio de avance o de calificación en sus cursos, paginados."""
+    return _pagina_ranking(tablero_global(criterio), criterio, inicio, cantidad)
+
+
+@app.get("/cursos/{curso_id}/ranking")
+def ranking_curso(curso_id: str, criterio: str = "avance", inicio: int = 0, cantidad: int = 10):
+    """Estudiantes del curso por avance o calificación, paginados."""
+    return dict(_pagina_ranking(tablero_curso(curso_id, criterio), criterio, inicio, cantidad), curso_id=curso_id)
+
+
+@app.get("/estudiantes/{estudiante_id}/ranking")
+def posicion_estudiante(estudiante_id: str, criterio: str = "avance", curso_id: Optional[str] = None):
+    """Posición del estudiante en el ranking global o en el de un curso."""
+    _validar_criterio(criterio)
+    tablero = tablero_curso(curso_id, criterio) if curso_id else tablero_global(criterio)
+    encontrado = rankings.posicion(tablero, estudiante_id)
+    if encontrado is None:
+        raise HTTPException(status_code=404, detail="El estudiante no figura en este ranking")
+    posicion, puntaje, total = encontrado
     return {
-        "message": f"{num_cursos} cursos asignados exitosamente",
+        "estudiante_id": estudiante_id,
+        "criterio": criterio,
+        "curso_id": curso_id,
+        "posicion": posicion + 1,
+        "puntaje": round(puntaje, 2),
+        "total": total,
+    }
+
+
+def _upsert_memoria(filas):
+    """Modo memoria de crud.upsert_progresos; devuelve cuántas filas ya existían."""
+    existian = 0
+    for f in filas:
+        cursos = DATA["progreso"].setdefault(f["estudiante_id"], {})
+        fila = {k: v for k, v in f.items() if k != "estudiante_id"}
+        existian += f["curso_id"] in cursos
+        _ajustar_resumen(f["estudiante_id"], cursos.get(f["curso_id"]), fila)
+        cursos[f["curso_id"]] = fila
+    _avisar_memoria([(f["estudiante_id"], f["curso_id"]) for f in filas])
+    return existian
+
+
+@app.post("/progreso")
+def create_progreso(progreso: Progreso):
+    """Crear o actualizar progreso de un estudiante en un curso"""
+    if DB_DISPONIBLE:
+        # Upsert por la clave primaria (estudiante_id, curso_id): sin recorrer sus cursos
+        with SessionLocal() as db:
+            existia = bool(crud.upsert_progresos(db, [progreso.dict()], _actualizar_rankings))
+    else:
+        existia = bool(_upsert_memoria([progreso.dict()]))
+    mensaje = "Progreso actualizado" if existia else "Progreso creado"
+    return {"message": mensaje, "progreso": progreso.dict()}
+
+
+class ProgresoFila(BaseModel):
+    """Fila de la tabla progreso tal como la exporta /progreso/export (e importa /progreso/bulk)."""
+    estudiante_id: str = Field(min_length=1, max_length=255)
+    curso_id: str = Field(min_length=1, max_length=64)
+    completado_pct: int = Field(ge=0, le=100)
+    tiempo_invertido_horas: int = Field(ge=0, le=2**31 - 1)
+    ultima_leccion: Optional[str] = Field(default=None, max_length=255)
+    fecha_inicio: Optional[date] = None
+    fecha_ultima_actividad: Optional[date] = None
+    calificacion: Optional[float] = None
+
+
+# Filas por upsert de la importación y de cada página de la exportación
+PROGRESO_BULK_LOTE = int(os.getenv("PROGRESO_BULK_LOTE", "5000"))
+# Errores que se detallan en la respuesta de la importación (el resto solo se cuentan)
+PROGRESO_BULK_ERRORES_MAX = 100
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+_FILA = TypeAdapter(ProgresoFila)
+CAMPOS_EXPORTACION = ("estudiante_id", "curso_id") + crud._CAMPOS
+
+
+async def _filas_entrantes(request):
+    """
+    Filas del cuerpo a medida que llegan: líneas NDJSON (bytes) o, si el
+    cuerpo es un array JSON, sus elementos.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in NDJSON_CONTENT_TYPES:
+        try:
+            data = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="Se esperaba un array JSON o NDJSON")
+        for row in data:
+            yield row
+        return
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lineas, buffer = buffer.split(b"\n")
+        for linea in lineas:
+            if linea.strip():
+                yield linea
+    if buffer.strip():
+        yield buffer
+
+
+@app.post("/progreso/bulk")
+async def importar_progreso(request: Request, atomic: bool = False):
+    """
+    Upsert masivo desde NDJSON (Content-Type: application/x-ndjson) o un
+    array JSON. Se lee, valida y escribe por lotes de PROGRESO_BULK_LOTE
+    filas mientras llega el cuerpo, así la memoria no depende del tamaño
+    de la importación. Con `atomic=true` todo va en una transacción y no se
+    escribe nada si alguna fila es inválida. Un lote que la base de datos
+    rechaza cuenta como error en cada una de sus filas y los demás siguen.
+    """
+    resumen = {"total": 0, "creados": 0, "actualizados": 0, "errores": 0, "detalle_errores": []}
+    db = SessionLocal() if DB_DISPONIBLE else None
+    # En modo atómico los rankings se avisan tras el commit y la memoria se escribe al final
+    avisos, diferidas = [], []
+    al_cambiar = (lambda *aviso: avisos.append(aviso)) if atomic else _actualizar_rankings
+
+    def anotar_error(numero, error):
+        resumen["errores"] += 1
+        if len(resumen["detalle_errores"]) < PROGRESO_BULK_ERRORES_MAX:
+            resumen["detalle_errores"].append({"fila": numero, "error": error})
+
+    def escribir(lote):
+        if atomic and resumen["errores"]:
+            return
+        filas = [fila for _, fila in lote.values()]
+        if db is not None:
+            try:
+                existian = len(crud.upsert_progresos(db, filas, al_cambiar, confirmar=not atomic))
+            except SQLAlchemyError as e:
+                db.rollback()
+                avisos.clear()
+                # Sin la sentencia ni los parámetros, que repetirían el lote entero
+                error = f"Base de datos: {str(getattr(e, 'orig', None) or e).splitlines()[0]}"
+                for numero, _ in lote.values():
+                    anotar_error(numero, error)
+                return
+        elif atomic:
+            diferidas.extend(filas)
+            return
+        else:
+            existian = _upsert_memoria(filas)
+        resumen["creados"] += len(filas) - existian
+        resumen["actualizados"] += existian
+
+    try:
+        lote = {}
+        async for item in _filas_entrantes(request):
+            numero = resumen["total"]
+            resumen["total"] += 1
+            try:
+                fila = _FILA.validate_json(item) if isinstance(item, bytes) else _FILA.validate_python(item)
+            except ValidationError as e:
+                anotar_error(numero, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+                continue
+            clave = (fila.estudiante_id, fila.curso_id)
+            if clave in lote:
+                # Repetida en el mismo lote: gana la última (un INSERT no puede tocar dos veces la misma fila)
+                resumen["actualizados"] += 1
+            lote[clave] = (numero, fila.__dict__)
+            if len(lote) >= PROGRESO_BULK_LOTE:
+                await run_in_threadpool(escribir, lote)
+                lote = {}
+        if lote:
+            await run_in_threadpool(escribir, lote)
+        resumen["detalle_errores"].sort(key=lambda d: d["fila"])
+        if atomic and resumen["errores"]:
+            resumen["creados"] = resumen["actualizados"] = 0
+            return JSONResponse(status_code=400, content=resumen)
+        if db is not None:
+            await run_in_threadpool(db.commit)
+            for aviso in avisos:
+                _actualizar_rankings(*aviso)
+        elif diferidas:
+            existian = _upsert_memoria(diferidas)
+            resumen["creados"] += len(diferidas) - existian
+            resumen["actualizados"] += existian
+        return resumen
+    finally:
+        if db is not None:
+            db.close()
+
+
+def _paginas_exportacion():
+    if not DB_DISPONIBLE:
+        estudiantes = sorted(DATA["progreso"])
+        for i in range(0, len(estudiantes), PROGRESO_BULK_LOTE):
+            yield [
+                dict(fila, estudiante_id=e)
+                for e in estudiantes[i:i + PROGRESO_BULK_LOTE]
+                for fila in DATA["progreso"].get(e, {}).values()
+            ]
+        return
+    ultima = None
+    while True:
+        # Una sesión corta por página: la exportación no retiene una transacción abierta
+        with SessionLocal() as db:
+            pagina = crud.pagina_progresos(db, ultima, PROGRESO_BULK_LOTE)
+        if not pagina:
+            return
+        yield pagina
+        ultima = (pagina[-1]["estudiante_id"], pagina[-1]["curso_id"])
+
+
+def _exportar_ndjson():
+    for pagina in _paginas_exportacion():
+        yield "".join(
+            json.dumps({k: f[k] for k in CAMPOS_EXPORTACION}, ensure_ascii=False, default=date.isoformat) + "\n"
+            for f in pagina
+        ).encode("utf-8")
+
+
+def _exportar_csv():
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(CAMPOS_EXPORTACION)
+    for pagina in _paginas_exportacion():
+        escritor.writerows([f[k] for k in CAMPOS_EXPORTACION] for f in pagina)
+        yield salida.getvalue().encode("utf-8")
+        salida.seek(0)
+        salida.truncate()
+    if salida.tell():
+        yield salida.getvalue().encode("utf-8")
+
+
+@app.get("/progreso/export")
+def exportar_progreso(formato: str = "ndjson"):
+    """
+    Todo el progreso como NDJSON o CSV, en orden de (estudiante_id, curso_id).
+    Se genera página a página mientras se envía: la memoria es la de una página.
+    """
+    if formato == "ndjson":
+        return StreamingResponse(_exportar_ndjson(), media_type="application/x-ndjson")
+    if formato == "csv":
+        return StreamingResponse(
+            _exportar_csv(), media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="progreso.csv"'},
+        )
+    raise HTTPException(status_code=400, detail="formato debe ser ndjson o csv")
+
+
+class EventoProgreso(BaseModel):
+    """Latido de actividad: solo estudiante y curso son obligatorios."""
+    estudiante_id: str = Field(min_length=1, max_length=255)
+    curso_id: str = Field(min_length=1, max_length=64)
+    completado_pct: Optional[int] = Field(default=None, ge=0, le=100)
+    tiempo_invertido_horas: Optional[int] = Field(default=None, ge=0, le=2**31 - 1)
+    ultima_leccion: Optional[str] = Field(default=None, max_length=255)
+    calificacion: Optional[float] = Field(default=None, ge=0, le=100)
+    fecha: date = Field(default_factory=date.today)
+    # Minutos de estudio que cubre el latido y cuándo terminaron (UTC), para la actividad
+    minutos: Optional[float] = Field(default=None, gt=0, le=24 * 60)
+    instante: datetime = Field(default_factory=datetime.utcnow)
+
+    @field_validator("instante")
+    @classmethod
+    def _instante_utc(cls, v):
+        return actividad.utc(v)
+
+
+# Se valida el cuerpo entero de una vez (uno o varios eventos) desde los bytes JSON
+_EVENTOS = TypeAdapter(Union[List[EventoProgreso], EventoProgreso])
+_LISTA_EVENTOS = TypeAdapter(List[EventoProgreso])
+
+
+def _escribir_eventos(filas, cubetas):
+    if DB_DISPONIBLE:
+        # Actividad y progreso en la misma transacción (el commit lo hace aplicar_eventos)
+        with SessionLocal() as db:
+            crud.sumar_actividad(db, cubetas, confirmar=False)
+            crud.aplicar_eventos(db, filas, _actualizar_rankings)
+        return
+    for (estudiante_id, curso_id, resolucion, inicio), (segundos, eventos) in cubetas.items():
+        contador = DATA["actividad"].setdefault((estudiante_id, resolucion), {}).setdefault((inicio, curso_id), [0, 0])
+        contador[0] += segundos
+        contador[1] += eventos
+    for fila in filas:
+        cursos = DATA["progreso"].setdefault(fila["estudiante_id"], {})
+        viejo = cursos.get(fila["curso_id"])
+        antes = dict(viejo) if viejo is not None else None
+        cursos[fila["curso_id"]] = fusionar(viejo, fila)
+        _ajustar_resumen(fila["estudiante_id"], antes, cursos[fila["curso_id"]])
+    _avisar_memoria([(f["estudiante_id"], f["curso_id"]) for f in filas])
+
+
+# Eventos de progreso con escritura diferida: se combinan por (estudiante, curso) en
+# memoria y se escriben por lotes; con EVENTOS_WAL se anotan antes en un registro local
+ingesta = IngestaEventos(_escribir_eventos, registro=create_registro(), transitorios=(OperationalError,))
+
+
+@app.post("/eventos", status_code=202)
+async def registrar_eventos(request: Request):
+    """
+    Acepta un evento o un array de eventos y responde en cuanto quedan en el
+    buffer (y en el registro local, si está activo). El progreso guardado se
+    actualiza en la siguiente escritura por lotes.
+    """
+    try:
+        eventos = _EVENTOS.validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False, include_input=False))
+    if not isinstance(eventos, list):
+        eventos = [eventos]
+    filas = [e.__dict__ for e in eventos]
+    datos = _LISTA_EVENTOS.dump_json(eventos) if ingesta.registra else None
+    if EVENTOS_FSYNC:
+        # El fsync bloquea: fuera del bucle de eventos
+        await run_in_threadpool(ingesta.agregar, filas, datos)
+    else:
+        ingesta.agregar(filas, datos)
+    return {"aceptados": len(filas), "pendientes": len(ingesta)}
+
+
+def _purgar_actividad():
+    """Borra cada ACTIVIDAD_PURGA_INTERVALO los intervalos más viejos que la retención de su resolución."""
+    while True:
+        time.sleep(actividad.ACTIVIDAD_PURGA_INTERVALO)
+        for resolucion in actividad.RESOLUCIONES:
+            limite = actividad.limite_retencion(resolucion)
+            try:
+                if DB_DISPONIBLE:
+                    with SessionLocal() as db:
+                        crud.purgar_actividad(db, resolucion, limite)
+                else:
+                    for (_, r), intervalos in list(DATA["actividad"].items()):
+                        if r == resolucion:
+                            for clave in [k for k in intervalos if k[0] < limite]:
+                                del intervalos[clave]
+            except Exception as e:
+                print(f"Error purgando la actividad por {resolucion} ({e})")
+
+
+threading.Thread(target=_purgar_actividad, name="actividad-purga", daemon=True).start()
+
+
+@app.get("/estudiantes/{estudiante_id}/actividad")
+def actividad_estudiante(
+    estudiante_id: str,
+    unidad: str = "dia",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    curso_id: Optional[str] = None,
+):
+    """
+    Horas de estudio por minuto, hora, día, semana o mes entre `desde` y
+    `hasta` (UTC), de un curso o de todos. Sale de los contadores ya
+    agrupados: semanas y meses suman como mucho unos cientos de días.
+    """
+    if unidad not in actividad.UNIDADES:
+        raise HTTPException(status_code=400, detail=f"unidad debe ser una de: {', '.join(actividad.UNIDADES)}")
+    hasta = actividad.utc(hasta) if hasta else datetime.utcnow()
+    desde = actividad.utc(desde) if desde else hasta - actividad.VENTANA[unidad]
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="desde debe ser anterior a hasta")
+    if actividad.numero_puntos(unidad, desde, hasta) > actividad.ACTIVIDAD_PUNTOS_MAX:
+        raise HTTPException(status_code=400, detail="Rango demasiado grande para esa unidad; usa una unidad mayor")
+    resolucion = actividad.UNIDADES[unidad]
+    inicio = actividad.inicio_intervalo(desde, unidad)
+    if DB_DISPONIBLE:
+        with SessionLocal() as db:
+            filas = crud.get_actividad(db, estudiante_id, resolucion, inicio, hasta, curso_id)
+    else:
+        filas = [
+            (i, segundos, eventos)
+            for (i, c), (segundos, eventos) in DATA["actividad"].get((estudiante_id, resolucion), {}).items()
+            if inicio <= i <= hasta and (curso_id is None or c == curso_id)
+        ]
+    puntos = actividad.serie(filas, unidad, desde, hasta)
+    return {
+        "estudiante_id": estudiante_id,
+        "curso_id": curso_id,
+        "unidad": unidad,
+        "desde": desde,
+        "hasta": hasta,
+        # Antes de esta fecha la resolución ya no se conserva: esos puntos salen a cero
+        "conservado_desde": max(actividad.limite_retencion(resolucion), desde),
+        "total_horas": round(sum(f[1] for f in filas) / 3600, 2),
+        "puntos": puntos,
+    }
+
+
+def _paginas_cohorte():
+    ultima = None
+    while True:
+        with SessionLocal() as db:
+            pagina = crud.pagina_cohorte(db, ultima, cohortes.COHORTES_LOTE)
+        if not pagina:
+            return
+        yield pagina
+        ultima = pagina[-1][:2]
+
+
+def _refrescar_cohortes():
+    """
+    Carga la instantánea entera y luego, cada COHORTES_INTERVALO, vuelve a
+    leer solo los estudiantes modificados desde la última marca vista (con
+    COHORTES_MARGEN hacia atrás). Cada COHORTES_RECARGA se recarga entera
+    por si algún cambio quedó fuera del margen.
+    """
+    marca, recargada = None, 0.0
+    while True:
+        try:
+            if marca is None or (cohortes.COHORTES_RECARGA and time.monotonic() - recargada >= cohortes.COHORTES_RECARGA):
+                # La marca se toma antes de leer: lo que cambie durante la carga entra en la siguiente vuelta
+                inicio = datetime.utcnow()
+                instantanea.cargar(_paginas_cohorte())
+                marca, recargada = inicio, time.monotonic()
+                print(f"Instantánea de cohortes cargada: {len(instantanea)} filas")
+            else:
+                with SessionLocal() as db:
+                    estudiantes, vista = crud.estudiantes_modificados(
+                        db, marca - timedelta(seconds=cohortes.COHORTES_MARGEN)
+                    )
+                    filas = crud.cohorte_de(db, estudiantes) if estudiantes else []
+                if estudiantes:
+                    instantanea.reemplazar_estudiantes(filas, estudiantes)
+                if vista is not None:
+                    marca = max(marca, vista)
+        except Exception as e:
+            print(f"Error refrescando la instantánea de cohortes ({e})")
+        time.sleep(cohortes.COHORTES_INTERVALO)
+
+
+if DB_DISPONIBLE:
+    threading.Thread(target=_refrescar_cohortes, name="cohortes", daemon=True).start()
+else:
+    # En memoria la instantánea se mantiene desde _avisar_memoria
+    instantanea.cargar([])
+
+
+@app.get("/cohortes")
+def consultar_cohorte(
+    curso_id: Optional[str] = None,
+    completado_min: Optional[int] = None,
+    completado_max: Optional[int] = None,
+    horas_min: Optional[int] = None,
+    horas_max: Optional[int] = None,
+    inactivo_dias: Optional[int] = None,
+    activo_dias: Optional[int] = None,
+    calificacion_min: Optional[float] = None,
+    calificacion_max: Optional[float] = None,
+    orden: str = "actividad",
+    inicio: int = 0,
+    cantidad: int = 100,
+):
+    """
+    Filas (estudiante, curso) que cumplen todos los filtros, p. ej. los de
+    un curso con 40-70 % de avance y 14 días sin actividad. Se evalúa sobre
+    la instantánea en memoria con máscaras de NumPy, no en la base de datos:
+    refleja los cambios con unos segundos de retraso (`actualizada`).
+    """
+    if orden.lstrip("-") not in cohortes.ORDENES:
+        raise HTTPException(status_code=400, detail=f"orden debe ser uno de: {', '.join(cohortes.ORDENES)} (con - para descendente)")
+    if inicio < 0 or cantidad < 1:
+        raise HTTPException(status_code=400, detail="inicio debe ser >= 0 y cantidad >= 1")
+    for nombre, minimo, maximo in (
+        ("completado", completado_min, completado_max),
+        ("horas", horas_min, horas_max),
+        ("calificacion", calificacion_min, calificacion_max),
+    ):
+        if minimo is not None and maximo is not None and minimo > maximo:
+            raise HTTPException(status_code=400, detail=f"{nombre}_min debe ser <= {nombre}_max")
+    if (inactivo_dias is not None and inactivo_dias < 0) or (activo_dias is not None and activo_dias < 0):
+        raise HTTPException(status_code=400, detail="inactivo_dias y activo_dias deben ser >= 0")
+    if instantanea.actualizada is None:
+        raise HTTPException(status_code=503, detail="La instantánea de cohortes todavía se está cargando")
+    cantidad = min(cantidad, cohortes.COHORTES_PAGINA_MAX)
+    comienzo = time.perf_counter()
+    total, estudiantes, filas = instantanea.consultar(
+        curso_id=curso_id,
+        completado_min=completado_min,
+        completado_max=completado_max,
+        horas_min=horas_min,
+        horas_max=horas_max,
+        inactivo_dias=inactivo_dias,
+        activo_dias=activo_dias,
+        calificacion_min=calificacion_min,
+        calificacion_max=calificacion_max,
+        orden=orden,
+        inicio=inicio,
+        limite=cantidad,
+    )
+    return {
+        "total": total,
+        "estudiantes": estudiantes,
+        "inicio": inicio,
+        "orden": orden,
+        "resultados": filas,
+        "actualizada": instantanea.actualizada,
+        "duracion_ms": round((time.perf_counter() - comienzo) * 1000, 2),
+    }
+
+
+@app.post("/estudiantes/{estudiante_id}/asignar-cursos")
+def asignar_cursos_aleatorios(estudiante_id: str, request: Request):
+    """
+    Asignar cursos aleatorios con progreso y calificaciones a un estudiante.
+    Este endpoint POST fuerza la asignación de cursos nuevos; con
+    Idempotency-Key un reintento no vuelve a reasignarlos.
+    """
+    cursos = _catalogo_o_503()
+    if not cursos:
+        raise HTTPException(status_code=404, detail="No hay cursos disponibles")
+    cursos_asignados = _cursos_aleatorios(cursos, 5, 100, 80, 50)
+    data = {
+        "message": f"{len(cursos_asignados)} cursos asignados exitosamente",
         "estudiante_id": estudiante_id,
         "cursos": cursos_asignados
     }
 
+    def en_db(db):
+        filas = [dict(c, estudiante_id=estudiante_id) for c in cursos_asignados]
+        crud.reemplazar_cursos(db, estudiante_id, filas, _actualizar_rankings, confirmar=False)
+        return 200, data
+
+    def en_memoria():
+        _reemplazar_en_memoria(estudiante_id, cursos_asignados)
+        return 200, data
+
+    return _escritura_idempotente(request, en_db, en_memoria)
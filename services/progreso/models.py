@@ -1,32 +1,116 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, Index, Text
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 
-from pydantic import BaseModel
-from typing import Optional
-
 Base = declarative_base()
 
-class YourModel(Base):
-    __tablename__ = "[nombre_de_tu_tabla]"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+class Progreso(Base):
+    """Avance de un estudiante en un curso: una fila por par (estudiante, curso)."""
+    __tablename__ = "progreso"
+    estudiante_id = Column(String(255), primary_key=True)
+    curso_id = Column(String(64), primary_key=True)
+    completado_pct = Column(Integer, nullable=False)
+    tiempo_invertido_horas = Column(Integer, nullable=False)
+    ultima_leccion = Column(String(255))
+    fecha_inicio = Column(Date)
+    fecha_ultima_actividad = Column(Date)
+    calificacion = Column(Float)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Consultas por curso (estadísticas) y por actividad reciente
+        Index("ix_progreso_curso_id", "curso_id"),
+        Index("ix_progreso_fecha_ultima_actividad", "fecha_ultima_actividad"),
+        # Cambios recientes para refrescar la instantánea de cohortes
+        Index("ix_progreso_actualizado_en", "actualizado_en"),
+    )
+
+    def __repr__(self):
+        return f"<Progreso(estudiante_id='{self.estudiante_id}', curso_id='{self.curso_id}')>"
+
+
+class ResumenEstudiante(Base):
+    """
+    Agregados del panel de un estudiante, mantenidos con sumas y conteos
+    corrientes en la misma transacción que cada cambio de su progreso.
+    """
+    __tablename__ = "resumen_estudiante"
+    estudiante_id = Column(String(255), primary_key=True)
+    num_cursos = Column(Integer, default=0, nullable=False)
+    suma_pct = Column(Integer, default=0, nullable=False)
+    # Cursos con más del 50 % completado y sin calificación
+    pendientes = Column(Integer, default=0, nullable=False)
+    calificados = Column(Integer, default=0, nullable=False)
+    suma_calificacion = Column(Float, default=0, nullable=False)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_resumen_estudiante_actualizado_en", "actualizado_en"),)
+
+    def __repr__(self):
+        return f"<ResumenEstudiante(estudiante_id='{self.estudiante_id}', num_cursos={self.num_cursos})>"
+
+
+class ResumenCurso(Base):
+    """
+    Agregados de un curso para los instructores, mantenidos como los de
+    ResumenEstudiante. Media y varianza de las calificaciones salen de la
+    suma y la suma de cuadrados.
+    """
+    __tablename__ = "resumen_curso"
+    curso_id = Column(String(64), primary_key=True)
+    inscritos = Column(Integer, default=0, nullable=False)
+    suma_pct = Column(Integer, default=0, nullable=False)
+    completados = Column(Integer, default=0, nullable=False)
+    pendientes = Column(Integer, default=0, nullable=False)
+    calificados = Column(Integer, default=0, nullable=False)
+    suma_calificacion = Column(Float, default=0, nullable=False)
+    suma_calificacion2 = Column(Float, default=0, nullable=False)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     def __repr__(self):
-        return f"<YourModel(id={self.id}, name='{self.name}')>"
+        return f"<ResumenCurso(curso_id='{self.curso_id}', inscritos={self.inscritos})>"
+
+
+class HistogramaCurso(Base):
+    """Estudiantes de un curso por tramo de 10 puntos de completado_pct (el 9 incluye el 100)."""
+    __tablename__ = "histograma_curso"
+    curso_id = Column(String(64), primary_key=True)
+    tramo = Column(Integer, primary_key=True)
+    estudiantes = Column(Integer, default=0, nullable=False)
+
+
+class SolicitudIdempotente(Base):
+    """
+    Petición con Idempotency-Key: se reserva en la misma transacción que su
+    escritura y guarda la respuesta, que se repite tal cual en los reintentos.
+    """
+    __tablename__ = "solicitudes_idempotentes"
+    clave = Column(String(255), primary_key=True)
+    ruta = Column(String(255), nullable=False)
+    codigo = Column(Integer)
+    respuesta = Column(Text)
+    creado_en = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_solicitudes_idempotentes_creado_en", "creado_en"),
+    )
 
-class YourModelBase(BaseModel):
-    name: str
-    description: Optional[str] = None
 
-class YourModelCreate(YourModelBase):
-    pass
+class Actividad(Base):
+    """
+    Tiempo de estudio de un estudiante en un curso, en contadores por
+    intervalo de una resolución (minuto, hora o día); cada resolución se
+    conserva un tiempo distinto (actividad.RETENCION).
+    """
+    __tablename__ = "actividad"
+    estudiante_id = Column(String(255), primary_key=True)
+    resolucion = Column(String(8), primary_key=True)
+    inicio = Column(DateTime, primary_key=True)
+    curso_id = Column(String(64), primary_key=True)
+    segundos = Column(Integer, default=0, nullable=False)
+    eventos = Column(Integer, default=0, nullable=False)
 
-class YourModelRead(YourModelBase):
-    id: int
-    created_at: datetime
-    
-    class Config:
-        orm_mode = True
+    __table_args__ = (
+        # Para borrar por retención sin recorrer a cada estudiante
+        Index("ix_actividad_resolucion_inicio", "resolucion", "inicio"),
+    )
@@ -0,0 +1,253 @@
+import os
+import random
+import threading
+
+import crud
+
+# Máximo de estudiantes por página de un ranking
+RANKING_PAGINA_MAX = int(os.getenv("RANKING_PAGINA_MAX", "100"))
+
+CRITERIOS = ("avance", "calificacion")
+PREFIJO = "progreso:ranking:"
+
+
+def tablero_curso(curso_id, criterio):
+    return f"curso:{curso_id}:{criterio}"
+
+
+def tablero_global(criterio):
+    return f"global:{criterio}"
+
+
+def cambios_ranking(filas, resumenes):
+    """
+    Traduce un cambio de progreso a operaciones sobre los rankings: lista de
+    (tablero, estudiante, puntaje), con puntaje None para sacarlo.
+    `filas` es (estudiante, curso) -> (avance, calificación) o None si se
+    borró; `resumenes` es estudiante -> contadores de crud.CAMPOS_ESTUDIANTE.
+    En cada curso se ordena por avance y por calificación; en el global, por
+    el promedio de ambos en los cursos del estudiante.
+    """
+    cambios = []
+    for (estudiante_id, curso_id), fila in filas.items():
+        pct, calificacion = fila if fila is not None else (None, None)
+        cambios.append((tablero_curso(curso_id, "avance"), estudiante_id, pct))
+        cambios.append((tablero_curso(curso_id, "calificacion"), estudiante_id, calificacion))
+    for estudiante_id in {e for e, _ in filas}:
+        num_cursos, suma_pct, _, calificados, suma_calificacion = resumenes.get(estudiante_id, (0, 0, 0, 0, 0.0))
+        cambios.append((tablero_global("avance"), estudiante_id, crud.promedio_avance(num_cursos, suma_pct)))
+        cambios.append((tablero_global("calificacion"), estudiante_id, crud.promedio_calificacion(calificados, suma_calificacion)))
+    return cambios
+
+
+class ListaSaltos:
+    """
+    Skip list indexable ordenada por (puntaje, miembro), como un sorted set
+    de Redis: cada enlace guarda cuántos elementos salta, así la posición de
+    un miembro y el acceso por posición son O(log n) igual que la inserción
+    y el borrado.
+    """
+
+    NIVEL_MAX = 32
+
+    def __init__(self):
+        # Nodo: [clave, siguientes, saltos]; la cabecera tiene todos los niveles
+        self._cabeza = [None, [None] * self.NIVEL_MAX, [1] * self.NIVEL_MAX]
+        self._nivel = 1
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def _camino(self, clave):
+        """Último nodo anterior a `clave` en cada nivel y su posición."""
+        previos = [None] * self.NIVEL_MAX
+        posiciones = [0] * self.NIVEL_MAX
+        nodo, posicion = self._cabeza, 0
+        for i in range(self._nivel - 1, -1, -1):
+            siguiente = nodo[1][i]
+            while siguiente is not None and siguiente[0] < clave:
+                posicion += nodo[2][i]
+                nodo, siguiente = siguiente, siguiente[1][i]
+            previos[i], posiciones[i] = nodo, posicion
+        return previos, posiciones
+
+    def insertar(self, clave):
+        previos, posiciones = self._camino(clave)
+        nivel = 1
+        while nivel < self.NIVEL_MAX and random.random() < 0.25:
+            nivel += 1
+        if nivel > self._nivel:
+            for i in range(self._nivel, nivel):
+                previos[i], posiciones[i] = self._cabeza, 0
+                self._cabeza[2][i] = self._n + 1
+            self._nivel = nivel
+        nodo = [clave, [None] * nivel, [0] * nivel]
+        posicion = posiciones[0] + 1
+        for i in range(nivel):
+            previo = previos[i]
+            nodo[1][i], previo[1][i] = previo[1][i], nodo
+            # El salto del previo se reparte entre él y el nodo nuevo
+            nodo[2][i] = previo[2][i] - (posicion - posiciones[i]) + 1
+            previo[2][i] = posicion - posiciones[i]
+        for i in range(nivel, self._nivel):
+            previos[i][2][i] += 1
+        self._n += 1
+
+    def borrar(self, clave):
+        previos, _ = self._camino(clave)
+        nodo = previos[0][1][0]
+        if nodo is None or nodo[0] != clave:
+            return False
+        for i in range(self._nivel):
+            previo = previos[i]
+            if previo[1][i] is nodo:
+                previo[2][i] += nodo[2][i] - 1
+                previo[1][i] = nodo[1][i]
+            else:
+                previo[2][i] -= 1
+        while self._nivel > 1 and self._cabeza[1][self._nivel - 1] is None:
+            self._nivel -= 1
+        self._n -= 1
+        return True
+
+    def posicion(self, clave):
+        """Posición (desde 0) de una clave presente."""
+        _, posiciones = self._camino(clave)
+        return posiciones[0]
+
+    def desde(self, posicion, cantidad):
+        """Hasta `cantidad` claves a partir de `posicion` (desde 0), en orden."""
+        if posicion >= self._n:
+            return []
+        nodo, actual = self._cabeza, -1
+        for i in range(self._nivel - 1, -1, -1):
+            while nodo[1][i] is not None and actual + nodo[2][i] <= posicion:
+                actual += nodo[2][i]
+                nodo = nodo[1][i]
+        claves = []
+        while nodo is not None and len(claves) < cantidad:
+            if nodo is not self._cabeza:
+                claves.append(nodo[0])
+            nodo = nodo[1][0]
+        return claves
+
+
+class LocalRankingStore:
+    """
+    Rankings en memoria del proceso (sustituto de Redis). Cada tablero es
+    una ListaSaltos con claves (-puntaje, miembro), así la posición 0 es la
+    del mejor puntaje, más un dict miembro -> puntaje.
+    """
+
+    def __init__(self):
+        self._tableros = {}
+        self._lock = threading.Lock()
+
+    def actualizar(self, cambios):
+        with self._lock:
+            for tablero, miembro, puntaje in cambios:
+                lista, puntajes = self._tableros.setdefault(tablero, (ListaSaltos(), {}))
+                anterior = puntajes.pop(miembro, None)
+                if anterior is not None:
+                    lista.borrar((-anterior, miembro))
+                if puntaje is not None:
+                    puntajes[miembro] = puntaje
+                    lista.insertar((-puntaje, miembro))
+
+    def reemplazar(self, cambios):
+        with self._lock:
+            self._tableros = {}
+        self.actualizar(cambios)
+
+    def top(self, tablero, inicio, cantidad):
+        with self._lock:
+            lista, _ = self._tableros.get(tablero, (ListaSaltos(), None))
+            return len(lista), [(miembro, -puntaje) for puntaje, miembro in lista.desde(inicio, cantidad)]
+
+    def posicion(self, tablero, miembro):
+        """(posición desde 0, puntaje, total) o None si el miembro no está."""
+        with self._lock:
+            lista, puntajes = self._tableros.get(tablero, (ListaSaltos(), {}))
+            puntaje = puntajes.get(miembro)
+            if puntaje is None:
+                return None
+            return lista.posicion((-puntaje, miembro)), puntaje, len(lista)
+
+    def vacio(self):
+        return not self._tableros
+
+
+class RedisRankingStore:
+    """
+    Rankings en sorted sets de Redis compartidos por todas las réplicas:
+    ZADD/ZREM al cambiar el progreso, ZREVRANK para la posición y ZREVRANGE
+    para paginar, todo O(log n). Con puntajes iguales Redis desempata por
+    miembro en orden inverso; la ListaSaltos local, en orden directo.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def actualizar(self, cambios):
+        pipe = self._client.pipeline(transaction=False)
+        for tablero, miembro, puntaje in cambios:
+            if puntaje is None:
+                pipe.zrem(PREFIJO + tablero, miembro)
+            else:
+                pipe.zadd(PREFIJO + tablero, {miembro: puntaje})
+        pipe.execute()
+
+    def reemplazar(self, cambios, lote=5000):
+        """
+        Carga los tableros completos en claves temporales y los sustituye con
+        RENAME (los lectores nunca ven un ranking a medio cargar); borra los
+        tableros que ya no tienen estudiantes.
+        """
+        tableros = {}
+        for tablero, miembro, puntaje in cambios:
+            if puntaje is not None:
+                tableros.setdefault(tablero, {})[miembro] = puntaje
+        for tablero, puntajes in tableros.items():
+            temporal = PREFIJO + "tmp:" + tablero
+            self._client.delete(temporal)
+            miembros = list(puntajes.items())
+            for i in range(0, len(miembros), lote):
+                self._client.zadd(temporal, dict(miembros[i:i + lote]))
+            self._client.rename(temporal, PREFIJO + tablero)
+        vigentes = {PREFIJO + t for t in tableros}
+        for key in self._client.scan_iter(match=PREFIJO + "*", count=1000):
+            key = key.decode()
+            if key not in vigentes and not key.startswith(PREFIJO + "tmp:"):
+                self._client.delete(key)
+
+    def top(self, tablero, inicio, cantidad):
+        pipe = self._client.pipeline(transaction=False)
+        pipe.zcard(PREFIJO + tablero)
+        pipe.zrevrange(PREFIJO + tablero, inicio, inicio + cantidad - 1, withscores=True)
+        total, filas = pipe.execute()
+        return total, [(miembro.decode(), puntaje) for miembro, puntaje in filas]
+
+    def posicion(self, tablero, miembro):
+        pipe = self._client.pipeline(transaction=False)
+        pipe.zrevrank(PREFIJO + tablero, miembro)
+        pipe.zscore(PREFIJO + tablero, miembro)
+        pipe.zcard(PREFIJO + tablero)
+        posicion, puntaje, total = pipe.execute()
+        return None if posicion is None else (posicion, puntaje, total)
+
+    def vacio(self):
+        return not self._client.exists(PREFIJO + tablero_global("avance"))
+
+
+def create_ranking_store():
+    """Usa Redis si responde; si no, rankings locales al proceso."""
+    try:
+        from database_redis import get_redis_client
+
+        client = get_redis_client(socket_connect_timeout=1, socket_timeout=2)
+        client.ping()
+        return RedisRankingStore(client)
+    except Exception as e:
+        print(f"Redis no disponible para los rankings ({e}); usando rankings locales")
+        return LocalRankingStore()
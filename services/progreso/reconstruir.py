@@ -0,0 +1,47 @@
+"""
+Reconstruye desde la tabla progreso los resúmenes por estudiante y por curso
+y los rankings de Redis (p. ej. tras una carga o corrección masiva hecha
+directamente en la base de datos, o si Redis perdió los rankings). El
+servicio puede seguir en marcha: las escrituras esperan a que termine la
+reconstrucción de los resúmenes y aplican su cambio sobre el resultado.
+
+Uso:
+    cd services/progreso
+    python reconstruir.py [--solo estudiantes|cursos|rankings]
+"""
+import argparse
+import time
+
+import crud
+from database_sql import SessionLocal, create_db_and_tables
+from rankings import cambios_ranking, create_ranking_store
+
+
+def reconstruir_rankings(db):
+    filas, resumenes = crud.filas_ranking(db)
+    create_ranking_store().reemplazar(cambios_ranking(filas, resumenes))
+
+
+def main_reconstruir():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--solo", choices=("estudiantes", "cursos", "rankings"), help="reconstruir solo una parte")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    # Los rankings globales salen de los resúmenes de estudiantes: van después
+    pasos = {
+        "estudiantes": crud.reconstruir_resumenes,
+        "cursos": crud.reconstruir_cursos,
+        "rankings": reconstruir_rankings,
+    }
+    for nombre, reconstruir in pasos.items():
+        if args.solo and args.solo != nombre:
+            continue
+        inicio = time.perf_counter()
+        with SessionLocal() as db:
+            reconstruir(db)
+        print(f"{nombre}: reconstruido en {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main_reconstruir()
@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import cargar_servicio
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(cargar_servicio("services/cursos").app)
+
+
+def test_tree_includes_modules_and_lessons(client):
+    r = client.get("/curso1/tree")
+    assert r.status_code == 200
+    arbol = r.json()
+    assert arbol["id"] == "curso1"
+    assert [m["id"] for m in arbol["modulos"]] == ["mod1", "mod2"]
+    assert [l["id"] for l in arbol["modulos"][0]["lecciones"]] == ["lec1", "lec2"]
+    assert arbol["modulos"][1]["lecciones"] == []
+
+
+def test_tree_depth(client):
+    solo_modulos = client.get("/curso1/tree", params={"include": "modulos"}).json()
+    assert "lecciones" not in solo_modulos["modulos"][0]
+    solo_curso = client.get("/curso1/tree", params={"include": ""}).json()
+    assert "modulos" not in solo_curso and solo_curso["id"] == "curso1"
+    assert client.get("/curso1/tree", params={"include": "alumnos"}).status_code == 400
+    assert client.get("/no-existe/tree").status_code == 404
+
+
+def test_tree_supports_conditional_get(client):
+    r = client.get("/curso1/tree", headers={"Accept-Encoding": "identity"})
+    assert client.get("/curso1/tree", headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import cargar_servicio
+
+
+def _curso(i, **extra):
+    return {"id": f"bulk-{i}", "titulo": f"Bulk {i}", "descripcion": "d", "instructor_id": "inst-bulk",
+            "duracion_horas": 5, "rating": 4.0, **extra}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(cargar_servicio("services/cursos").app)
+
+
+def test_bulk_json_reports_each_row(client):
+    filas = [_curso(1), _curso(2), {"id": "bulk-x"}, _curso(1), _curso("c", id="curso1")]
+    r = client.post("/cursos/bulk", json=filas)
+    assert r.status_code == 200
+    resumen = r.json()
+    assert (resumen["total"], resumen["creados"], resumen["errores"]) == (5, 2, 3)
+    assert [f["status"] for f in resumen["resultados"]] == ["creado", "creado", "invalido", "duplicado", "duplicado"]
+    ids = {c["id"] for c in client.get("/").json()["cursos"]}
+    assert {"bulk-1", "bulk-2"} <= ids and "bulk-x" not in ids
+
+
+def test_bulk_ndjson_with_bad_line(client):
+    cuerpo = "\n".join([json.dumps(_curso(10)), "{no es json", json.dumps(_curso(11))]).encode()
+    r = client.post("/cursos/bulk", content=cuerpo, headers={"Content-Type": "application/x-ndjson"})
+    resumen = r.json()
+    assert (resumen["creados"], resumen["errores"]) == (2, 1)
+    assert resumen["resultados"][1]["status"] == "invalido"
+
+
+def test_bulk_atomic_writes_nothing_on_error(client):
+    r = client.post("/cursos/bulk", params={"atomic": "true"}, json=[_curso(20), {"id": "bulk-21"}])
+    assert r.status_code == 400
+    assert r.json()["creados"] == 0
+    assert client.get("/bulk-20").status_code == 404
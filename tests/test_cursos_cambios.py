@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import cargar_servicio
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(cargar_servicio("services/cursos").app)
+
+
+def _curso(i):
+    return {"id": f"feed-{i}", "titulo": f"Feed {i}", "descripcion": "d", "instructor_id": "inst-feed",
+            "duracion_horas": 5, "rating": 4.0}
+
+
+def test_feed_lists_writes_in_order(client):
+    inicio = client.get("/changes").json()["ultimo"]
+    client.post("/cursos", json=_curso(1))
+    client.put("/feed-1", json=dict(_curso(1), titulo="Cambiado"))
+    client.post("/cursos/bulk", json=[_curso(2), _curso(3)])
+    client.delete("/feed-2")
+
+    r = client.get("/changes", params={"since": inicio}).json()
+    assert [(c["tipo"], c["curso_id"]) for c in r["cambios"]] == [
+        ("create", "feed-1"), ("update", "feed-1"), ("create", "feed-2"), ("create", "feed-3"), ("delete", "feed-2"),
+    ]
+    assert [c["seq"] for c in r["cambios"]] == list(range(inicio + 1, inicio + 6))
+    assert r["cambios"][1]["curso"]["titulo"] == "Cambiado"
+    assert r["ultimo"] == inicio + 5 and r["truncado"] is False
+
+    # Paginación con `limit` y reanudación desde el último visto
+    primera = client.get("/changes", params={"since": inicio, "limit": 2}).json()["cambios"]
+    resto = client.get("/changes", params={"since": primera[-1]["seq"]}).json()["cambios"]
+    assert [c["seq"] for c in primera + resto] == [c["seq"] for c in r["cambios"]]
+
+
+def test_feed_ahead_of_server_is_truncated(client):
+    ultimo = client.get("/changes").json()["ultimo"]
+    r = client.get("/changes", params={"since": ultimo + 100}).json()
+    assert r["truncado"] is True and r["cambios"] == []
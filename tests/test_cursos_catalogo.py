@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import cargar_servicio
+
+NUEVO = {
+    "id": "cat-1", "titulo": "Catálogo ñ", "descripcion": "Bytes precalculados",
+    "instructor_id": "inst-cat", "duracion_horas": 12, "rating": 4.2,
+}
+
+
+@pytest.fixture(scope="module")
+def cursos():
+    return cargar_servicio("services/cursos")
+
+
+def test_list_matches_fastapi_serialization(cursos):
+    client = TestClient(cursos.app)
+    r = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    # Los bytes servidos son los que habría producido JSONResponse con la lista actual
+    esperado = json.dumps({"cursos": cursos.DATA["cursos"]}, ensure_ascii=False, separators=(",", ":")).encode()
+    assert r.content == esperado
+
+
+def test_writes_invalidate_only_their_entries(cursos):
+    client = TestClient(cursos.app)
+    curso1 = cursos.catalog_cache.get("curso:curso1")
+    assert client.post("/cursos", json=NUEVO).status_code == 200
+
+    lista = client.get("/").json()["cursos"]
+    assert lista[-1] == dict(NUEVO, nivel="Básico")
+    assert client.get("/cat-1").json()["titulo"] == "Catálogo ñ"
+    # El fragmento de un curso que no cambió se reutiliza sin re-serializar
+    assert cursos.catalog_cache.get("curso:curso1") is curso1
+
+    assert client.put("/cat-1", json=dict(NUEVO, titulo="Otro título")).status_code == 200
+    assert client.get("/cat-1").json()["titulo"] == "Otro título"
+    assert client.delete("/cat-1").status_code == 200
+    assert client.get("/cat-1").status_code == 404
+    assert all(c["id"] != "cat-1" for c in client.get("/").json()["cursos"])
+
+
+def test_collection_skips_a_course_deleted_while_it_is_built(cursos):
+    client = TestClient(cursos.app)
+    assert client.post("/cursos", json=dict(NUEVO, id="cat-borrado")).status_code == 200
+    # Mitad de un DELETE: ya no está en el índice pero sí en la lista que recorre el loader
+    borrado = cursos.CURSOS_POR_ID.pop("cat-borrado")
+    cursos.catalog_cache.invalidate("cursos", "curso:cat-borrado")
+    try:
+        ids = [c["id"] for c in json.loads(cursos._load_catalog("cursos"))["cursos"]]
+        assert "cat-borrado" not in ids and "curso1" in ids
+    finally:
+        cursos.CURSOS_POR_ID["cat-borrado"] = borrado
+    assert client.delete("/cat-borrado").status_code == 200
@@ -0,0 +1,86 @@
+import gzip
+import json
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from conftest import cargar_servicio, servidor
+
+
+@pytest.fixture(scope="module")
+def cursos():
+    main = cargar_servicio("services/cursos")
+    client = TestClient(main.app)
+    # Catálogo de más de 1 KB para que se ofrezca la variante comprimida
+    for i in range(20):
+        r = client.post("/cursos", json={
+            "id": f"etag-{i}", "titulo": f"Curso {i}", "descripcion": "Curso de prueba de ETag " * 3,
+            "instructor_id": "inst-etag", "duracion_horas": 10, "rating": 4.0,
+        })
+        assert r.status_code == 200, r.text
+    return main
+
+
+def test_get_conditional_304(cursos):
+    client = TestClient(cursos.app)
+    r = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert "Last-Modified" in r.headers
+
+    r = client.get("/", headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["ETag"] == etag
+    # Los ETag débiles y las listas también valen
+    r = client.get("/", headers={"If-None-Match": f'"otro", W/{etag}'})
+    assert r.status_code == 304
+
+
+def test_etag_changes_after_write(cursos):
+    client = TestClient(cursos.app)
+    etag = client.get("/", headers={"Accept-Encoding": "identity"}).headers["ETag"]
+    r = client.put("/etag-0", json={
+        "id": "etag-0", "titulo": "Curso 0 renombrado", "descripcion": "x",
+        "instructor_id": "inst-etag", "duracion_horas": 10, "rating": 4.0,
+    })
+    assert r.status_code == 200, r.text
+    r = client.get("/", headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+
+
+def test_gzip_variant_has_its_own_etag(cursos):
+    client = TestClient(cursos.app)
+    plano = client.get("/", headers={"Accept-Encoding": "identity"})
+    r = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["ETag"] == plano.headers["ETag"][:-1] + '-gz"'
+    assert r.json() == plano.json()
+    # Revalidar con el ETag comprimido da 304, con el ETag de la representación negociada
+    r304 = client.get("/", headers={"If-None-Match": r.headers["ETag"], "Accept-Encoding": "gzip"})
+    assert r304.status_code == 304 and r304.headers["ETag"] == r.headers["ETag"]
+    r304 = client.get("/", headers={"If-None-Match": r.headers["ETag"], "Accept-Encoding": "identity"})
+    assert r304.status_code == 304 and r304.headers["ETag"] == plano.headers["ETag"]
+
+
+def test_gateway_forwards_representation_unchanged(cursos):
+    with servidor(cursos.app) as url:
+        gateway = cargar_servicio("api-gateway")
+        gateway.SERVICES["cursos"] = url
+        client = TestClient(gateway.app)
+
+        r = client.get("/api/v1/cursos/", headers={"Accept-Encoding": "gzip"})
+        assert r.status_code == 200
+        # El cuerpo comprimido llega tal cual, con el ETag de esa representación
+        assert r.headers["Content-Encoding"] == "gzip"
+        assert r.headers["ETag"].endswith('-gz"')
+        directo = requests.get(f"{url}/", headers={"Accept-Encoding": "gzip"}, stream=True)
+        assert gzip.decompress(directo.raw.read(decode_content=False)) == json.dumps(r.json(), ensure_ascii=False, separators=(",", ":")).encode()
+
+        r2 = client.get("/api/v1/cursos/", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in r2.headers
+        assert r2.headers["ETag"] == r.headers["ETag"].replace("-gz", "")
+
+        r3 = client.get("/api/v1/cursos/", headers={"If-None-Match": r.headers["ETag"], "Accept-Encoding": "gzip"})
+        assert r3.status_code == 304 and r3.headers["ETag"] == r.headers["ETag"]
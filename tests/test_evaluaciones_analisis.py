@@ -0,0 +1,117 @@
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+CUESTIONARIO = {
+    "id": "ana-1", "curso_id": "curso1", "titulo": "Análisis", "tipo": "quiz", "puntos_totales": 3,
+    "preguntas": [
+        {"id": "p1", "tipo": "opcion", "opciones": ["a", "b", "c"], "respuesta": 0},
+        {"id": "p2", "tipo": "opcion", "opciones": ["a", "b", "c"], "respuesta": 1},
+        {"id": "p3", "tipo": "opcion", "opciones": ["a", "b"], "respuesta": 1},
+    ],
+}
+CORRECTAS = {"p1": 0, "p2": 1, "p3": 1}
+
+
+@pytest.fixture(scope="module")
+def evaluaciones():
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+    r = TestClient(main.app).post("/evaluaciones", json=CUESTIONARIO)
+    assert r.status_code == 200, r.text
+    return main
+
+
+def _envios(n, semilla):
+    azar = random.Random(semilla)
+    return [{pid: azar.choice([0, 1, 2, None]) for pid in CORRECTAS} for _ in range(n)]
+
+
+def _responder(client, envios, desde=0):
+    for i, respuestas in enumerate(envios, desde):
+        respuestas = {k: v for k, v in respuestas.items() if v is not None}
+        r = client.post("/ana-1/responder", params={"estudiante_id": f"est-{i}"}, json={"respuestas": respuestas})
+        assert r.status_code == 200, r.text
+
+
+def test_statistics_match_direct_computation(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    envios = _envios(200, 1)
+    _responder(client, envios)
+    r = client.get("/ana-1/analisis")
+    assert r.status_code == 200
+    resultado = r.json()
+    assert resultado["n"] == 200 and resultado["cuestionario_id"] == "ana-1"
+
+    aciertos = np.array([[e[pid] == c for pid, c in CORRECTAS.items()] for e in envios], dtype=float)
+    puntaje = aciertos.sum(axis=1)
+    assert resultado["media"] == pytest.approx(puntaje.mean())
+    for j, (pid, pregunta) in enumerate(zip(CORRECTAS, resultado["preguntas"])):
+        assert pregunta["pregunta_id"] == pid
+        assert pregunta["dificultad"] == pytest.approx(aciertos[:, j].mean())
+        resto = puntaje - aciertos[:, j]
+        assert pregunta["punto_biserial"] == pytest.approx(np.corrcoef(aciertos[:, j], resto)[0, 1])
+        # Distractores: cada elección se cuenta en su opción, en "otra" o en "sin respuesta"
+        elegidas = [e[pid] for e in envios]
+        for opcion in pregunta["opciones"]:
+            assert opcion["n"] == elegidas.count(opcion["opcion"])
+            assert opcion["correcta"] == (opcion["opcion"] == CORRECTAS[pid])
+        assert pregunta["sin_respuesta"] == elegidas.count(None)
+        assert pregunta["otra"] == sum(1 for v in elegidas if v is not None and v >= len(pregunta["opciones"]))
+        assert -1 <= pregunta["discriminacion"] <= 1
+
+
+def test_new_attempts_are_added_incrementally(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    antes = client.get("/ana-1/analisis").json()
+    analisis = evaluaciones.ANALISIS["ana-1"]
+    _responder(client, _envios(50, 2), desde=1000)
+    despues = client.get("/ana-1/analisis").json()
+    assert evaluaciones.ANALISIS["ana-1"] is analisis
+    assert despues["n"] == antes["n"] + 50
+    assert despues["ultimo_intento"] > antes["ultimo_intento"]
+
+    # El resultado incremental es el mismo que recalculando desde cero
+    nuevo = evaluaciones.AnalisisItems(evaluaciones.ANSWER_KEYS["ana-1"])
+    desde_cero = nuevo.ponerse_al_dia(lambda ultimo, limite: evaluaciones.intentos.desde("ana-1", ultimo, limite))
+    assert dict(desde_cero, cuestionario_id="ana-1") == despues
+
+
+def test_no_attempts_and_unknown_cuestionario(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    r = client.post("/evaluaciones", json=dict(CUESTIONARIO, id="ana-vacio"))
+    assert r.status_code == 200
+    resultado = client.get("/ana-vacio/analisis").json()
+    assert resultado["n"] == 0 and resultado["media"] is None and resultado["preguntas"] == []
+    assert client.get("/no-existe/analisis").status_code == 404
+
+
+def test_attempts_committed_out_of_order_are_not_skipped(evaluaciones, monkeypatch):
+    import analisis
+
+    visibles = {}
+
+    def leer(ultimo, limite):
+        return sorted((i, r) for i, r in visibles.items() if i > ultimo)[:limite]
+
+    monkeypatch.setattr(analisis, "ANALISIS_LOTE", 2)
+    monkeypatch.setattr(analisis, "ANALISIS_RELECTURA", 3)
+    items = evaluaciones.AnalisisItems(evaluaciones.ANSWER_KEYS["ana-1"])
+    visibles.update({1: CORRECTAS, 2: CORRECTAS, 4: CORRECTAS, 5: {}})
+    assert items.ponerse_al_dia(leer)["n"] == 4
+    # El 3 se confirma después que el 4 y el 5: se suma al releer, sin repetir los demás
+    visibles[3] = CORRECTAS
+    resultado = items.ponerse_al_dia(leer)
+    assert (resultado["n"], resultado["ultimo_intento"]) == (5, 5)
+    assert resultado["media"] == pytest.approx(12 / 5)
+    visibles[6] = {}
+    assert items.ponerse_al_dia(leer)["n"] == 6
+
+    # Pasado el margen ya no se relee lo anterior
+    monkeypatch.setattr(analisis, "ANALISIS_MARGEN", 0)
+    items.ponerse_al_dia(leer)
+    visibles[0] = CORRECTAS
+    assert items.ponerse_al_dia(leer)["n"] == 6
@@ -0,0 +1,137 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+# Preguntas cuya opción correcta es siempre el texto "ok", así se puede responder bien sin la clave
+PREGUNTAS = [
+    {
+        "id": f"b{i}", "curso_id": "curso1", "tema": "listas" if i < 8 else "bucles",
+        "dificultad": "facil" if i % 2 else "media", "texto": f"Pregunta {i}",
+        "opciones": ["no", "ok", "tampoco", "nunca"], "respuesta": 1,
+    }
+    for i in range(12)
+]
+
+
+@pytest.fixture(scope="module")
+def evaluaciones():
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+    client = TestClient(main.app)
+    r = client.post("/banco/preguntas", json=PREGUNTAS)
+    assert r.status_code == 200, r.text
+    r = client.post("/plantillas", json={
+        "id": "plant-1", "curso_id": "curso1", "titulo": "Parcial",
+        "secciones": [
+            {"tema": "listas", "dificultad": "facil", "cantidad": 3},
+            {"tema": "bucles", "dificultad": "media", "cantidad": 1},
+        ],
+    })
+    assert r.status_code == 200, r.text
+    return main
+
+
+def test_bank_search_and_duplicates(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    r = client.get("/banco/preguntas", params={"tema": "listas", "dificultad": "facil"})
+    assert [p["id"] for p in r.json()["preguntas"]] == ["b1", "b3", "b5", "b7"]
+    assert len(client.get("/banco/preguntas", params={"curso_id": "curso1"}).json()["preguntas"]) == 12
+    r = client.post("/banco/preguntas", json=[dict(PREGUNTAS[0], id="nueva"), PREGUNTAS[0]])
+    assert r.status_code == 400
+    # Nada se agrega si alguna está repetida
+    assert "nueva" not in [p["id"] for p in client.get("/banco/preguntas").json()["preguntas"]]
+
+
+def test_template_needs_enough_questions(evaluaciones):
+    r = TestClient(evaluaciones.app).post("/plantillas", json={
+        "id": "plant-grande", "curso_id": "curso1", "titulo": "Final",
+        "secciones": [{"tema": "bucles", "dificultad": "facil", "cantidad": 5}],
+    })
+    assert r.status_code == 400
+
+
+def test_exam_is_deterministic_per_student(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    examen = client.get("/plantillas/plant-1/examen", params={"estudiante_id": "est-1"}).json()
+    assert client.get("/plantillas/plant-1/examen", params={"estudiante_id": "est-1"}).json() == examen
+    assert len(examen["preguntas"]) == 4
+    assert all("respuesta" not in p for p in examen["preguntas"])
+    ids = [p["id"] for p in examen["preguntas"]]
+    assert len(set(ids)) == 4
+    assert {"b1", "b3", "b5", "b7"} >= set(ids[:3]) and ids[3] in {"b8", "b10"}
+    # Con varios estudiantes los exámenes no son todos iguales
+    otros = [
+        client.get("/plantillas/plant-1/examen", params={"estudiante_id": f"est-{i}"}).json()["preguntas"]
+        for i in range(2, 12)
+    ]
+    assert any(p != examen["preguntas"] for p in otros)
+
+
+def test_grading_rebuilds_key_from_seed(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    examen = client.get("/plantillas/plant-1/examen", params={"estudiante_id": "est-2"}).json()
+    # Se responde con el índice de la opción tal como se mostró
+    respuestas = {p["id"]: p["opciones"].index("ok") for p in examen["preguntas"]}
+    r = client.post("/plantillas/plant-1/responder", params={"estudiante_id": "est-2"}, json={"respuestas": respuestas})
+    assert r.status_code == 200, r.text
+    assert r.json()["correct"] == 4
+    mal = {pid: (i + 1) % 4 for pid, i in respuestas.items()}
+    r = client.post("/plantillas/plant-1/responder", params={"estudiante_id": "est-2"}, json={"respuestas": mal})
+    assert r.json()["correct"] == 0
+
+
+def test_batch_assembly_matches_single(evaluaciones):
+    plantilla = evaluaciones.PLANTILLAS["plant-1"]
+    estudiantes = [f"est-{i}" for i in range(50)]
+    elegidas, orden = plantilla.ensamblar(estudiantes)
+    for i, estudiante in enumerate(estudiantes):
+        uno = plantilla.examen(*plantilla.ensamblar_uno(estudiante))
+        assert plantilla.examen(elegidas[i], orden[i]) == uno
+
+
+def test_unknown_template_is_404(evaluaciones):
+    r = TestClient(evaluaciones.app).get("/plantillas/no-existe/examen", params={"estudiante_id": "est-1"})
+    assert r.status_code == 404
+
+
+def test_questions_that_cannot_be_graded_are_not_banked(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    r = client.post("/banco/preguntas", json=[dict(PREGUNTAS[0], id="enorme", opciones=[str(i) for i in range(70)])])
+    assert r.status_code == 400
+    assert "enorme" not in [p["id"] for p in client.get("/banco/preguntas").json()["preguntas"]]
+
+
+def test_repeated_questions_across_sections_are_422_when_grading(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    # Las dos secciones sacan las mismas dos preguntas: el examen repite ids
+    seccion = {"tema": "bucles", "dificultad": "facil", "cantidad": 2}
+    r = client.post("/plantillas", json={"id": "plant-doble", "curso_id": "curso1", "titulo": "Doble", "secciones": [seccion, seccion]})
+    assert r.status_code == 200, r.text
+    r = client.post("/plantillas/plant-doble/responder", params={"estudiante_id": "est-1"}, json={"respuestas": {}})
+    assert r.status_code == 422
+
+
+def test_templates_survive_a_restart(tmp_path):
+    url = f"sqlite:///{tmp_path / 'evaluaciones.db'}"
+    antes = cargar_servicio("services/evaluaciones", DATABASE_URL=url)
+    client = TestClient(antes.app)
+    assert client.post("/banco/preguntas", json=PREGUNTAS).status_code == 200
+    r = client.post("/plantillas", json={
+        "id": "plant-db", "curso_id": "curso1", "titulo": "Parcial",
+        "secciones": [{"tema": "listas", "dificultad": "facil", "cantidad": 3}],
+    })
+    assert r.status_code == 200, r.text
+    examen = client.get("/plantillas/plant-db/examen", params={"estudiante_id": "est-1"}).json()
+
+    # Otra réplica (o el mismo servicio reiniciado): mismo banco, misma plantilla y misma sal
+    despues = cargar_servicio("services/evaluaciones", DATABASE_URL=url)
+    assert despues.DB_DISPONIBLE and not despues.PLANTILLAS
+    client = TestClient(despues.app)
+    assert client.get("/plantillas/plant-db/examen", params={"estudiante_id": "est-1"}).json() == examen
+    respuestas = {p["id"]: p["opciones"].index("ok") for p in examen["preguntas"]}
+    r = client.post("/plantillas/plant-db/responder", params={"estudiante_id": "est-1"}, json={"respuestas": respuestas})
+    assert r.json()["correct"] == 3
+    assert client.post("/banco/preguntas", json=PREGUNTAS[:1]).status_code == 400
+    assert len(client.get("/banco/preguntas", params={"tema": "listas"}).json()["preguntas"]) == 8
+    r = client.post("/plantillas", json={"id": "plant-db", "curso_id": "curso1", "titulo": "Otra", "secciones": []})
+    assert r.status_code == 400
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+CUESTIONARIO = {
+    "id": "lote-1", "curso_id": "curso1", "titulo": "Lote", "tipo": "quiz", "puntos_totales": 3,
+    "preguntas": [
+        {"id": "p1", "tipo": "opcion", "opciones": ["a", "b"], "respuesta": 1},
+        {"id": "p2", "tipo": "opcion", "opciones": ["a", "b"], "respuesta": 0, "puntos": 2},
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def evaluaciones():
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+    r = TestClient(main.app).post("/evaluaciones", json=CUESTIONARIO)
+    assert r.status_code == 200, r.text
+    return main
+
+
+def _lineas(r):
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(linea) for linea in r.text.splitlines()]
+
+
+def test_json_array_streams_results_and_summary(evaluaciones):
+    envios = [
+        {"estudiante_id": "u1", "respuestas": {"p1": 1, "p2": 0}},
+        {"estudiante_id": "u2", "respuestas": {"p1": 1}},
+        {"estudiante_id": "u3", "respuestas": {}},
+    ]
+    *filas, resumen = _lineas(TestClient(evaluaciones.app).post("/lote-1/responder/batch", json=envios))
+    assert filas == [
+        {"estudiante_id": "u1", "score": 100.0, "correct": 2, "total": 2, "puntos": 3.0},
+        {"estudiante_id": "u2", "score": pytest.approx(100 / 3), "correct": 1, "total": 2, "puntos": 1.0},
+        {"estudiante_id": "u3", "score": 0.0, "correct": 0, "total": 2, "puntos": 0.0},
+    ]
+    resumen = resumen["resumen"]
+    assert resumen["n"] == 3
+    assert resumen["media"] == pytest.approx((100 + 100 / 3) / 3)
+    assert sum(t["n"] for t in resumen["histograma"]) == 3
+    assert resumen["histograma"][-1]["n"] == 1
+    assert [d["aciertos"] for d in resumen["dificultad"]] == [2, 1]
+
+
+def test_malformed_rows_are_reported_per_line(evaluaciones):
+    cuerpo = b"\n".join([
+        b'{"estudiante_id": "u1", "respuestas": {"p1": 1}}',
+        b"{no es json",
+        b'["u2"]',
+        b'{"estudiante_id": "u3", "respuestas": [1, 0]}',
+        b'{"estudiante_id": "u4", "respuestas": "p1=1"}',
+        b'{"estudiante_id": "u5", "respuestas": {"p1": 100000000000000000000000}}',
+        b'{"estudiante_id": "u6", "respuestas": null}',
+    ])
+    r = TestClient(evaluaciones.app).post(
+        "/lote-1/responder/batch", content=cuerpo, headers={"Content-Type": "application/x-ndjson"}
+    )
+    lineas = _lineas(r)
+    errores = {l["fila"]: l["error"] for l in lineas if "error" in l}
+    assert sorted(errores) == [1, 2, 3, 4]
+    assert "JSON inválido" in errores[1]
+    assert "respuestas" in errores[3] and "respuestas" in errores[4]
+    assert [l["estudiante_id"] for l in lineas if "estudiante_id" in l] == ["u1", "u5", "u6"]
+    assert lineas[-1]["resumen"]["n"] == 3
+
+
+def test_empty_batch_only_returns_summary(evaluaciones):
+    lineas = _lineas(TestClient(evaluaciones.app).post("/lote-1/responder/batch", json=[]))
+    assert lineas == [{"resumen": lineas[0]["resumen"]}]
+    assert lineas[0]["resumen"]["n"] == 0
+
+
+def test_unknown_cuestionario_is_404(evaluaciones):
+    r = TestClient(evaluaciones.app).post("/no-existe/responder/batch", json=[])
+    assert r.status_code == 404
+
+
+def test_process_pool_keeps_order(evaluaciones, monkeypatch):
+    # Un cuestionario de una sola pregunta: su clave también tiene que poder enviarse a otro proceso
+    client = TestClient(evaluaciones.app)
+    r = client.post("/evaluaciones", json={
+        "id": "lote-2", "curso_id": "curso1", "titulo": "Una pregunta", "tipo": "quiz", "puntos_totales": 1,
+        "preguntas": [{"id": "p1", "tipo": "opcion", "opciones": ["a", "b"], "respuesta": 1}],
+    })
+    assert r.status_code == 200, r.text
+    monkeypatch.setattr(evaluaciones, "BATCH_CHUNK_SIZE", 3)
+    monkeypatch.setattr(evaluaciones, "BATCH_POOL_MIN", 2)
+    monkeypatch.setattr(evaluaciones.os, "cpu_count", lambda: 2)
+    envios = [{"estudiante_id": f"u{i}", "respuestas": {"p1": i % 2}} for i in range(10)] + [[]]
+    try:
+        *filas, resumen = _lineas(client.post("/lote-2/responder/batch", json=envios))
+    finally:
+        if evaluaciones._process_pool is not None:
+            evaluaciones._process_pool.shutdown()
+            evaluaciones._process_pool = None
+    assert [f for f in filas if "estudiante_id" in f] == [
+        {"estudiante_id": f"u{i}", "score": 100.0 * (i % 2), "correct": i % 2, "total": 1, "puntos": float(i % 2)}
+        for i in range(10)
+    ]
+    assert [f for f in filas if "error" in f] == [{"fila": 10, "error": "Cada envío debe ser un objeto JSON"}]
+    assert resumen["resumen"]["n"] == 10
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+PREGUNTA = {"id": "p1", "tipo": "opcion", "opciones": ["a", "b"], "respuesta": 1}
+
+
+def _cuestionario(id, preguntas=(PREGUNTA,)):
+    return {"id": id, "curso_id": "curso1", "titulo": id, "tipo": "quiz", "puntos_totales": 1, "preguntas": list(preguntas)}
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def evaluaciones(request, tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('bulk') / 'evaluaciones.db'}" if request.param == "sql" else SIN_DB
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=url)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    return main
+
+
+def test_invalid_rows_are_reported_and_the_rest_created(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    filas = [
+        _cuestionario("bulk-1"),
+        _cuestionario("bulk-2", [PREGUNTA, dict(PREGUNTA, texto="repetida")]),
+        _cuestionario("bulk-3", [{"tipo": "opcion", "respuesta": 0}]),
+        {"id": "bulk-4", "titulo": "sin campos"},
+        _cuestionario("bulk-1"),
+        _cuestionario("c1"),
+        _cuestionario("bulk-5", [PREGUNTA, dict(PREGUNTA, id="p2")]),
+    ]
+    r = client.post("/evaluaciones/bulk", json=filas)
+    assert r.status_code == 200, r.text
+    resumen = r.json()
+    assert (resumen["total"], resumen["creados"], resumen["errores"]) == (7, 2, 5)
+    estados = [(f["fila"], f["status"]) for f in resumen["resultados"]]
+    assert estados == [
+        (0, "creado"), (1, "invalido"), (2, "invalido"), (3, "invalido"), (4, "duplicado"), (5, "duplicado"), (6, "creado"),
+    ]
+    assert "p1" in resumen["resultados"][1]["error"]
+    assert client.get("/bulk-1").status_code == 200
+    assert [p["id"] for p in client.get("/bulk-5").json()["preguntas"]] == ["p1", "p2"]
+    assert client.get("/bulk-2").status_code == 404
+    assert client.post("/bulk-5/responder", json={"respuestas": {"p1": 1, "p2": 1}}).json()["correct"] == 2
+
+
+@pytest.mark.parametrize("campo, valor", [("puntos", None), ("opciones", 5)])
+def test_malformed_question_fields_are_row_errors(evaluaciones, campo, valor):
+    client = TestClient(evaluaciones.app)
+    id_malo, id_bueno = f"mal-{campo}", f"bien-{campo}"
+    r = client.post("/evaluaciones/bulk", json=[_cuestionario(id_malo, [dict(PREGUNTA, **{campo: valor})]), _cuestionario(id_bueno)])
+    assert r.status_code == 200, r.text
+    resumen = r.json()
+    assert (resumen["creados"], resumen["errores"]) == (1, 1)
+    assert [(f["fila"], f["status"]) for f in resumen["resultados"]] == [(0, "invalido"), (1, "creado")]
+    assert client.get(f"/{id_malo}").status_code == 404
+    assert client.get(f"/{id_bueno}").status_code == 200
+
+
+def test_ndjson_with_malformed_lines(evaluaciones):
+    cuerpo = "\n".join([json.dumps(_cuestionario("nd-1")), "{roto", "[1, 2]", "", json.dumps(_cuestionario("nd-2"))])
+    r = TestClient(evaluaciones.app).post(
+        "/evaluaciones/bulk", content=cuerpo, headers={"Content-Type": "application/x-ndjson"}
+    )
+    resumen = r.json()
+    assert (resumen["total"], resumen["creados"], resumen["errores"]) == (4, 2, 2)
+    assert "JSON inválido" in resumen["resultados"][1]["error"]
+
+
+def test_atomic_writes_nothing_on_error(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    filas = [_cuestionario("at-1"), _cuestionario("at-2", [PREGUNTA, PREGUNTA])]
+    r = client.post("/evaluaciones/bulk", params={"atomic": "true"}, json=filas)
+    assert r.status_code == 400
+    assert r.json()["creados"] == 0
+    assert client.get("/at-1").status_code == 404
+    r = client.post("/evaluaciones/bulk", params={"atomic": "true"}, json=filas[:1])
+    assert r.status_code == 200 and r.json()["creados"] == 1
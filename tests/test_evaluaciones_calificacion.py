@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+CUESTIONARIO = {
+    "id": "calif-1", "curso_id": "curso1", "titulo": "Calificación", "tipo": "quiz", "puntos_totales": 6,
+    "preguntas": [
+        {"id": "p1", "tipo": "opcion", "opciones": ["a", "b", "c"], "respuesta": 1},
+        {"id": "p2", "tipo": "multiple", "opciones": ["a", "b", "c", "d"], "respuesta": [0, 2], "puntos": 2},
+        {"id": "p3", "tipo": "abierta", "respuesta": ["Madrid", "madrid"], "puntos": 3},
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def evaluaciones():
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+    r = TestClient(main.app).post("/evaluaciones", json=CUESTIONARIO)
+    assert r.status_code == 200, r.text
+    return main
+
+
+def _responder(evaluaciones, respuestas):
+    r = TestClient(evaluaciones.app).post("/calif-1/responder", json={"respuestas": respuestas})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_weighted_points_and_multiple_choice(evaluaciones):
+    r = _responder(evaluaciones, {"p1": 1, "p2": [2, 0], "p3": "madrid"})
+    assert r == {"score": 100.0, "correct": 3, "total": 3, "puntos": 6.0, "puntos_max": 6.0}
+    # En selección múltiple hay que marcar exactamente las correctas
+    r = _responder(evaluaciones, {"p1": 1, "p2": [0], "p3": "Sevilla"})
+    assert (r["correct"], r["puntos"]) == (1, 1.0)
+    r = _responder(evaluaciones, {"p2": [0, 1, 2]})
+    assert r["correct"] == 0
+
+
+def test_fast_path_matches_row_path(evaluaciones):
+    key = evaluaciones.ANSWER_KEYS["calif-1"]
+    envios = [{"p1": i % 3, "p2": i % 4, "p3": i} for i in range(50)] + [{"p1": 1}, {}]
+    puntos, correctas, _ = key.grade_matrix(*key.encode_many(envios))
+    for envio, p, c in zip(envios, puntos, correctas):
+        r = key.grade(envio)
+        assert (r["puntos"], r["correct"]) == (p, c)
+
+
+@pytest.mark.parametrize("valor", [2 ** 63, 2 ** 70, -(2 ** 63) - 1, "1", 1.0, True, [1], None])
+def test_unexpected_answers_are_graded_not_rejected(evaluaciones, valor):
+    r = _responder(evaluaciones, {"p1": valor, "p2": [None, 2 ** 70], "p3": 0})
+    assert r["total"] == 3
+    assert r["correct"] in (0, 1)
+
+
+def test_questions_with_more_options_than_the_key_holds_are_rejected(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    grande = dict(CUESTIONARIO, id="calif-300", preguntas=[
+        {"id": "p1", "tipo": "opcion", "opciones": [str(i) for i in range(300)], "respuesta": 3},
+    ])
+    assert client.post("/evaluaciones", json=grande).status_code == 400
+    assert "calif-300" not in evaluaciones.ANSWER_KEYS
+
+    # Con el máximo admitido, respuestas fuera de rango son incorrectas: ni se confunden con otra ni fallan
+    limite = dict(grande, id="calif-63", preguntas=[dict(grande["preguntas"][0], opciones=[str(i) for i in range(63)])])
+    assert client.post("/evaluaciones", json=limite).status_code == 200
+    for valor, correct in [(3, 1), (62, 0), (70, 0), (259, 0)]:
+        r = client.post("/calif-63/responder", json={"respuestas": {"p1": valor}})
+        assert r.status_code == 200, r.text
+        assert r.json()["correct"] == correct
+    r = client.post("/calif-63/responder/batch", json=[{"estudiante_id": "e1", "respuestas": {"p1": v}} for v in (3, 70, 259)])
+    assert r.status_code == 200
+    assert [json.loads(linea).get("correct") for linea in r.text.splitlines()[:3]] == [1, 0, 0]
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+
+def _cuestionario(id, preguntas, titulo="Cuestionario"):
+    return {"id": id, "curso_id": "curso1", "titulo": titulo, "tipo": "quiz", "puntos_totales": 1, "preguntas": preguntas}
+
+
+PREGUNTA = {"id": "p1", "tipo": "opcion", "opciones": ["a", "b"], "respuesta": 1}
+
+
+@pytest.fixture(scope="module")
+def base_de_datos(tmp_path_factory):
+    return f"sqlite:///{tmp_path_factory.mktemp('cuestionarios') / 'evaluaciones.db'}"
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def evaluaciones(request, base_de_datos):
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=base_de_datos if request.param == "sql" else SIN_DB)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    return main
+
+
+@pytest.mark.parametrize("preguntas", [
+    [PREGUNTA, dict(PREGUNTA, texto="otra")],
+    [PREGUNTA, {"tipo": "opcion", "respuesta": 0}],
+    [PREGUNTA, dict(PREGUNTA, id="")],
+    [PREGUNTA, "p2"],
+])
+def test_question_ids_must_be_present_and_unique(evaluaciones, preguntas):
+    client = TestClient(evaluaciones.app)
+    r = client.post("/evaluaciones", json=_cuestionario("ids-mal", preguntas))
+    assert r.status_code == 400, r.text
+    assert client.get("/ids-mal").status_code == 404
+
+    assert client.post("/evaluaciones", json=_cuestionario("ids-bien", [PREGUNTA])).status_code in (200, 400)
+    r = client.put("/ids-bien", json=_cuestionario("ids-bien", preguntas))
+    assert r.status_code == 400, r.text
+    # El cuestionario anterior sigue intacto
+    assert [p["id"] for p in client.get("/ids-bien").json()["preguntas"]] == ["p1"]
+
+
+@pytest.mark.parametrize("pregunta", [
+    dict(PREGUNTA, puntos=None), dict(PREGUNTA, puntos="mucho"), dict(PREGUNTA, puntos=float("inf")),
+    dict(PREGUNTA, opciones=5), dict(PREGUNTA, opciones="ab"),
+])
+def test_malformed_points_and_options_are_rejected(evaluaciones, pregunta):
+    client = TestClient(evaluaciones.app)
+    r = client.post("/evaluaciones", content=json.dumps(_cuestionario("campos-mal", [pregunta])), headers={"Content-Type": "application/json"})
+    assert r.status_code == 400, r.text
+    assert client.get("/campos-mal").status_code == 404
+
+
+def test_replicas_pick_up_updates_from_each_other(base_de_datos):
+    una = cargar_servicio("services/evaluaciones", DATABASE_URL=base_de_datos, CUESTIONARIOS_TTL="0")
+    otra = cargar_servicio("services/evaluaciones", DATABASE_URL=base_de_datos, CUESTIONARIOS_TTL="0")
+    a, b = TestClient(una.app), TestClient(otra.app)
+
+    assert a.post("/evaluaciones", json=_cuestionario("compartido", [PREGUNTA])).status_code == 200
+    assert b.post("/compartido/responder", json={"respuestas": {"p1": 1}}).json()["correct"] == 1
+    etag = b.get("/compartido").headers["ETag"]
+
+    # Solo cambian las preguntas: la otra réplica tiene que ver la clave nueva
+    r = a.put("/compartido", json=_cuestionario("compartido", [dict(PREGUNTA, respuesta=0, texto="¿Cuál?")]))
+    assert r.status_code == 200, r.text
+    assert b.post("/compartido/responder", json={"respuestas": {"p1": 1}}).json()["correct"] == 0
+    r = b.get("/compartido", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["preguntas"][0]["texto"] == "¿Cuál?"
+
+    # Sin cambios no se vuelve a compilar
+    clave = otra.ANSWER_KEYS["compartido"]
+    b.post("/compartido/responder", json={"respuestas": {"p1": 0}})
+    assert otra.ANSWER_KEYS["compartido"] is clave
+
+
+def test_recent_copy_is_served_within_ttl(base_de_datos):
+    una = cargar_servicio("services/evaluaciones", DATABASE_URL=base_de_datos, CUESTIONARIOS_TTL="0")
+    otra = cargar_servicio("services/evaluaciones", DATABASE_URL=base_de_datos, CUESTIONARIOS_TTL="3600")
+    a, b = TestClient(una.app), TestClient(otra.app)
+    assert a.post("/evaluaciones", json=_cuestionario("con-ttl", [PREGUNTA], titulo="Antes")).status_code == 200
+    assert b.get("/con-ttl").json()["titulo"] == "Antes"
+    assert a.put("/con-ttl", json=_cuestionario("con-ttl", [PREGUNTA], titulo="Después")).status_code == 200
+    assert b.get("/con-ttl").json()["titulo"] == "Antes"
+    otra.CUESTIONARIOS_TTL = 0
+    assert b.get("/con-ttl").json()["titulo"] == "Después"
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+
+@pytest.fixture(scope="module")
+def evaluaciones(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('evaluaciones') / 'evaluaciones.db'}"
+    return cargar_servicio("services/evaluaciones", DATABASE_URL=url)
+
+
+@pytest.fixture(scope="module")
+def evaluaciones_memoria():
+    return cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+
+
+def _responder(client, estudiante_id, respuesta):
+    r = client.post(f"/c1/responder?estudiante_id={estudiante_id}", json={"respuestas": {"p1": respuesta}})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+@pytest.mark.parametrize("servicio", ["evaluaciones", "evaluaciones_memoria"])
+def test_best_attempt(servicio, request):
+    main = request.getfixturevalue(servicio)
+    assert main.DB_DISPONIBLE == (servicio == "evaluaciones")
+    client = TestClient(main.app)
+    _responder(client, "est-1", 0)
+    _responder(client, "est-1", 1)
+    _responder(client, "est-1", 1)
+    _responder(client, "est-2", 0)
+
+    r = client.get("/c1/estudiantes/est-1/mejor-intento")
+    assert r.status_code == 200
+    mejor = r.json()
+    assert (mejor["score"], mejor["respuestas"]) == (100.0, {"p1": 1})
+    # Con empate gana el más antiguo
+    segundo = client.get("/c1/estudiantes/est-1/mejor-intento").json()
+    assert segundo["id"] == mejor["id"]
+    assert client.get("/c1/estudiantes/est-2/mejor-intento").json()["score"] == 0.0
+    assert client.get("/c1/estudiantes/nadie/mejor-intento").status_code == 404
+
+
+def test_overlong_student_id_is_rejected(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    r = client.post(f"/c1/responder?estudiante_id={'x' * 65}", json={"respuestas": {"p1": 1}})
+    assert r.status_code == 422
+    r = client.post(f"/c1/responder/async?estudiante_id={'x' * 65}", json={"respuestas": {"p1": 1}})
+    assert r.status_code == 422
+
+
+def test_rejected_row_does_not_block_the_writer(evaluaciones):
+    intentos = evaluaciones.intentos
+    fila = evaluaciones.nuevo_intento("c1", "est-3", {"score": 50.0, "correct": 1, "total": 2, "puntos": 1.0}, {})
+    # Una fila que la base de datos rechaza (score NOT NULL) entre dos válidas
+    intentos.guardar(fila)
+    intentos.guardar(dict(fila, score=None))
+    intentos.guardar(dict(fila, score=75.0))
+    inicio = time.monotonic()
+    assert intentos.flush()
+    assert time.monotonic() - inicio < 2
+    assert intentos.mejor("c1", "est-3")["score"] == 75.0
+    # El escritor sigue aceptando intentos después del descarte
+    _responder(TestClient(evaluaciones.app), "est-3", 1)
+    assert intentos.mejor("c1", "est-3")["score"] == 100.0
+
+
+def test_flush_gives_up_when_the_queue_is_full(evaluaciones, monkeypatch):
+    import intentos
+
+    soltar, bloqueado = threading.Event(), threading.Event()
+
+    def sesion_lenta():
+        # El escritor se queda parado en su primer lote hasta que el test lo suelte
+        if not bloqueado.is_set():
+            bloqueado.set()
+            soltar.wait(5)
+        return evaluaciones.SessionLocal()
+
+    monkeypatch.setattr(intentos, "INTENTOS_QUEUE_MAX", 1)
+    store = intentos.SqlIntentoStore(sesion_lenta, intervalo=0)
+    fila = evaluaciones.nuevo_intento("c1", "est-4", {"score": 10.0, "correct": 0, "total": 1, "puntos": 0.0}, {})
+    store.guardar(fila)
+    assert bloqueado.wait(2)
+    store.guardar(dict(fila, score=20.0))
+    inicio = time.monotonic()
+    assert store.flush(timeout=0.2) is False
+    assert time.monotonic() - inicio < 1
+    soltar.set()
+    assert store.flush()
+    assert store.mejor("c1", "est-4")["score"] == 20.0
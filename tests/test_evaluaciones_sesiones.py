@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+CUESTIONARIO = {
+    "id": "ses-1", "curso_id": "curso1", "titulo": "Con tiempo", "tipo": "examen", "puntos_totales": 1,
+    "duracion_minutos": 30,
+    "preguntas": [{"id": "p1", "tipo": "opcion", "opciones": ["a", "b"], "respuesta": 1}],
+}
+
+
+@pytest.fixture(scope="module")
+def evaluaciones():
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+    r = TestClient(main.app).post("/evaluaciones", json=CUESTIONARIO)
+    assert r.status_code == 200, r.text
+    return main
+
+
+def _iniciar(client, estudiante_id):
+    r = client.post("/ses-1/sesiones", params={"estudiante_id": estudiante_id})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_submit_grades_once(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    sesion = _iniciar(client, "est-1")
+    assert sesion["estado"] == "abierta"
+    assert sesion["limite"] == pytest.approx(sesion["inicio"] + 30 * 60)
+    assert 0 < sesion["restante_segundos"] <= 30 * 60
+    # Con una sesión abierta se devuelve la misma
+    assert _iniciar(client, "est-1")["id"] == sesion["id"]
+
+    r = client.put(f"/sesiones/{sesion['id']}/respuestas", json={"respuestas": {"p1": 1}})
+    assert r.status_code == 200
+    r = client.post(f"/sesiones/{sesion['id']}/entregar", json={})
+    assert r.status_code == 200
+    entregada = r.json()
+    assert entregada["estado"] == "entregada"
+    assert entregada["resultado"]["score"] == 100.0
+    assert entregada["restante_segundos"] is None
+    # La entrega cancela su vencimiento
+    assert sesion["id"] not in evaluaciones.temporizador._programados
+
+    assert client.post(f"/sesiones/{sesion['id']}/entregar", json={}).status_code == 409
+    assert client.put(f"/sesiones/{sesion['id']}/respuestas", json={"respuestas": {}}).status_code == 409
+    # Cerrada la anterior, iniciar da una sesión nueva
+    assert _iniciar(client, "est-1")["id"] != sesion["id"]
+
+
+def test_expired_session_is_submitted_with_saved_answers(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    sesion = _iniciar(client, "est-2")
+    client.put(f"/sesiones/{sesion['id']}/respuestas", json={"respuestas": {"p1": 0}})
+    # Se adelanta el vencimiento: el temporizador la entrega sola
+    evaluaciones.temporizador.programar(time.time(), sesion["id"])
+    for _ in range(200):
+        estado = client.get(f"/sesiones/{sesion['id']}").json()
+        if estado["estado"] != "abierta":
+            break
+        time.sleep(0.01)
+    assert estado["estado"] == "expirada"
+    assert estado["resultado"]["score"] == 0.0
+    assert client.post(f"/sesiones/{sesion['id']}/entregar", json={"respuestas": {"p1": 1}}).status_code == 409
+
+
+def test_unknown_session_and_cuestionario(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    assert client.get("/sesiones/no-existe").status_code == 404
+    assert client.post("/no-existe/sesiones", params={"estudiante_id": "est-1"}).status_code == 404
+
+
+def test_timer_fires_in_order_and_skips_cancelled(evaluaciones):
+    vencidas = []
+    listo = threading.Event()
+
+    def al_vencer(sesion_id):
+        vencidas.append(sesion_id)
+        if sesion_id == "c":
+            listo.set()
+
+    temporizador = evaluaciones.TemporizadorSesiones(al_vencer)
+    ahora = time.time()
+    temporizador.programar(ahora + 0.15, "c")
+    temporizador.programar(ahora + 0.05, "a")
+    temporizador.programar(ahora + 0.10, "b")
+    temporizador.programar(ahora + 0.08, "cancelada")
+    temporizador.cancelar("cancelada")
+    assert len(temporizador) == 3
+    assert listo.wait(2)
+    assert vencidas == ["a", "b", "c"]
+    assert len(temporizador) == 0
+
+
+def test_redis_store_shares_sessions_between_replicas(evaluaciones):
+    fakeredis = pytest.importorskip("fakeredis")
+    import sesiones
+
+    servidor = fakeredis.FakeServer()
+    una = sesiones.RedisSesionStore(fakeredis.FakeRedis(server=servidor))
+    otra = sesiones.RedisSesionStore(fakeredis.FakeRedis(server=servidor))
+
+    sesion = una.crear(sesiones.nueva_sesion("ses-1", "est-1", 30))
+    assert otra.crear(sesiones.nueva_sesion("ses-1", "est-1", 30))["id"] == sesion["id"]
+    assert [sid for _, sid in otra.pendientes()] == [sesion["id"]]
+    assert otra.guardar_respuestas(sesion["id"], {"p1": 1})
+    assert una.obtener(sesion["id"])["respuestas"] == {"p1": 1}
+    # Solo una réplica gana el cierre
+    assert una.cerrar(sesion["id"], "entregada")["estado"] == "entregada"
+    assert otra.cerrar(sesion["id"], "expirada") is None
+    assert not otra.guardar_respuestas(sesion["id"], {"p1": 0})
+    una.completar(sesion["id"], {"score": 100.0})
+    assert otra.obtener(sesion["id"])["resultado"] == {"score": 100.0}
+    assert otra.pendientes() == []
+
+
+def test_expired_sessions_of_a_dead_replica_are_claimed_once(evaluaciones):
+    fakeredis = pytest.importorskip("fakeredis")
+    import sesiones
+
+    servidor = fakeredis.FakeServer()
+    caida = sesiones.RedisSesionStore(fakeredis.FakeRedis(server=servidor))
+    una = sesiones.RedisSesionStore(fakeredis.FakeRedis(server=servidor))
+    otra = sesiones.RedisSesionStore(fakeredis.FakeRedis(server=servidor))
+    vencida = caida.crear(dict(sesiones.nueva_sesion("ses-1", "est-1", 30), limite=time.time() - 60))
+    abierta = caida.crear(sesiones.nueva_sesion("ses-1", "est-2", 30))
+    cerrada = caida.crear(dict(sesiones.nueva_sesion("ses-1", "est-3", 30), limite=time.time() - 60))
+    caida.cerrar(cerrada["id"], "entregada")
+    redis = fakeredis.FakeRedis(server=servidor)
+    # Una entrada que quedó en el sorted set de una sesión ya cerrada se limpia al reclamar
+    redis.zadd(sesiones.LIMITES_KEY, {cerrada["id"]: time.time() - 60})
+
+    ahora = time.time()
+    assert una.reclamar_vencidas(ahora) == [vencida["id"]]
+    # Reservada: otra réplica no la reclama mientras dura el plazo, sí cuando vence
+    assert otra.reclamar_vencidas(ahora) == []
+    assert otra.reclamar_vencidas(ahora + sesiones.SESION_BARRIDO + 1) == [vencida["id"]]
+    assert [sid for _, sid in una.pendientes()] == [vencida["id"], abierta["id"]]
+    assert una.cerrar(vencida["id"], "expirada")["estado"] == "expirada"
+    assert otra.reclamar_vencidas(ahora + 3 * sesiones.SESION_BARRIDO) == []
+
+    # La clave de la sesión activa caduca
+    assert 0 < redis.ttl(f"{sesiones.PREFIJO}activa:ses-1:est-2") <= sesiones.SESION_TTL
+
+
+def test_sweeper_submits_sessions_no_timer_has(evaluaciones, monkeypatch):
+    client = TestClient(evaluaciones.app)
+    sesion = _iniciar(client, "est-barrido")
+    # Como si la hubiera creado una réplica caída: ningún temporizador la tiene
+    evaluaciones.temporizador.cancelar(sesion["id"])
+    reclamos = iter([[sesion["id"]], []])
+    monkeypatch.setattr(evaluaciones.sesiones, "reclamar_vencidas", lambda ahora: next(reclamos, []))
+    monkeypatch.setattr(evaluaciones, "SESION_BARRIDO", 0.01)
+    threading.Thread(target=evaluaciones._barrer_vencidas, daemon=True).start()
+    for _ in range(200):
+        estado = client.get(f"/sesiones/{sesion['id']}").json()
+        if estado["estado"] != "abierta":
+            break
+        time.sleep(0.01)
+    assert estado["estado"] == "expirada"
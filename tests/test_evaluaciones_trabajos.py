@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+
+@pytest.fixture(scope="module")
+def evaluaciones():
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+    yield main
+    if main.trabajos._pool is not None:
+        main.trabajos._pool.shutdown()
+
+
+def test_async_submission_is_graded_in_the_pool(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    r = client.post("/c1/responder/async", params={"estudiante_id": "est-async"}, json={"respuestas": {"p1": 1}})
+    assert r.status_code == 202
+    trabajo = r.json()
+    assert trabajo["estado"] == "pendiente" and "respuestas" not in trabajo
+
+    r = client.get(f"/trabajos/{trabajo['id']}", params={"espera": 10})
+    assert r.status_code == 200
+    terminado = r.json()
+    assert terminado["estado"] == "completado"
+    assert terminado["resultado"]["score"] == 100.0
+    assert terminado["terminado_en"] >= terminado["creado_en"]
+    # El resultado queda también como intento del estudiante
+    assert client.get("/c1/estudiantes/est-async/mejor-intento").json()["score"] == 100.0
+
+
+def test_unknown_job_and_cuestionario(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    assert client.get("/trabajos/no-existe").status_code == 404
+    assert client.get("/trabajos/no-existe", params={"espera": 0.1}).status_code == 404
+    assert client.post("/no-existe/responder/async", json={"respuestas": {}}).status_code == 404
+
+
+def test_redis_queue_round_trip(evaluaciones):
+    fakeredis = pytest.importorskip("fakeredis")
+    import trabajos
+
+    servidor = fakeredis.FakeServer()
+    api = trabajos.RedisTrabajoStore(fakeredis.FakeRedis(server=servidor))
+    worker = trabajos.RedisTrabajoStore(fakeredis.FakeRedis(server=servidor))
+
+    trabajo = api.encolar(trabajos.nuevo_trabajo("c1", "est-1", {"p1": 1}))
+    assert api.obtener(trabajo["id"])["estado"] == "pendiente"
+    assert api.esperar(trabajo["id"], 0.05)["estado"] == "pendiente"
+
+    # Un worker que muere a mitad deja el trabajo en su lista; al reiniciar vuelve a la cola
+    assert worker.tomar("w1", timeout=1)["estado"] == "en_curso"
+    assert worker.recuperar("w1") == 1
+    tomado = worker.tomar("w1", timeout=1)
+    assert tomado["id"] == trabajo["id"]
+
+    esperado = {}
+    hilo = threading.Thread(target=lambda: esperado.update(api.esperar(trabajo["id"], 5)))
+    hilo.start()
+    key = evaluaciones.ANSWER_KEYS["c1"]
+    worker.terminar("w1", tomado, resultado=trabajos.calificar_envio(key, tomado["respuestas"]))
+    hilo.join(5)
+    assert esperado["estado"] == "completado"
+    assert esperado["resultado"]["score"] == 100.0
+    assert worker.recuperar("w1") == 0
+    assert worker.tomar("w1", timeout=0.1) is None
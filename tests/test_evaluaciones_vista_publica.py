@@ -0,0 +1,66 @@
+from email.utils import formatdate
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+CUESTIONARIO = {
+    "id": "vista-1", "curso_id": "curso1", "titulo": "Vista pública", "tipo": "quiz", "puntos_totales": 1,
+    "preguntas": [{"id": "p1", "tipo": "opcion", "texto": "¿2+2?", "opciones": ["3", "4"], "respuesta": 1}],
+}
+
+
+@pytest.fixture(scope="module")
+def evaluaciones():
+    main = cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+    r = TestClient(main.app).post("/evaluaciones", json=CUESTIONARIO)
+    assert r.status_code == 200, r.text
+    return main
+
+
+def test_view_has_no_answers(evaluaciones):
+    r = TestClient(evaluaciones.app).get("/vista-1")
+    assert r.status_code == 200
+    assert r.json() == {
+        "id": "vista-1", "titulo": "Vista pública",
+        "preguntas": [{"id": "p1", "tipo": "opcion", "texto": "¿2+2?", "opciones": ["3", "4"]}],
+    }
+    assert "respuesta" not in r.text
+    assert r.headers["Cache-Control"] == "no-cache"
+
+
+def test_served_bytes_are_built_once(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    vista = evaluaciones.PUBLIC_VIEWS["vista-1"]
+    assert client.get("/vista-1").content == vista.body
+    assert evaluaciones.PUBLIC_VIEWS["vista-1"] is vista
+
+
+def test_conditional_requests(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    r = client.get("/vista-1")
+    etag = r.headers["ETag"]
+    assert client.get("/vista-1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/vista-1", headers={"If-None-Match": '"otro"'}).status_code == 200
+    assert client.get("/vista-1", headers={"If-Modified-Since": r.headers["Last-Modified"]}).status_code == 304
+    antes = formatdate(evaluaciones.PUBLIC_VIEWS["vista-1"].modified_at - 60, usegmt=True)
+    assert client.get("/vista-1", headers={"If-Modified-Since": antes}).status_code == 200
+    # If-None-Match manda sobre If-Modified-Since
+    r = client.get("/vista-1", headers={"If-None-Match": '"otro"', "If-Modified-Since": r.headers["Last-Modified"]})
+    assert r.status_code == 200
+
+
+def test_update_rebuilds_view(evaluaciones):
+    client = TestClient(evaluaciones.app)
+    etag = client.get("/vista-1").headers["ETag"]
+    r = client.put("/vista-1", json=dict(CUESTIONARIO, titulo="Vista renombrada"))
+    assert r.status_code == 200, r.text
+    r = client.get("/vista-1", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["titulo"] == "Vista renombrada"
+    assert r.headers["ETag"] != etag
+
+
+def test_missing_cuestionario_is_404(evaluaciones):
+    assert TestClient(evaluaciones.app).get("/no-existe").status_code == 404
@@ -0,0 +1,104 @@
+import contextlib
+
+import pytest
+import requests
+
+from conftest import SIN_DB, cargar_servicio, servidor
+
+
+class _Espia:
+    """Delegado de `requests` que anota las URLs que pide el frontend."""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(("GET", url, kwargs.get("params")))
+        return requests.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        self.urls.append(("POST", url, kwargs.get("params")))
+        return requests.post(url, **kwargs)
+
+    def __getattr__(self, nombre):
+        return getattr(requests, nombre)
+
+    def a_progreso(self):
+        return [(m, u.split("/api/v1/progreso/", 1)[1], p) for m, u, p in self.urls if "/api/v1/progreso/" in u]
+
+
+@pytest.fixture(scope="module")
+def pila(tmp_path_factory):
+    """Cursos, progreso (en memoria) y el gateway sirviendo; el frontend apunta al gateway."""
+    with contextlib.ExitStack() as pila:
+        cursos = pila.enter_context(servidor(cargar_servicio("services/cursos").app))
+        progreso = cargar_servicio("services/progreso", DATABASE_URL=SIN_DB, CURSOS_SERVICE_URL=cursos)
+        url_progreso = pila.enter_context(servidor(progreso.app))
+        gateway = cargar_servicio("api-gateway", CURSOS_SERVICE_URL=cursos, PROGRESO_SERVICE_URL=url_progreso)
+        url_gateway = pila.enter_context(servidor(gateway.app))
+        frontend = cargar_servicio(
+            "frontend", modulo="app", API_GATEWAY_URL=url_gateway,
+            MOCK_DATA_PATH=str(tmp_path_factory.mktemp("frontend") / "mock_data.json"),
+        )
+        yield progreso, frontend
+
+
+@pytest.fixture
+def panel(pila, monkeypatch):
+    """Cliente del frontend, el espía de sus llamadas y el contexto de cada plantilla que renderiza."""
+    progreso, frontend = pila
+    espia, contextos = _Espia(), []
+    monkeypatch.setattr(frontend, "requests", espia)
+    render = frontend.render_template
+    monkeypatch.setattr(frontend, "render_template", lambda nombre, **c: contextos.append(c) or render(nombre, **c))
+    monkeypatch.setattr(frontend, "http_cache", frontend.ConditionalCache())
+    return progreso, frontend.app.test_client(), espia, contextos
+
+
+def _entrar(client, **user):
+    with client.session_transaction() as sesion:
+        sesion["user"] = user
+
+
+def test_instructor_dashboard_reads_all_statistics_in_one_call(panel):
+    progreso, client, espia, contextos = panel
+    for estudiante_id, curso_id, pct in [("p1", "curso1", 20), ("p2", "curso1", 80), ("p1", "curso3", 60)]:
+        progreso.DATA["progreso"].pop(estudiante_id, None)
+        progreso._upsert_memoria([{
+            "estudiante_id": estudiante_id, "curso_id": curso_id, "completado_pct": pct,
+            "tiempo_invertido_horas": 1, "ultima_leccion": None, "fecha_inicio": None,
+            "fecha_ultima_actividad": None, "calificacion": None,
+        }])
+    _entrar(client, email="inst1", role="instructor")
+
+    assert client.get("/dashboard").status_code == 200
+    # Una sola llamada a progreso para todos los cursos del instructor
+    [(metodo, ruta, params)] = espia.a_progreso()
+    assert (metodo, ruta) == ("GET", "cursos/estadisticas")
+    [contexto] = contextos
+    ids = [c["curso_id"] for c in contexto["cursos"]]
+    assert params == {"cursos": ",".join(ids)} and {"curso1", "curso3"} <= set(ids)
+    assert contexto["stats"]["num_cursos"] == len(ids)
+    assert contexto["stats"]["total_estudiantes"] == 3
+    inscritos = {c["curso_id"]: c["inscritos"] for c in contexto["cursos"] if c["inscritos"]}
+    assert inscritos == {"curso1": 2, "curso3": 1}
+
+
+def test_student_dashboard_first_load_is_one_call(panel):
+    progreso, client, espia, contextos = panel
+    _entrar(client, email="alumno-panel", role="estudiante")
+
+    assert client.get("/dashboard").status_code == 200
+    assert [(m, r) for m, r, _ in espia.a_progreso()] == [("POST", "estudiantes/alumno-panel/inscripcion")]
+    resumen = progreso._resumen_memoria("alumno-panel")
+    stats = contextos[-1]["stats"]
+    assert stats == {k: resumen[k] for k in ("num_cursos", "promedio_progreso", "evaluaciones_pendientes")}
+    assert stats["num_cursos"] == len(contextos[-1]["cursos"]) > 0
+
+    # Después, la lectura pura de los cursos (revalidada con ETag) y el resumen
+    espia.urls.clear()
+    assert client.get("/dashboard").status_code == 200
+    assert [(m, r) for m, r, _ in espia.a_progreso()] == [
+        ("GET", "estudiantes/alumno-panel/cursos"), ("GET", "estudiantes/alumno-panel/resumen"),
+    ]
+    assert contextos[-1]["stats"] == stats
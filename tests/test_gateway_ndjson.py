@@ -0,0 +1,56 @@
+import json
+import threading
+
+import pytest
+import requests
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from conftest import SIN_DB, cargar_servicio, servidor
+
+
+def _lento(soltar):
+    """Servicio que envía una línea NDJSON y no termina hasta que el test lo suelte."""
+    app = FastAPI()
+
+    def lineas():
+        yield b'{"fila": 0}\n'
+        soltar.wait(30)
+        yield b'{"resumen": {}}\n'
+
+    @app.get("/export")
+    @app.post("/batch")
+    def ndjson():
+        return StreamingResponse(lineas(), media_type="application/x-ndjson")
+
+    return app
+
+
+@pytest.mark.parametrize("metodo, ruta", [("get", "export"), ("post", "batch")])
+def test_ndjson_is_forwarded_as_it_arrives(metodo, ruta):
+    soltar = threading.Event()
+    with servidor(_lento(soltar)) as lento:
+        gateway = cargar_servicio("api-gateway", EVALUACIONES_SERVICE_URL=lento)
+        with servidor(gateway.app) as url:
+            try:
+                # Si el gateway esperase la respuesta entera, esto agotaría el timeout
+                r = getattr(requests, metodo)(f"{url}/api/v1/evaluaciones/{ruta}", stream=True, timeout=5)
+                assert r.headers["content-type"].startswith("application/x-ndjson")
+                lineas = r.iter_lines()
+                assert json.loads(next(lineas)) == {"fila": 0}
+            finally:
+                soltar.set()
+            assert [json.loads(linea) for linea in lineas] == [{"resumen": {}}]
+
+
+def test_batch_grading_through_the_gateway():
+    evaluaciones = cargar_servicio("services/evaluaciones", DATABASE_URL=SIN_DB)
+    with servidor(evaluaciones.app) as url_evaluaciones:
+        gateway = cargar_servicio("api-gateway", EVALUACIONES_SERVICE_URL=url_evaluaciones)
+        with servidor(gateway.app) as url:
+            envios = [{"estudiante_id": f"e{i}", "respuestas": {"p1": i % 3}} for i in range(100)]
+            r = requests.post(f"{url}/api/v1/evaluaciones/c1/responder/batch", json=envios, timeout=5)
+            assert r.status_code == 200
+            *filas, resumen = [json.loads(linea) for linea in r.text.splitlines()]
+            assert len(filas) == 100 and resumen["resumen"]["n"] == 100
+            assert requests.post(f"{url}/api/v1/evaluaciones/no-existe/responder/batch", json=[], timeout=5).status_code == 500
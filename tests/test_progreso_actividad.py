@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+# Una hora entera reciente, dentro de la retención de todas las resoluciones
+HORA = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+
+
+def _latido(curso_id, minutos, instante):
+    return {"estudiante_id": "act-1", "curso_id": curso_id, "minutos": minutos, "instante": instante.isoformat()}
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def progreso(request, tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('actividad') / 'progreso.db'}" if request.param == "sql" else SIN_DB
+    main = cargar_servicio("services/progreso", DATABASE_URL=url)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    r = TestClient(main.app).post("/eventos", json=[
+        _latido("curso1", 30, HORA + timedelta(minutes=10)),
+        _latido("curso1", 30, HORA + timedelta(minutes=20)),
+        # Con zona horaria se pasa a UTC: cae en la misma hora que los anteriores
+        dict(_latido("curso2", 15, HORA), instante=(HORA + timedelta(hours=2, minutes=15)).isoformat() + "+02:00"),
+        _latido("curso2", 60, HORA - timedelta(days=1)),
+    ])
+    assert r.status_code == 202
+    assert main.ingesta.flush()
+    return main
+
+
+def _consulta(progreso, **params):
+    return TestClient(progreso.app).get("/estudiantes/act-1/actividad", params=params)
+
+
+def test_hourly_series_is_dense(progreso):
+    r = _consulta(progreso, unidad="hora", desde=(HORA - timedelta(hours=1)).isoformat(), hasta=(HORA + timedelta(hours=1)).isoformat())
+    assert r.status_code == 200
+    datos = r.json()
+    assert [(p["horas"], p["eventos"]) for p in datos["puntos"]] == [(0, 0), (1.25, 3), (0, 0)]
+    assert datos["puntos"][1]["inicio"] == HORA.isoformat()
+    assert datos["total_horas"] == 1.25
+
+    r = _consulta(progreso, unidad="minuto", curso_id="curso1",
+                  desde=HORA.isoformat(), hasta=(HORA + timedelta(minutes=20)).isoformat())
+    puntos = r.json()["puntos"]
+    assert len(puntos) == 21 and [p["eventos"] for p in puntos if p["eventos"]] == [1, 1]
+
+
+def test_days_weeks_and_months_add_up(progreso):
+    desde = (HORA - timedelta(days=3)).isoformat()
+    hasta = (HORA + timedelta(hours=1)).isoformat()
+    dias = _consulta(progreso, unidad="dia", desde=desde, hasta=hasta).json()
+    assert dias["total_horas"] == 2.25
+    assert sum(p["eventos"] for p in dias["puntos"]) == 4
+    for unidad in ("semana", "mes"):
+        datos = _consulta(progreso, unidad=unidad, desde=desde, hasta=hasta).json()
+        assert round(sum(p["horas"] for p in datos["puntos"]), 2) == 2.25
+    solo = _consulta(progreso, unidad="dia", desde=desde, hasta=hasta, curso_id="curso2").json()
+    assert solo["total_horas"] == 1.25
+
+
+def test_invalid_queries(progreso):
+    assert _consulta(progreso, unidad="año").status_code == 400
+    assert _consulta(progreso, unidad="dia", desde=HORA.isoformat(), hasta=(HORA - timedelta(days=1)).isoformat()).status_code == 400
+    assert _consulta(progreso, unidad="minuto", desde=(HORA - timedelta(days=30)).isoformat()).status_code == 400
+    r = TestClient(progreso.app).post("/eventos", json=_latido("curso1", 24 * 60 + 1, HORA))
+    assert r.status_code == 422
+
+
+def test_expired_intervals_are_purged(progreso):
+    if not progreso.DB_DISPONIBLE:
+        pytest.skip("la purga en memoria corre en el hilo de fondo")
+    import crud
+
+    with progreso.SessionLocal() as db:
+        assert crud.purgar_actividad(db, "minuto", HORA) == 1
+        assert crud.purgar_actividad(db, "minuto", HORA) == 0
+    antes = HORA - timedelta(days=1)
+    r = _consulta(progreso, unidad="minuto", desde=antes.isoformat(), hasta=(antes + timedelta(minutes=5)).isoformat())
+    assert r.json()["total_horas"] == 0
+    # Las otras resoluciones siguen intactas
+    r = _consulta(progreso, unidad="hora", desde=(HORA - timedelta(days=2)).isoformat(), hasta=HORA.isoformat())
+    assert r.json()["total_horas"] == 2.25
@@ -0,0 +1,56 @@
+import pytest
+import sqlalchemy
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+
+def _progreso(estudiante_id, curso_id, pct, calificacion=None):
+    return {
+        "estudiante_id": estudiante_id, "curso_id": curso_id, "completado_pct": pct,
+        "tiempo_invertido_horas": 3, "ultima_leccion": "Lección 2", "fecha_inicio": "2025-01-15",
+        "fecha_ultima_actividad": "2025-03-01", "calificacion": calificacion,
+    }
+
+
+@pytest.fixture(scope="module")
+def base_de_datos(tmp_path_factory):
+    return f"sqlite:///{tmp_path_factory.mktemp('progreso') / 'progreso.db'}"
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def progreso(request, base_de_datos):
+    main = cargar_servicio("services/progreso", DATABASE_URL=base_de_datos if request.param == "sql" else SIN_DB)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    return main
+
+
+def test_upsert_creates_then_updates(progreso):
+    client = TestClient(progreso.app)
+    r = client.post("/progreso", json=_progreso("alm-1", "curso2", 10))
+    assert r.status_code == 200 and r.json()["message"] == "Progreso creado"
+    client.post("/progreso", json=_progreso("alm-1", "curso1", 30))
+    r = client.post("/progreso", json=_progreso("alm-1", "curso2", 60, 4.5))
+    assert r.json()["message"] == "Progreso actualizado"
+
+    cursos = client.get("/estudiantes/alm-1/cursos").json()["cursos"]
+    assert sorted((c["curso_id"], c["completado_pct"], c["calificacion"]) for c in cursos) == [
+        ("curso1", 30, None), ("curso2", 60, 4.5),
+    ]
+    assert client.get("/estudiantes/nadie/cursos").json() == {"cursos": []}
+
+
+def test_progress_survives_restart_and_is_shared(base_de_datos):
+    una = cargar_servicio("services/progreso", DATABASE_URL=base_de_datos)
+    TestClient(una.app).post("/progreso", json=_progreso("alm-2", "curso1", 80))
+    otra = cargar_servicio("services/progreso", DATABASE_URL=base_de_datos)
+    cursos = TestClient(otra.app).get("/estudiantes/alm-2/cursos").json()["cursos"]
+    assert [(c["curso_id"], c["completado_pct"]) for c in cursos] == [("curso1", 80)]
+
+
+def test_table_keys_and_indexes(base_de_datos):
+    inspector = sqlalchemy.inspect(sqlalchemy.create_engine(base_de_datos))
+    assert inspector.get_pk_constraint("progreso")["constrained_columns"] == ["estudiante_id", "curso_id"]
+    indices = {i["name"]: i["column_names"] for i in inspector.get_indexes("progreso")}
+    assert indices["ix_progreso_curso_id"] == ["curso_id"]
+    assert indices["ix_progreso_fecha_ultima_actividad"] == ["fecha_ultima_actividad"]
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+
+import pytest
+import sqlalchemy
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+
+def _fila(estudiante_id, curso_id="curso1", pct=50, **campos):
+    return {
+        "estudiante_id": estudiante_id, "curso_id": curso_id, "completado_pct": pct,
+        "tiempo_invertido_horas": 4, "ultima_leccion": "Lección 3", "fecha_inicio": "2025-02-01",
+        "fecha_ultima_actividad": "2025-02-10", "calificacion": None,
+    } | campos
+
+
+def _cargar(modo, tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('bulk') / 'progreso.db'}" if modo == "sql" else SIN_DB
+    main = cargar_servicio("services/progreso", DATABASE_URL=url)
+    assert main.DB_DISPONIBLE == (modo == "sql")
+    return main
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def progreso(request, tmp_path_factory):
+    return _cargar(request.param, tmp_path_factory)
+
+
+def test_invalid_rows_are_reported_and_the_rest_written(progreso):
+    client = TestClient(progreso.app)
+    filas = [
+        _fila("bk-1"), _fila("bk-2", pct=101), _fila("bk-3", tiempo_invertido_horas=2**31),
+        _fila("bk-1", pct=70), _fila("", curso_id="curso2"), _fila("bk-4", "curso2", 100, calificacion=88.5),
+    ]
+    r = client.post("/progreso/bulk", json=filas)
+    assert r.status_code == 200
+    resumen = r.json()
+    assert (resumen["total"], resumen["creados"], resumen["actualizados"], resumen["errores"]) == (6, 2, 1, 3)
+    assert [e["fila"] for e in resumen["detalle_errores"]] == [1, 2, 4]
+    assert "tiempo_invertido_horas" in resumen["detalle_errores"][1]["error"]
+    # Repetida en el mismo lote: gana la última
+    assert client.get("/estudiantes/bk-1/cursos").json()["cursos"][0]["completado_pct"] == 70
+
+    cuerpo = "\n".join([json.dumps(_fila("bk-5")), "{roto", "", json.dumps(_fila("bk-1", pct=90))])
+    r = client.post("/progreso/bulk", content=cuerpo, headers={"Content-Type": "application/x-ndjson"})
+    resumen = r.json()
+    assert (resumen["total"], resumen["creados"], resumen["actualizados"], resumen["errores"]) == (3, 1, 1, 1)
+    assert client.post("/progreso/bulk", json={"no": "es un array"}).status_code == 400
+
+
+def test_atomic_import_writes_nothing_on_error(progreso):
+    client = TestClient(progreso.app)
+    r = client.post("/progreso/bulk", params={"atomic": "true"}, json=[_fila("at-1"), _fila("at-2", pct=-1)])
+    assert r.status_code == 400 and r.json()["creados"] == 0
+    assert client.get("/estudiantes/at-1/cursos").json() == {"cursos": []}
+    r = client.post("/progreso/bulk", params={"atomic": "true"}, json=[_fila("at-1"), _fila("at-2")])
+    assert r.status_code == 200 and r.json()["creados"] == 2
+
+
+def test_export_round_trips_through_import(progreso, tmp_path_factory):
+    client = TestClient(progreso.app)
+    client.post("/progreso/bulk", json=[_fila(f"rt-{i:02d}", pct=i) for i in range(12)])
+    ndjson = client.get("/progreso/export").text.splitlines()
+    filas = [json.loads(linea) for linea in ndjson]
+    assert [(f["estudiante_id"], f["curso_id"]) for f in filas] == sorted((f["estudiante_id"], f["curso_id"]) for f in filas)
+
+    r = client.get("/progreso/export", params={"formato": "csv"})
+    assert r.headers["content-type"].startswith("text/csv")
+    assert len(list(csv.DictReader(io.StringIO(r.text)))) == len(filas)
+    assert client.get("/progreso/export", params={"formato": "xml"}).status_code == 400
+
+    otra = _cargar("sql" if progreso.DB_DISPONIBLE else "memoria", tmp_path_factory)
+    r = TestClient(otra.app).post("/progreso/bulk", content="\n".join(ndjson), headers={"Content-Type": "application/x-ndjson"})
+    assert r.json()["creados"] == len(filas)
+    assert TestClient(otra.app).get("/progreso/export").text.splitlines() == ndjson
+
+
+def test_rejected_batch_is_reported_and_the_rest_written(tmp_path_factory, monkeypatch):
+    progreso = _cargar("sql", tmp_path_factory)
+    with sqlalchemy.create_engine(str(progreso.SessionLocal.kw["bind"].url)).begin() as conexion:
+        conexion.execute(sqlalchemy.text(
+            "CREATE TRIGGER rechazar BEFORE INSERT ON progreso WHEN NEW.estudiante_id = 'rechazado' "
+            "BEGIN SELECT RAISE(ABORT, 'fila rechazada'); END"
+        ))
+    monkeypatch.setattr(progreso, "PROGRESO_BULK_LOTE", 2)
+    filas = [_fila("db-1"), _fila("db-2"), _fila("rechazado"), _fila("db-3"), _fila("db-4")]
+    r = TestClient(progreso.app).post("/progreso/bulk", json=filas)
+    assert r.status_code == 200
+    resumen = r.json()
+    assert (resumen["creados"], resumen["errores"]) == (3, 2)
+    assert [e["fila"] for e in resumen["detalle_errores"]] == [2, 3]
+    assert "fila rechazada" in resumen["detalle_errores"][0]["error"]
+    assert TestClient(progreso.app).get("/estudiantes/db-4/cursos").json()["cursos"]
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio, servidor
+
+
+@pytest.fixture(scope="module")
+def cursos():
+    return cargar_servicio("services/cursos")
+
+
+@pytest.fixture(scope="module")
+def progreso():
+    return cargar_servicio("services/progreso", DATABASE_URL=SIN_DB)
+
+
+def _esperar(condicion, segundos=5):
+    limite = time.monotonic() + segundos
+    while not condicion():
+        assert time.monotonic() < limite, "no se cumplió a tiempo"
+        time.sleep(0.02)
+
+
+def test_catalog_is_cached_and_revalidated(cursos, progreso):
+    with servidor(cursos.app) as url:
+        catalogo = progreso.CatalogoCursos(f"{url}/", refresh=3600)
+        ids = catalogo.ids()
+        assert ids and "curso1" in ids
+        version, actualizado = catalogo.version, catalogo.actualizado
+        assert version
+
+        # Sin cambios la revalidación es un 304: misma versión y misma tupla
+        catalogo.invalidar()
+        _esperar(lambda: catalogo.actualizado != actualizado)
+        assert catalogo.version == version and catalogo.ids() is ids
+
+        r = TestClient(cursos.app).post("/cursos", json={
+            "id": "curso-nuevo-catalogo", "titulo": "Nuevo", "descripcion": "x",
+            "instructor_id": "inst-1", "duracion_horas": 1, "rating": 4.0,
+        })
+        assert r.status_code == 200, r.text
+        catalogo.invalidar()
+        _esperar(lambda: "curso-nuevo-catalogo" in catalogo.ids())
+        assert catalogo.version != version
+
+    # Con cursos caído la revalidación falla y se sigue sirviendo la última copia
+    assert catalogo._revalidar() is False
+    assert "curso-nuevo-catalogo" in catalogo.ids()
+
+
+def test_unreachable_catalog(progreso, monkeypatch):
+    catalogo = progreso.CatalogoCursos("http://127.0.0.1:1/", timeout=0.5)
+    assert catalogo.ids() is None
+    monkeypatch.setattr(progreso, "catalogo", catalogo)
+    r = TestClient(progreso.app).post("/estudiantes/sin-catalogo/inscripcion")
+    assert r.status_code == 503
@@ -0,0 +1,106 @@
+import time
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+HOY = date(2025, 6, 30)
+
+
+def _progreso(estudiante_id, curso_id, pct, ultima, horas=3, calificacion=None):
+    return {
+        "estudiante_id": estudiante_id, "curso_id": curso_id, "completado_pct": pct,
+        "tiempo_invertido_horas": horas, "ultima_leccion": "Lección 2", "fecha_inicio": "2025-01-15",
+        "fecha_ultima_actividad": ultima.isoformat(), "calificacion": calificacion,
+    }
+
+
+@pytest.fixture(scope="module")
+def progreso():
+    return cargar_servicio("services/progreso", DATABASE_URL=SIN_DB)
+
+
+def _instantanea(progreso, filas):
+    import cohortes
+
+    instantanea = cohortes.InstantaneaProgreso()
+    instantanea.cargar([filas])
+    return instantanea
+
+
+def test_filters_order_and_pages(progreso):
+    instantanea = _instantanea(progreso, [
+        ("e1", "c1", 45, 10, HOY - timedelta(days=20), None),
+        ("e2", "c1", 60, 30, HOY - timedelta(days=2), 80.0),
+        ("e3", "c1", 90, 5, None, None),
+        ("e1", "c2", 50, 12, HOY - timedelta(days=15), 70.0),
+    ])
+    total, estudiantes, filas = instantanea.consultar(curso_id="c1", completado_min=40, completado_max=70, inactivo_dias=14, hoy=HOY)
+    assert (total, estudiantes) == (1, 1)
+    assert filas[0] == {
+        "estudiante_id": "e1", "curso_id": "c1", "completado_pct": 45, "tiempo_invertido_horas": 10,
+        "fecha_ultima_actividad": HOY - timedelta(days=20), "dias_inactivo": 20, "calificacion": None,
+    }
+
+    # Sin actividad cuenta como inactivo; ordenar por actividad pone primero la más antigua
+    total, estudiantes, filas = instantanea.consultar(inactivo_dias=14, hoy=HOY)
+    assert (total, estudiantes) == (3, 2)
+    assert [(f["estudiante_id"], f["curso_id"]) for f in filas] == [("e3", "c1"), ("e1", "c1"), ("e1", "c2")]
+    _, _, filas = instantanea.consultar(orden="-horas", inicio=1, limite=2, hoy=HOY)
+    assert [f["tiempo_invertido_horas"] for f in filas] == [12, 10]
+    # Sin calificación siempre al final, también en descendente
+    _, _, filas = instantanea.consultar(orden="-calificacion", hoy=HOY)
+    assert [f["calificacion"] for f in filas] == [80.0, 70.0, None, None]
+    assert instantanea.consultar(calificacion_min=75, hoy=HOY)[0] == 1
+    assert instantanea.consultar(curso_id="no-existe", hoy=HOY) == (0, 0, [])
+
+
+def test_out_of_range_values_saturate_instead_of_leaving_a_broken_row(progreso):
+    instantanea = _instantanea(progreso, [("e1", "c1", 40_000, 2**40, HOY, None), ("e2", "c1", -5, None, HOY, None)])
+    assert len(instantanea) == 2
+    _, _, filas = instantanea.consultar(orden="avance", hoy=HOY)
+    assert [(f["completado_pct"], f["tiempo_invertido_horas"]) for f in filas] == [(-5, 0), (40_000, 2**31 - 1)]
+
+
+def test_replacing_students_keeps_the_arrays_dense(progreso):
+    instantanea = _instantanea(progreso, [(f"e{i}", "c1", i, 1, HOY, None) for i in range(5)])
+    instantanea.reemplazar_estudiantes([("e1", "c2", 99, 1, HOY, None)], ["e1", "e3"])
+    assert len(instantanea) == 4
+    _, _, filas = instantanea.consultar(orden="avance", hoy=HOY)
+    assert [(f["estudiante_id"], f["curso_id"], f["completado_pct"]) for f in filas] == [
+        ("e0", "c1", 0), ("e2", "c1", 2), ("e4", "c1", 4), ("e1", "c2", 99),
+    ]
+
+
+def test_cohort_endpoint_in_memory(progreso):
+    client = TestClient(progreso.app)
+    hoy = date.today()
+    client.post("/progreso", json=_progreso("co-1", "co-a", 50, hoy - timedelta(days=30)))
+    client.post("/progreso", json=_progreso("co-2", "co-a", 55, hoy))
+    assert client.post("/progreso", json=_progreso("co-3", "co-a", 101, hoy)).status_code == 422
+    assert client.post("/progreso", json=_progreso("co-3", "co-a", 50, hoy, horas=2**31)).status_code == 422
+
+    r = client.get("/cohortes", params={"curso_id": "co-a", "completado_min": 40, "inactivo_dias": 14})
+    assert r.status_code == 200
+    datos = r.json()
+    assert (datos["total"], datos["estudiantes"]) == (1, 1)
+    assert datos["resultados"][0]["estudiante_id"] == "co-1"
+
+    assert client.get("/cohortes", params={"orden": "nombre"}).status_code == 400
+    assert client.get("/cohortes", params={"completado_min": 70, "completado_max": 10}).status_code == 400
+    assert client.get("/cohortes", params={"inactivo_dias": -1}).status_code == 400
+
+
+def test_snapshot_follows_the_database(tmp_path):
+    progreso = cargar_servicio(
+        "services/progreso", DATABASE_URL=f"sqlite:///{tmp_path / 'progreso.db'}",
+        COHORTES_INTERVALO="0.05", COHORTES_MARGEN="1",
+    )
+    client = TestClient(progreso.app)
+    client.post("/progreso", json=_progreso("sq-1", "sq-a", 30, date.today()))
+    limite = time.monotonic() + 5
+    while client.get("/cohortes", params={"curso_id": "sq-a"}).json().get("total") != 1:
+        assert time.monotonic() < limite, "la instantánea no recogió el cambio"
+        time.sleep(0.05)
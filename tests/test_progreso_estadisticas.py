@@ -0,0 +1,58 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+
+def _progreso(estudiante_id, curso_id, pct, calificacion=None):
+    return {
+        "estudiante_id": estudiante_id, "curso_id": curso_id, "completado_pct": pct,
+        "tiempo_invertido_horas": 3, "ultima_leccion": "Lección 2", "fecha_inicio": "2025-01-15",
+        "fecha_ultima_actividad": "2025-03-01", "calificacion": calificacion,
+    }
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def progreso(request, tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('estadisticas') / 'progreso.db'}" if request.param == "sql" else SIN_DB
+    main = cargar_servicio("services/progreso", DATABASE_URL=url)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    client = TestClient(main.app)
+    for estudiante_id, pct, calificacion in [("e1", 5, None), ("e2", 60, 80), ("e3", 100, 90), ("e4", 95, None)]:
+        client.post("/progreso", json=_progreso(estudiante_id, "est-a", pct, calificacion))
+    client.post("/progreso", json=_progreso("e1", "est-b", 40))
+    return main
+
+
+def test_course_statistics(progreso):
+    estadisticas = TestClient(progreso.app).get("/cursos/est-a/estadisticas").json()
+    assert (estadisticas["inscritos"], estadisticas["promedio_progreso"]) == (4, 65)
+    assert (estadisticas["completados"], estadisticas["evaluaciones_pendientes"]) == (1, 1)
+    assert [t["estudiantes"] for t in estadisticas["histograma"]] == [1, 0, 0, 0, 0, 0, 1, 0, 0, 2]
+    assert estadisticas["calificaciones"] == {"cantidad": 2, "promedio": 85.0, "varianza": 25.0}
+
+    # Un cambio de avance mueve al estudiante de tramo
+    TestClient(progreso.app).post("/progreso", json=_progreso("e1", "est-a", 15))
+    estadisticas = TestClient(progreso.app).get("/cursos/est-a/estadisticas").json()
+    assert [t["estudiantes"] for t in estadisticas["histograma"]][:2] == [0, 1]
+
+
+def test_batch_statistics_match_single_ones(progreso):
+    client = TestClient(progreso.app)
+    r = client.get("/cursos/estadisticas", params={"cursos": "est-b, est-a,nadie,est-b"})
+    assert r.status_code == 200
+    cursos = r.json()["cursos"]
+    assert [c["curso_id"] for c in cursos] == ["est-b", "est-a", "nadie"]
+    for c in cursos:
+        assert c == client.get(f"/cursos/{c['curso_id']}/estadisticas").json()
+    assert cursos[2]["inscritos"] == 0
+
+    assert client.get("/cursos/estadisticas").json() == {"cursos": []}
+    muchos = ",".join(f"c{i}" for i in range(progreso.ESTADISTICAS_CURSOS_MAX + 1))
+    assert client.get("/cursos/estadisticas", params={"cursos": muchos}).status_code == 400
+
+
+def test_out_of_range_progress_falls_in_the_edge_bands(progreso):
+    import crud
+
+    assert [crud.tramo(p) for p in (-5, 0, 9, 10, 99, 100, 250)] == [0, 0, 0, 1, 9, 9, 9]
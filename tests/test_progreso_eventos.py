@@ -0,0 +1,93 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def progreso(request, tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('eventos') / 'progreso.db'}" if request.param == "sql" else SIN_DB
+    main = cargar_servicio("services/progreso", DATABASE_URL=url)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    return main
+
+
+def _evento(**campos):
+    return {"estudiante_id": "ev-1", "curso_id": "curso1"} | campos
+
+
+def test_events_are_merged_and_never_go_back(progreso):
+    client = TestClient(progreso.app)
+    r = client.post("/eventos", json=[
+        _evento(completado_pct=40, ultima_leccion="Lección 4", fecha="2025-03-02"),
+        _evento(completado_pct=20, tiempo_invertido_horas=5, fecha="2025-03-01"),
+        _evento(calificacion=80.5, fecha="2025-03-05"),
+    ])
+    assert r.status_code == 202 and r.json()["aceptados"] == 3
+    r = client.post("/eventos", json=_evento(completado_pct=10, tiempo_invertido_horas=2))
+    assert r.status_code == 202
+    assert progreso.ingesta.flush()
+
+    [curso] = client.get("/estudiantes/ev-1/cursos").json()["cursos"]
+    assert (curso["completado_pct"], curso["tiempo_invertido_horas"]) == (40, 5)
+    assert (curso["ultima_leccion"], curso["calificacion"]) == ("Lección 4", 80.5)
+    assert curso["fecha_inicio"] == "2025-03-01"
+
+
+@pytest.mark.parametrize("evento", [
+    _evento(tiempo_invertido_horas=2**31),
+    _evento(calificacion=101),
+    _evento(completado_pct=-1),
+    _evento(ultima_leccion="x" * 256),
+    {"curso_id": "curso1"},
+])
+def test_invalid_events_are_rejected(progreso, evento):
+    r = TestClient(progreso.app).post("/eventos", json=[_evento(), evento])
+    assert r.status_code == 422
+
+
+def _ingesta(progreso, escribir, **kwargs):
+    import eventos
+
+    return eventos.IngestaEventos(escribir, intervalo=3600, **kwargs)
+
+
+def test_rejected_rows_are_set_aside(progreso):
+    class Caida(Exception):
+        pass
+
+    escritas, fallos = [], [Caida("sin conexión")]
+
+    def escribir(filas, actividad):
+        if fallos:
+            raise fallos.pop()
+        if any(f["estudiante_id"] == "malo" for f in filas):
+            raise ValueError("fila rechazada")
+        escritas.extend(f["estudiante_id"] for f in filas)
+
+    ingesta = _ingesta(progreso, escribir, transitorios=(Caida,))
+    ingesta.agregar([_evento(estudiante_id=f"est-{i}", completado_pct=i) for i in range(5)] + [_evento(estudiante_id="malo")])
+    assert ingesta.flush()
+    # La caída se reintenta entera; la fila rechazada se aísla y el resto se escribe
+    assert sorted(escritas) == [f"est-{i}" for i in range(5)]
+    assert ingesta.escritos == 5
+    [(fila, _, error)] = ingesta.apartadas
+    assert fila["estudiante_id"] == "malo" and "rechazada" in error
+
+
+def test_log_is_replayed_after_a_crash(progreso, tmp_path):
+    import eventos
+
+    ruta = str(tmp_path / "progreso.log")
+    caida = _ingesta(progreso, lambda filas, actividad: None, registro=eventos.RegistroEventos(ruta))
+    caida.agregar([_evento(completado_pct=30, fecha="2025-04-01")])
+    caida.agregar([_evento(completado_pct=50, fecha="2025-04-02")])
+
+    # Un proceso nuevo sobre el mismo registro reproduce lo que no llegó a escribirse
+    escritas = []
+    nueva = _ingesta(progreso, lambda filas, actividad: escritas.extend(filas), registro=eventos.RegistroEventos(ruta))
+    assert nueva.flush()
+    [fila] = escritas
+    assert fila["completado_pct"] == 50 and fila["fecha_inicio"].isoformat() == "2025-04-01"
+    # Confirmada la escritura, no queda nada que reproducir
+    assert list(eventos.RegistroEventos(ruta).pendientes()) == []
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio, servidor
+
+
+@pytest.fixture(scope="module")
+def cursos():
+    with servidor(cargar_servicio("services/cursos").app) as url:
+        yield url
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def progreso(request, cursos, tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('inscripcion') / 'progreso.db'}" if request.param == "sql" else SIN_DB
+    main = cargar_servicio("services/progreso", DATABASE_URL=url, CURSOS_SERVICE_URL=cursos)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    return main
+
+
+def test_enrollment_returns_courses_and_summary(progreso):
+    client = TestClient(progreso.app)
+    assert client.get("/estudiantes/ins-1/cursos").json() == {"cursos": []}
+
+    r = client.post("/estudiantes/ins-1/inscripcion")
+    assert r.status_code == 201
+    primera = r.json()
+    assert primera["creado"] and 3 <= len(primera["cursos"]) <= 5
+    assert primera["resumen"] == client.get("/estudiantes/ins-1/resumen").json()
+    assert primera["resumen"]["num_cursos"] == len(primera["cursos"])
+
+    # Ya inscrito: los mismos cursos, sin tocarlos
+    r = client.post("/estudiantes/ins-1/inscripcion")
+    assert r.status_code == 200
+    assert (r.json()["creado"], r.json()["cursos"], r.json()["resumen"]) == (False, primera["cursos"], primera["resumen"])
+    assert client.get("/estudiantes/ins-1/cursos").json()["cursos"] == primera["cursos"]
+
+
+def test_enrolled_students_do_not_need_the_catalog(progreso, monkeypatch):
+    client = TestClient(progreso.app)
+    assert client.post("/estudiantes/ins-4/inscripcion").status_code == 201
+    caido = progreso.CatalogoCursos("http://127.0.0.1:1/", timeout=0.5)
+    monkeypatch.setattr(progreso, "catalogo", caido)
+    r = client.post("/estudiantes/ins-4/inscripcion")
+    assert r.status_code == 200 and r.json()["cursos"]
+    # Uno nuevo sí lo necesita
+    assert client.post("/estudiantes/ins-5/inscripcion").status_code == 503
+    assert client.get("/estudiantes/ins-5/cursos").json() == {"cursos": []}
+
+
+def test_concurrent_first_visits_enroll_once(progreso):
+    client = TestClient(progreso.app)
+    respuestas = []
+    hilos = [
+        threading.Thread(target=lambda: respuestas.append(client.post("/estudiantes/ins-2/inscripcion")))
+        for _ in range(4)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert sorted(r.status_code for r in respuestas) == [200, 200, 200, 201]
+    assert len({str(r.json()["cursos"]) for r in respuestas}) == 1
+
+
+def test_idempotency_key_replays_the_response(progreso):
+    client = TestClient(progreso.app)
+    cabecera = {"Idempotency-Key": "ins-3:clave"}
+    primera = client.post("/estudiantes/ins-3/asignar-cursos", headers=cabecera)
+    assert primera.status_code == 200 and "Idempotent-Replayed" not in primera.headers
+    repetida = client.post("/estudiantes/ins-3/asignar-cursos", headers=cabecera)
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert repetida.json() == primera.json()
+    guardados = client.get("/estudiantes/ins-3/cursos").json()["cursos"]
+    assert {c["curso_id"] for c in guardados} == {c["curso_id"] for c in primera.json()["cursos"]}
+
+    assert client.post("/estudiantes/ins-3/inscripcion", headers=cabecera).status_code == 422
+    assert client.post("/estudiantes/ins-3/inscripcion", headers={"Idempotency-Key": ""}).status_code == 400
+
+
+def test_course_list_is_revalidated_with_etag(progreso):
+    client = TestClient(progreso.app)
+    client.post("/estudiantes/ins-4/inscripcion")
+    r = client.get("/estudiantes/ins-4/cursos")
+    etag = r.headers["ETag"]
+    assert client.get("/estudiantes/ins-4/cursos", headers={"If-None-Match": etag}).status_code == 304
+
+    curso = r.json()["cursos"][0]
+    client.post("/progreso", json=dict(curso, estudiante_id="ins-4", completado_pct=100))
+    r = client.get("/estudiantes/ins-4/cursos", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
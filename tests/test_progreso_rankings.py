@@ -0,0 +1,112 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio
+
+
+def _progreso(estudiante_id, curso_id, pct, calificacion=None):
+    return {
+        "estudiante_id": estudiante_id, "curso_id": curso_id, "completado_pct": pct,
+        "tiempo_invertido_horas": 3, "ultima_leccion": "Lección 2", "fecha_inicio": "2025-01-15",
+        "fecha_ultima_actividad": "2025-03-01", "calificacion": calificacion,
+    }
+
+
+@pytest.fixture(scope="module")
+def base_de_datos(tmp_path_factory):
+    return f"sqlite:///{tmp_path_factory.mktemp('rankings') / 'progreso.db'}"
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def progreso(request, base_de_datos):
+    main = cargar_servicio("services/progreso", DATABASE_URL=base_de_datos if request.param == "sql" else SIN_DB)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    client = TestClient(main.app)
+    for estudiante_id, curso_id, pct, calificacion in [
+        ("rk-1", "rk-a", 90, None), ("rk-2", "rk-a", 50, 70), ("rk-3", "rk-a", 70, 95),
+        ("rk-1", "rk-b", 10, 60), ("rk-2", "rk-b", 100, None),
+    ]:
+        client.post("/progreso", json=_progreso(estudiante_id, curso_id, pct, calificacion))
+    return main
+
+
+def test_skip_list_matches_a_sorted_list(progreso):
+    import rankings
+
+    random.seed(7)
+    lista, esperado = rankings.ListaSaltos(), []
+    for _ in range(2000):
+        clave = (random.randint(0, 50), f"m{random.randint(0, 200)}")
+        if clave in esperado:
+            assert lista.borrar(clave)
+            esperado.remove(clave)
+        else:
+            lista.insertar(clave)
+            esperado.append(clave)
+    esperado.sort()
+    assert len(lista) == len(esperado) and not lista.borrar((-1, "nadie"))
+    assert lista.desde(0, len(esperado) + 5) == esperado
+    assert lista.desde(17, 9) == esperado[17:26] and lista.desde(len(esperado), 3) == []
+    assert all(lista.posicion(c) == i for i, c in enumerate(esperado))
+
+
+def test_course_and_global_rankings(progreso):
+    client = TestClient(progreso.app)
+    pagina = client.get("/cursos/rk-a/ranking").json()
+    assert [(e["posicion"], e["estudiante_id"], e["puntaje"]) for e in pagina["estudiantes"]] == [
+        (1, "rk-1", 90), (2, "rk-3", 70), (3, "rk-2", 50),
+    ]
+    assert (pagina["total"], pagina["curso_id"]) == (3, "rk-a")
+    pagina = client.get("/cursos/rk-a/ranking", params={"criterio": "calificacion", "inicio": 1, "cantidad": 1}).json()
+    assert pagina["total"] == 2 and [e["estudiante_id"] for e in pagina["estudiantes"]] == ["rk-2"]
+
+    # El global ordena por el promedio en los cursos de cada estudiante
+    r = client.get("/estudiantes/rk-2/ranking").json()
+    assert (r["puntaje"], r["posicion"]) == (75.0, 1)
+    r = client.get("/estudiantes/rk-1/ranking", params={"criterio": "calificacion", "curso_id": "rk-b"}).json()
+    assert (r["puntaje"], r["posicion"], r["total"]) == (60.0, 1, 1)
+
+
+def test_rankings_follow_updates(progreso):
+    client = TestClient(progreso.app)
+    client.post("/progreso", json=_progreso("rk-2", "rk-a", 95, 70))
+    assert client.get("/cursos/rk-a/ranking").json()["estudiantes"][0]["estudiante_id"] == "rk-2"
+    client.post("/eventos", json={"estudiante_id": "rk-3", "curso_id": "rk-a", "completado_pct": 99})
+    assert progreso.ingesta.flush()
+    assert client.get("/estudiantes/rk-3/ranking", params={"curso_id": "rk-a"}).json()["posicion"] == 1
+
+
+def test_ranking_errors(progreso):
+    client = TestClient(progreso.app)
+    assert client.get("/rankings/global", params={"criterio": "horas"}).status_code == 400
+    assert client.get("/rankings/global", params={"inicio": -1}).status_code == 400
+    assert client.get("/rankings/global", params={"cantidad": 10_000}).json()["total"] >= 3
+    assert client.get("/estudiantes/rk-3/ranking", params={"criterio": "calificacion", "curso_id": "rk-b"}).status_code == 404
+
+
+def test_rankings_are_loaded_from_the_database_on_startup(progreso, base_de_datos):
+    if not progreso.DB_DISPONIBLE:
+        pytest.skip("solo con base de datos")
+    otra = cargar_servicio("services/progreso", DATABASE_URL=base_de_datos)
+    assert TestClient(otra.app).get("/cursos/rk-a/ranking").json() == TestClient(progreso.app).get("/cursos/rk-a/ranking").json()
+
+
+def test_redis_store(progreso):
+    fakeredis = pytest.importorskip("fakeredis")
+    import rankings
+
+    store = rankings.RedisRankingStore(fakeredis.FakeRedis())
+    assert store.vacio()
+    store.actualizar([("global:avance", "a", 10.0), ("global:avance", "b", 30.0), ("curso:x:avance", "a", 5.0)])
+    assert store.top("global:avance", 0, 10) == (2, [("b", 30.0), ("a", 10.0)])
+    assert store.posicion("global:avance", "a") == (1, 10.0, 2)
+    store.actualizar([("global:avance", "b", None)])
+    assert store.posicion("global:avance", "b") is None
+
+    # Reemplazar deja solo los tableros cargados
+    store.reemplazar([("global:avance", "c", 1.0), ("global:avance", "d", None)])
+    assert store.top("global:avance", 0, 10) == (1, [("c", 1.0)])
+    assert store.top("curso:x:avance", 0, 10) == (0, [])
+    assert not store.vacio()
@@ -0,0 +1,85 @@
+import pytest
+import sqlalchemy
+from fastapi.testclient import TestClient
+
+from conftest import SIN_DB, cargar_servicio, servidor
+
+
+def _progreso(estudiante_id, curso_id, pct, calificacion=None):
+    return {
+        "estudiante_id": estudiante_id, "curso_id": curso_id, "completado_pct": pct,
+        "tiempo_invertido_horas": 3, "ultima_leccion": "Lección 2", "fecha_inicio": "2025-01-15",
+        "fecha_ultima_actividad": "2025-03-01", "calificacion": calificacion,
+    }
+
+
+def _calculado(client, estudiante_id):
+    """El resumen calculado a mano desde los cursos del estudiante."""
+    cursos = client.get(f"/estudiantes/{estudiante_id}/cursos").json()["cursos"]
+    calificaciones = [c["calificacion"] for c in cursos if c["calificacion"] is not None]
+    return {
+        "estudiante_id": estudiante_id,
+        "num_cursos": len(cursos),
+        "promedio_progreso": round(sum(c["completado_pct"] for c in cursos) / len(cursos)) if cursos else 0,
+        "evaluaciones_pendientes": sum(c["completado_pct"] > 50 and c["calificacion"] is None for c in cursos),
+        "promedio_calificacion": round(sum(calificaciones) / len(calificaciones), 2) if calificaciones else None,
+    }
+
+
+@pytest.fixture(scope="module")
+def base_de_datos(tmp_path_factory):
+    return f"sqlite:///{tmp_path_factory.mktemp('resumen') / 'progreso.db'}"
+
+
+@pytest.fixture(scope="module", params=["sql", "memoria"])
+def progreso(request, base_de_datos):
+    main = cargar_servicio("services/progreso", DATABASE_URL=base_de_datos if request.param == "sql" else SIN_DB)
+    assert main.DB_DISPONIBLE == (request.param == "sql")
+    return main
+
+
+def test_summary_follows_every_write(progreso):
+    client = TestClient(progreso.app)
+    assert client.get("/estudiantes/res-1/resumen").json() == _calculado(client, "res-1")
+
+    client.post("/progreso", json=_progreso("res-1", "curso1", 60))
+    client.post("/progreso", json=_progreso("res-1", "curso2", 30))
+    client.post("/progreso", json=_progreso("res-1", "curso3", 100, 90))
+    resumen = client.get("/estudiantes/res-1/resumen").json()
+    assert resumen == {
+        "estudiante_id": "res-1", "num_cursos": 3, "promedio_progreso": 63,
+        "evaluaciones_pendientes": 1, "promedio_calificacion": 90.0,
+    }
+
+    # Calificar el pendiente y hacer pasar otro del 50 % con un evento
+    client.post("/progreso", json=_progreso("res-1", "curso1", 60, 70))
+    client.post("/eventos", json={"estudiante_id": "res-1", "curso_id": "curso2", "completado_pct": 55})
+    assert progreso.ingesta.flush()
+    resumen = client.get("/estudiantes/res-1/resumen").json()
+    assert resumen == _calculado(client, "res-1")
+    assert (resumen["evaluaciones_pendientes"], resumen["promedio_calificacion"]) == (1, 80.0)
+
+
+def test_summary_after_enrollment_and_reassignment(progreso, monkeypatch):
+    cursos = cargar_servicio("services/cursos")
+    with servidor(cursos.app) as url:
+        monkeypatch.setattr(progreso, "catalogo", progreso.CatalogoCursos(f"{url}/"))
+        client = TestClient(progreso.app)
+        assert client.post("/estudiantes/res-2/inscripcion").status_code == 201
+        assert client.get("/estudiantes/res-2/resumen").json() == _calculado(client, "res-2")
+        assert client.post("/estudiantes/res-2/asignar-cursos").status_code == 200
+        assert client.get("/estudiantes/res-2/resumen").json() == _calculado(client, "res-2")
+
+
+def test_empty_summary_table_is_rebuilt_on_startup(base_de_datos):
+    una = cargar_servicio("services/progreso", DATABASE_URL=base_de_datos)
+    client = TestClient(una.app)
+    client.post("/progreso", json=_progreso("res-3", "curso1", 80))
+    client.post("/progreso", json=_progreso("res-3", "curso2", 20, 75))
+    esperado = client.get("/estudiantes/res-3/resumen").json()
+    assert esperado["num_cursos"] == 2
+
+    with sqlalchemy.create_engine(base_de_datos).begin() as conexion:
+        conexion.execute(sqlalchemy.text("DELETE FROM resumen_estudiante"))
+    otra = cargar_servicio("services/progreso", DATABASE_URL=base_de_datos)
+    assert TestClient(otra.app).get("/estudiantes/res-3/resumen").json() == esperado